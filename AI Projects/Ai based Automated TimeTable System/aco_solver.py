@@ -0,0 +1,201 @@
+# aco_solver.py
+"""Max-min ant colony optimisation over lecture start slots.
+
+Pheromone and heuristic values are NumPy arrays over (lecture, day,
+period), stored with day and period flattened into one slot axis. Every
+ant places lectures one at a time, most constrained first, and samples a
+start slot from the feasible ones with probability proportional to
+``tau**alpha * eta**beta``. Feasibility is checked
+against per-resource occupancy rows, so faculty, class and lab slots can
+never be double-booked; a lecture with no feasible slot is left unplaced
+and penalised. Independent colonies run in parallel on a process pool
+and the best colony wins.
+"""
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass, field
+from typing import Any, Optional
+
+import numpy as np
+
+from timetable_model import DAYS, N_SLOTS, PERIODS, UNPLACED, Problem, block_free
+
+UNPLACED_PENALTY = 100.0
+
+
+@dataclass
+class AcoParams:
+    n_ants: int = 16
+    n_iterations: int = 60
+    alpha: float = 1.0
+    beta: float = 2.0
+    rho: float = 0.1
+    patience: int = 15
+    time_limit: Optional[float] = 10.0
+
+
+@dataclass
+class AcoResult:
+    assignment: np.ndarray
+    cost: float
+    unplaced: int
+    iterations: int = 0
+    colonies: int = 1
+    ants_evaluated: int = 0
+    elapsed: float = 0.0
+    history: list[float] = field(default_factory=list)
+    colony_costs: list[float] = field(default_factory=list)
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            'cost': round(self.cost, 3),
+            'unplaced': self.unplaced,
+            'iterations': self.iterations,
+            'colonies': self.colonies,
+            'ants_evaluated': self.ants_evaluated,
+            'elapsed_seconds': round(self.elapsed, 3),
+            'best_cost_history': [round(c, 3) for c in self.history],
+            'colony_costs': [round(c, 3) for c in self.colony_costs],
+        }
+
+
+def solution_cost(problem: Problem, assignment: np.ndarray) -> float:
+    """Unplaced lectures dominate; repeats of one course on the same day break ties."""
+    placed = assignment >= 0
+    unplaced = int((~placed).sum())
+    if not placed.any():
+        return unplaced * UNPLACED_PENALTY
+    per_day = np.bincount(problem.lec_group[placed] * len(DAYS) + assignment[placed] // PERIODS,
+                          minlength=problem.n_groups * len(DAYS))
+    repeats = int(np.maximum(per_day - 1, 0).sum())
+    return unplaced * UNPLACED_PENALTY + repeats
+
+
+def heuristic_matrix(problem: Problem) -> np.ndarray:
+    """Static desirability of each start slot: early periods are mildly preferred."""
+    period_pref = 1.0 - 0.05 * (np.arange(N_SLOTS) % PERIODS)
+    return np.where(problem.start_mask, period_pref[None, :], 0.0)
+
+
+def placement_order(problem: Problem) -> np.ndarray:
+    """Difficulty score per lecture; larger means place earlier."""
+    load = np.zeros(problem.n_resources)
+    for l, res in enumerate(problem.lec_resources):
+        load[res] += problem.lec_length[l]
+    return np.array([problem.lec_length[l] * 100 + load[res].max()
+                     for l, res in enumerate(problem.lec_resources)], dtype=float)
+
+
+def construct_solution(problem: Problem, weights: np.ndarray, difficulty: np.ndarray,
+                       rng: np.random.Generator) -> np.ndarray:
+    """Builds one clash-free assignment, sampling start slots from ``weights``."""
+    busy = np.zeros((problem.n_resources, N_SLOTS), dtype=bool)
+    group_day = np.zeros((max(problem.n_groups, 1), len(DAYS)))
+    assignment = np.full(problem.n_lectures, UNPLACED, dtype=np.int32)
+    order = np.argsort(-(difficulty + rng.random(problem.n_lectures) * 10))
+    for l in order:
+        res = problem.lec_resources[l]
+        length = int(problem.lec_length[l])
+        feasible = block_free(~busy[res].any(axis=0), length) & problem.start_mask[l]
+        if not feasible.any():
+            continue
+        # Spread the blocks of one course over different days
+        day_factor = np.repeat(1.0 / (1.0 + group_day[problem.lec_group[l]]), PERIODS)
+        w = weights[l] * day_factor * feasible
+        cumulative = np.cumsum(w)
+        start = int(np.searchsorted(cumulative, rng.random() * cumulative[-1], side='right'))
+        start = min(start, N_SLOTS - 1)
+        if not feasible[start]:
+            start = int(np.flatnonzero(feasible)[0])
+        assignment[l] = start
+        busy[res, start:start + length] = True
+        group_day[problem.lec_group[l], start // PERIODS] += 1
+    return assignment
+
+
+def run_colony(problem: Problem, params: AcoParams, seed: int,
+               initial: Optional[np.ndarray] = None) -> AcoResult:
+    started = time.perf_counter()
+    rng = np.random.default_rng(seed)
+    n = problem.n_lectures
+    eta = heuristic_matrix(problem)
+    difficulty = placement_order(problem)
+    tau_max = 1.0 / params.rho
+    tau_min = tau_max / (2.0 * max(n, 1))
+    tau = np.full((n, N_SLOTS), tau_max)
+
+    best = initial.copy() if initial is not None else construct_solution(problem, tau * eta, difficulty, rng)
+    best_cost = solution_cost(problem, best)
+    history: list[float] = []
+    ants = 0
+    stale = 0
+    iteration = 0
+    for iteration in range(1, params.n_iterations + 1):
+        weights = tau ** params.alpha * eta ** params.beta
+        iter_best, iter_cost = None, float('inf')
+        for _ in range(params.n_ants):
+            candidate = construct_solution(problem, weights, difficulty, rng)
+            cost = solution_cost(problem, candidate)
+            ants += 1
+            if cost < iter_cost:
+                iter_best, iter_cost = candidate, cost
+        if iter_cost < best_cost:
+            best, best_cost, stale = iter_best, iter_cost, 0
+        else:
+            stale += 1
+        history.append(best_cost)
+
+        # Evaporate, then reinforce the iteration-best and global-best tours
+        tau *= 1.0 - params.rho
+        for solution, cost in ((iter_best, iter_cost), (best, best_cost)):
+            placed = np.flatnonzero(solution >= 0)
+            tau[placed, solution[placed]] += 1.0 / (1.0 + cost)
+        np.clip(tau, tau_min, tau_max, out=tau)
+
+        if best_cost == 0 or stale >= params.patience:
+            break
+        if params.time_limit is not None and time.perf_counter() - started > params.time_limit:
+            break
+
+    return AcoResult(
+        assignment=best,
+        cost=best_cost,
+        unplaced=int((best < 0).sum()),
+        iterations=iteration,
+        ants_evaluated=ants,
+        elapsed=time.perf_counter() - started,
+        history=history,
+        colony_costs=[best_cost],
+    )
+
+
+def solve_aco(problem: Problem, params: Optional[AcoParams] = None, n_colonies: Optional[int] = None,
+              seed: Optional[int] = None, initial: Optional[np.ndarray] = None) -> AcoResult:
+    """Runs ``n_colonies`` independent colonies (on a process pool when > 1) and returns the best."""
+    params = params or AcoParams()
+    started = time.perf_counter()
+    if problem.n_lectures == 0:
+        return AcoResult(np.empty(0, dtype=np.int32), 0.0, 0)
+    n_colonies = n_colonies or min(4, os.cpu_count() or 1)
+    seeds = np.random.SeedSequence(seed).generate_state(n_colonies).tolist()
+
+    results = None
+    if n_colonies > 1:
+        try:
+            with ProcessPoolExecutor(max_workers=n_colonies) as pool:
+                futures = [pool.submit(run_colony, problem, params, s, initial) for s in seeds]
+                results = [f.result() for f in futures]
+        except (OSError, BrokenProcessPool) as e:
+            logging.warning(f"ACO process pool unavailable, running colonies serially: {str(e)}")
+    if results is None:
+        results = [run_colony(problem, params, s, initial) for s in seeds]
+
+    best = min(results, key=lambda r: r.cost)
+    best.colonies = n_colonies
+    best.ants_evaluated = sum(r.ants_evaluated for r in results)
+    best.colony_costs = [r.cost for r in results]
+    best.elapsed = time.perf_counter() - started
+    return best
@@ -0,0 +1,202 @@
+# anytime_solver.py
+"""Anytime timetable search under a wall-clock budget.
+
+DSatur graph colouring (graph_coloring.py) builds a clash-free start. The
+remaining budget goes to simulated annealing over single-lecture moves
+and same-length swaps, scored incrementally with
+``soft_constraints.ScoreState``. Now and then an unplaced (or random)
+lecture is instead moved to the best slot of a full ``move_deltas`` scan.
+A lecture that just moved is tabu for ``tabu_tenure`` iterations, unless
+moving it would beat the best score so far. This keeps the walk from
+undoing its own moves at low temperatures.
+
+The temperature falls geometrically with elapsed time, from
+``initial_temperature`` at the start to ``final_temperature`` at the
+deadline, so the search cools however long the budget is. The best
+assignment seen is always kept. Two optional callbacks receive it:
+``progress(stats)`` every ``progress_interval`` seconds, and
+``checkpoint(assignment, score)`` at most every ``checkpoint_interval``
+seconds once the best has improved. The caller can therefore persist
+something useful long before the deadline.
+"""
+import math
+import random
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Optional
+
+import numpy as np
+
+from genetic_solver import drop_clashes
+from graph_coloring import solve_graph_coloring
+from soft_constraints import ScoreState, ScoreWeights, score_assignment
+from timetable_model import UNPLACED, Problem
+
+# Elapsed time is read once per this many iterations
+CLOCK_EVERY = 64
+
+
+@dataclass
+class AnytimeParams:
+    budget: float = 5.0
+    # In score units: a move that is worse by the temperature is accepted with probability 1/e
+    initial_temperature: float = 10.0
+    final_temperature: float = 0.05
+    tabu_tenure: int = 10
+    swap_rate: float = 0.3
+    scan_rate: float = 0.02
+    progress_interval: float = 0.25
+    checkpoint_interval: float = 1.0
+
+
+@dataclass
+class AnytimeResult:
+    assignment: np.ndarray
+    score: float
+    components: dict[str, float]
+    iterations: int = 0
+    accepted: int = 0
+    improvements: int = 0
+    construction_seconds: float = 0.0
+    elapsed: float = 0.0
+    history: list[tuple[float, float]] = field(default_factory=list)
+
+    def stats(self) -> dict[str, Any]:
+        search = max(self.elapsed - self.construction_seconds, 1e-9)
+        return {
+            'score': round(self.score, 3),
+            'components': {k: round(v, 3) for k, v in self.components.items()},
+            'iterations': self.iterations,
+            'accepted': self.accepted,
+            'improvements': self.improvements,
+            'iterations_per_second': int(self.iterations / search),
+            'construction_ms': round(self.construction_seconds * 1000, 3),
+            'elapsed_seconds': round(self.elapsed, 3),
+        }
+
+
+def solve_anytime(problem: Problem, params: Optional[AnytimeParams] = None,
+                  weights: Optional[ScoreWeights] = None, initial: Optional[np.ndarray] = None,
+                  seed: Optional[int] = None,
+                  progress: Optional[Callable[[dict[str, Any]], None]] = None,
+                  checkpoint: Optional[Callable[[np.ndarray, float], None]] = None) -> AnytimeResult:
+    """Best assignment found within ``params.budget`` seconds; ``initial`` starts are kept where feasible."""
+    params = params or AnytimeParams()
+    started = time.perf_counter()
+    deadline = started + params.budget
+    construction = solve_graph_coloring(problem, initial)
+    state = ScoreState(problem, construction.assignment, weights)
+    construction_seconds = time.perf_counter() - started
+    n = problem.n_lectures
+    if n == 0:
+        return AnytimeResult(state.assignment(), state.score, dict(state.components),
+                             construction_seconds=construction_seconds, elapsed=construction_seconds)
+
+    # Scalar draws from random.Random are far cheaper than NumPy scalars in this loop
+    rng = random.Random(seed)
+    valid = [np.flatnonzero(problem.start_mask[l]).tolist() for l in range(n)]
+    # Swapping lectures of equal length keeps both starts legal
+    same_length: dict[int, list[int]] = {}
+    for l, length in enumerate(problem.lec_length.tolist()):
+        same_length.setdefault(length, []).append(l)
+    partners = [same_length[length] for length in problem.lec_length.tolist()]
+
+    best, best_score = list(state.start), state.score
+    history = [(0.0, best_score)]
+    tabu_until = [0] * n
+    iterations = accepted = improvements = 0
+    last_progress = last_checkpoint = started
+    checkpointed_score = best_score
+    temperature = params.initial_temperature
+    cooling = math.log(params.final_temperature / params.initial_temperature)
+    search_started = time.perf_counter()
+    now = search_started
+
+    def report(now: float, score: float, best_score: float, components: dict[str, float]) -> None:
+        search = max(now - search_started, 1e-9)
+        progress({
+            'score': round(score, 3),
+            'best_score': round(best_score, 3),
+            'unplaced': int(components['unplaced']),
+            'clashes': int(components['clashes']),
+            'iterations': iterations,
+            'iterations_per_second': int(iterations / search),
+            'temperature': round(temperature, 4),
+            'elapsed_seconds': round(now - started, 3),
+            'budget_seconds': params.budget,
+        })
+
+    while True:
+        if iterations % CLOCK_EVERY == 0:
+            now = time.perf_counter()
+            if now >= deadline:
+                break
+            temperature = params.initial_temperature * math.exp(cooling * (now - started) / params.budget)
+            if progress is not None and now - last_progress >= params.progress_interval:
+                report(now, state.score, best_score, state.components)
+                last_progress = now
+            if checkpoint is not None and best_score < checkpointed_score and \
+                    now - last_checkpoint >= params.checkpoint_interval:
+                checkpoint(np.asarray(best, dtype=np.int32), best_score)
+                checkpointed_score, last_checkpoint = best_score, now
+        iterations += 1
+
+        lecture = rng.randrange(n)
+        roll = rng.random()
+        other = None
+        if roll < params.scan_rate or state.start[lecture] == UNPLACED:
+            if state.components['unplaced'] and roll < params.scan_rate:
+                unplaced = [l for l in range(n) if state.start[l] == UNPLACED]
+                lecture = unplaced[rng.randrange(len(unplaced))]
+            deltas = state.move_deltas(lecture)
+            target = int(np.argmin(deltas))
+            delta = float(deltas[target])
+            if target == state.start[lecture] or not math.isfinite(delta):
+                continue
+        elif roll < params.scan_rate + params.swap_rate:
+            group = partners[lecture]
+            other = group[rng.randrange(len(group))]
+            if state.start[other] == state.start[lecture]:
+                continue
+            delta = state.swap_delta(lecture, other)
+        else:
+            target = valid[lecture][rng.randrange(len(valid[lecture]))]
+            delta = state.move_delta(lecture, target)
+
+        score = state.score + delta
+        tabu = tabu_until[lecture] > iterations or (other is not None and tabu_until[other] > iterations)
+        if tabu and score >= best_score:
+            continue
+        if delta > 0 and rng.random() >= math.exp(-delta / temperature):
+            continue
+        if other is None:
+            state.apply_move(lecture, target)
+        else:
+            state.apply_swap(lecture, other)
+            tabu_until[other] = iterations + params.tabu_tenure
+        tabu_until[lecture] = iterations + params.tabu_tenure
+        accepted += 1
+        if state.score < best_score - 1e-9:
+            best, best_score = list(state.start), state.score
+            improvements += 1
+            history.append((round(time.perf_counter() - started, 4), best_score))
+
+    # Clashes carry a large weight but are not forbidden outright; never return one
+    assignment = drop_clashes(problem, np.asarray(best, dtype=np.int32))
+    score, components = score_assignment(problem, assignment, state.weights)
+    if progress is not None:
+        temperature = params.final_temperature
+        report(time.perf_counter(), score, score, components)
+    if checkpoint is not None and score < checkpointed_score:
+        checkpoint(assignment, score)
+    return AnytimeResult(
+        assignment=assignment,
+        score=score,
+        components=components,
+        iterations=iterations,
+        accepted=accepted,
+        improvements=improvements,
+        construction_seconds=construction_seconds,
+        elapsed=time.perf_counter() - started,
+        history=history,
+    )
@@ -3,6 +3,7 @@ from flask_wtf.csrf import CSRFProtect
 from blueprints.college_info_bp import college_info_bp
 from blueprints.department_info import department_info_bp
 from blueprints.timetablegeneration import timetable_bp,csrf
+import instrumentation
 
 
 # Initialize Flask app
@@ -16,6 +17,9 @@ app.register_blueprint(college_info_bp, url_prefix='/college')
 app.register_blueprint(department_info_bp, url_prefix='/department')
 app.register_blueprint(timetable_bp)
 
+# Per-stage latency histograms on /metrics and the slow-request log
+instrumentation.init_app(app)
+
 # Default route
 @app.route('/')
 def home():
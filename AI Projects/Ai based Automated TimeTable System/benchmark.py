@@ -0,0 +1,288 @@
+# benchmark.py
+"""Benchmark of the timetable pipeline on synthetic college workbooks.
+
+Builds a Sheet1/Sheet2/Sheet3 workbook of the requested size (faculty,
+courses, labs, years and semesters per year) and parses it once (the
+``workbook`` stage). For every department it then runs the solver pipeline
+of ``solve_department``, uploads the result and reads the views back, all
+against the in-memory storage backend so no AWS account is touched. Each
+department reports:
+
+- wall time per stage: ``graph_coloring``, ``aco``, ``csp``, ``genetic``
+  (taken from the pipeline's progress callback), ``views`` (class/lab
+  joins and the input snapshot), ``upload`` and ``fetch``;
+- peak memory: process RSS and, with ``--trace-memory``, the tracemalloc
+  peak of the solve (tracing slows the pipeline, so timings taken with it
+  are not comparable to timings taken without it);
+- quality: lectures, unplaced lectures, resource clashes and the
+  ``solution_cost`` the solvers minimise.
+
+Results are written as JSON. ``--compare`` takes an earlier result file
+and prints the per-stage change, for tracking regressions between releases::
+
+    python benchmark.py --faculty 60 --courses 48 --labs 6 --years 4 -o bench.json
+    python benchmark.py --faculty 60 --courses 48 --labs 6 --years 4 --compare bench.json
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Any, Optional
+
+# Must be set before the blueprints create their storage client
+os.environ['TIMETABLE_STORAGE'] = 'memory'
+
+import pandas as pd
+
+try:
+    import resource
+except ImportError:  # Windows: RSS is not reported
+    resource = None
+
+from aco_solver import solution_cost
+from soft_constraints import score_assignment
+from timetable_model import build_problem, count_clashes, encode_faculty_timetable, unplaced_lectures
+from workbook_cache import EMPTY_WORKBOOK, parse_workbook
+
+BENCHMARK_VERSION = 1
+ROMAN = ['I', 'II', 'III', 'IV', 'V', 'VI', 'VII', 'VIII', 'IX', 'X']
+# Share of courses that are laboratory courses when there are labs to hold them
+LAB_SHARE = 0.25
+
+
+def synthetic_sheets(faculty: int, courses: int, labs: int, years: int, semesters: int = 1,
+                     seed: int = 0) -> tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
+    """
+    Sheet1 (faculty), Sheet2 (courses) and Sheet3 (labs) frames in the layout of
+    timetable_data.xlsx. Courses are spread evenly over ``years * semesters`` classes,
+    every course gets one faculty member (round-robin over a shuffled roster, so the
+    teaching load is balanced) and every lab course one of the ``labs`` rooms. With
+    ``labs > 0`` at least one course is a lab course.
+    """
+    if years > len(ROMAN):
+        raise ValueError(f"At most {len(ROMAN)} years are supported")
+    rng = random.Random(seed)
+    numeral = lambda n: ROMAN[n] if n < len(ROMAN) else str(n + 1)
+    classes = [(ROMAN[y], numeral(y * semesters + s)) for y in range(years) for s in range(semesters)]
+    faculty_names = [f"Dr. Faculty {i + 1:03d}, AP - SYN" for i in range(max(faculty, 1))]
+    lab_names = [f"Lab {i + 1:02d}" for i in range(labs)]
+    roster = faculty_names[:]
+    rng.shuffle(roster)
+
+    course_rows, faculty_rows, lab_rows = [], [], []
+    for i in range(courses):
+        year, semester = classes[i % len(classes)]
+        # The last course is a lab if none was drawn, so Sheet3 is never empty when there are labs
+        is_lab = bool(lab_names) and (rng.random() < LAB_SHARE or not lab_rows and i == courses - 1)
+        code = f"SY{ROMAN.index(year) + 1}{i + 1:03d}"
+        name = f"Synthetic {'Laboratory' if is_lab else 'Course'} {i + 1}"
+        course_type = 'Lab' if is_lab else 'Theory'
+        course_rows.append({'S.No': i + 1, 'Semester': semester, 'Year': year, 'No.of.Subjects': 1,
+                            'Course_Code': code, 'Course_Name': name, 'Course_Type': course_type})
+        faculty_rows.append({'S.No': i + 1, 'Faculty_Name': roster[i % len(roster)], 'No.of.Subjects_Handling': 1,
+                             'Course_Code': code, 'Subject': name, 'Subject_Type': course_type, 'Year': year})
+        if is_lab:
+            lab_rows.append({'S.No': len(lab_rows) + 1, 'Lab_Name': lab_names[len(lab_rows) % len(lab_names)],
+                             'No_of_Courses': 1, 'Course_Code': code, 'Course_Name': name, 'Type': 'Lab',
+                             'Year': year})
+
+    handling: dict[str, int] = {}
+    for row in faculty_rows:
+        handling[row['Faculty_Name']] = handling.get(row['Faculty_Name'], 0) + 1
+    for row in faculty_rows:
+        row['No.of.Subjects_Handling'] = handling[row['Faculty_Name']]
+    labs_df = pd.DataFrame(lab_rows, columns=['S.No', 'Lab_Name', 'No_of_Courses', 'Course_Code',
+                                              'Course_Name', 'Type', 'Year'])
+    return pd.DataFrame(faculty_rows), pd.DataFrame(course_rows), labs_df
+
+
+def write_workbook(path: str, sheets: tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]) -> str:
+    with pd.ExcelWriter(path) as writer:
+        for name, frame in zip(('Sheet1', 'Sheet2', 'Sheet3'), sheets):
+            frame.to_excel(writer, sheet_name=name, index=False)
+    return path
+
+
+def peak_rss_mb() -> Optional[float]:
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+def department_rows(rows: list[dict[str, Any]], department: str) -> list[dict[str, Any]]:
+    """The rows solve_department uses for ``department`` (filtered on the Year column)."""
+    if department == "Default Department":
+        return rows
+    year = department.split()[0].strip().upper()
+    return [row for row in rows if str(row.get('Year', '')).strip().upper() == year]
+
+
+def quality_metrics(department: str, data: tuple[list, list, list], faculty_timetable: dict) -> dict[str, Any]:
+    faculty_data, courses_data, labs_data = data
+    problem = build_problem(department_rows(faculty_data, department), courses_data, labs_data)
+    assignment = encode_faculty_timetable(problem, faculty_timetable)
+    soft_score, soft_components = score_assignment(problem, assignment)
+    return {
+        'lectures': problem.n_lectures,
+        'unplaced': len(unplaced_lectures(problem, assignment)),
+        'clashes': count_clashes(problem, assignment),
+        'cost': float(solution_cost(problem, assignment)),
+        'soft_score': round(soft_score, 3),
+        'soft_components': {k: round(v, 3) for k, v in soft_components.items()},
+    }
+
+
+def benchmark_department(tg, department: str, data: tuple[list, list, list],
+                         trace_memory: bool = False, budget: Optional[float] = None) -> dict[str, Any]:
+    stages: dict[str, float] = {}
+
+    def progress(stage: str, fraction: float, best_score: Optional[float] = None, **details) -> None:
+        # Called after each solver stage (repeatedly during the anytime search), so the gap
+        # since the previous call belongs to that stage
+        stages[stage] = round(stages.get(stage, 0.0) + time.perf_counter() - mark[0], 4)
+        mark[0] = time.perf_counter()
+
+    if trace_memory:
+        tracemalloc.start()
+    start = time.perf_counter()
+    mark = [start]
+    faculty_tt, class_tt, lab_tt, _, snapshot = tg.solve_department(department, data=data, progress=progress,
+                                                                    budget=budget)
+    stages['views'] = round(time.perf_counter() - mark[0], 4)
+    solve_seconds = time.perf_counter() - start
+    traced_peak = None
+    if trace_memory:
+        traced_peak = round(tracemalloc.get_traced_memory()[1] / (1024 * 1024), 1)
+        tracemalloc.stop()
+
+    t = time.perf_counter()
+    tg.upload_department_timetables(department, None, faculty_tt, class_tt, lab_tt, snapshot)
+    stages['upload'] = round(time.perf_counter() - t, 4)
+
+    t = time.perf_counter()
+    tg.fetch_department_view(department, 'class')
+    tg.fetch_department_view(department, 'lab')
+    tg.fetch_faculty_timetables(department, list(faculty_tt))
+    stages['fetch'] = round(time.perf_counter() - t, 4)
+
+    return {
+        'department': department,
+        'stages': stages,
+        'solve_seconds': round(solve_seconds, 4),
+        'total_seconds': round(sum(stages.values()), 4),
+        'memory': {'peak_rss_mb': peak_rss_mb(), 'traced_peak_mb': traced_peak},
+        'quality': quality_metrics(department, data, faculty_tt),
+    }
+
+
+def run_benchmark(faculty: int, courses: int, labs: int, years: int, semesters: int = 1, seed: int = 0,
+                  repeat: int = 1, trace_memory: bool = False, budget: Optional[float] = None) -> dict[str, Any]:
+    import blueprints.timetablegeneration as tg
+    # The blueprint configures INFO logging on import; keep the solver logs out of the report
+    logging.getLogger().setLevel(logging.WARNING)
+
+    sheets = synthetic_sheets(faculty, courses, labs, years, semesters, seed)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = write_workbook(os.path.join(tmp, 'benchmark.xlsx'), sheets)
+        t = time.perf_counter()
+        workbook = parse_workbook(path)
+        parse_seconds = time.perf_counter() - t
+    data = (workbook.faculty, workbook.courses, workbook.labs)
+    lectures = sum(build_problem(department_rows(workbook.faculty, department), workbook.courses,
+                                 workbook.labs).n_lectures for department in workbook.departments)
+    if workbook is EMPTY_WORKBOOK or not lectures:
+        raise ValueError(f"The synthetic workbook has no lectures to schedule "
+                         f"(faculty={faculty}, courses={courses}, labs={labs}, years={years})")
+
+    runs = []
+    for run in range(repeat):
+        for department in workbook.departments:
+            result = benchmark_department(tg, department, data, trace_memory, budget)
+            result['run'] = run
+            runs.append(result)
+            print(f"{department} run {run}: {result['total_seconds']}s "
+                  f"unplaced={result['quality']['unplaced']} clashes={result['quality']['clashes']}", file=sys.stderr)
+
+    # The workbook is parsed once for all departments
+    totals: dict[str, float] = {'workbook': parse_seconds * repeat}
+    for result in runs:
+        for stage, seconds in result['stages'].items():
+            totals[stage] = totals.get(stage, 0.0) + seconds
+    return {
+        'benchmark_version': BENCHMARK_VERSION,
+        'created': time.time(),
+        'environment': {'python': platform.python_version(), 'platform': platform.platform(),
+                        'cpus': os.cpu_count()},
+        'config': {'faculty': faculty, 'courses': courses, 'labs': labs, 'years': years,
+                   'semesters': semesters, 'seed': seed, 'repeat': repeat, 'trace_memory': trace_memory,
+                   'budget': budget},
+        'workbook': {'faculty_rows': len(workbook.faculty), 'course_rows': len(workbook.courses),
+                     'lab_rows': len(workbook.labs), 'departments': workbook.departments,
+                     'parse_seconds': round(parse_seconds, 4)},
+        'departments': runs,
+        'summary': {
+            # Per run, so results with different --repeat values stay comparable
+            'stage_seconds': {stage: round(seconds / repeat, 4) for stage, seconds in totals.items()},
+            'total_seconds': round(sum(totals.values()) / repeat, 4),
+            'lectures': sum(r['quality']['lectures'] for r in runs) // repeat,
+            'unplaced': sum(r['quality']['unplaced'] for r in runs) / repeat,
+            'clashes': sum(r['quality']['clashes'] for r in runs) / repeat,
+            'soft_score': round(sum(r['quality']['soft_score'] for r in runs) / repeat, 3),
+            'peak_rss_mb': peak_rss_mb(),
+        },
+    }
+
+
+def compare(current: dict[str, Any], baseline: dict[str, Any]) -> list[str]:
+    """One line per stage and quality metric: baseline, current and the relative change."""
+    lines = []
+    if current.get('config', {}) != baseline.get('config', {}):
+        lines.append("warning: the two results were produced with different configurations")
+    old, new = baseline['summary'], current['summary']
+    stages = list(dict.fromkeys([*old['stage_seconds'], *new['stage_seconds']]))
+    for name, before, after in ([(s, old['stage_seconds'].get(s), new['stage_seconds'].get(s)) for s in stages] +
+                                [(k, old.get(k), new.get(k)) for k in ('total_seconds', 'unplaced', 'clashes', 'soft_score')]):
+        change = f"{(after - before) / before:+.1%}" if before and after is not None else 'n/a'
+        lines.append(f"{name:20} {before!s:>10} -> {after!s:>10}  {change}")
+    return lines
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--faculty', type=int, default=40)
+    parser.add_argument('--courses', type=int, default=32)
+    parser.add_argument('--labs', type=int, default=4)
+    parser.add_argument('--years', type=int, default=4)
+    parser.add_argument('--semesters', type=int, default=1, help="classes (semesters) per year")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeat', type=int, default=1)
+    parser.add_argument('--trace-memory', action='store_true')
+    parser.add_argument('--budget', type=float, help="run the anytime search with this many seconds per department")
+    parser.add_argument('-o', '--output', help="write the JSON result here instead of stdout")
+    parser.add_argument('--compare', metavar='BASELINE', help="earlier result file to compare against")
+    args = parser.parse_args(argv)
+
+    result = run_benchmark(args.faculty, args.courses, args.labs, args.years, args.semesters,
+                           args.seed, args.repeat, args.trace_memory, args.budget)
+    text = json.dumps(result, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text)
+    else:
+        print(text)
+    if args.compare:
+        with open(args.compare) as f:
+            print('\n'.join(compare(result, json.load(f))), file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
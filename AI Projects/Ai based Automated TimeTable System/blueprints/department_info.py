@@ -1,25 +1,28 @@
 # department_info.py
 from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify
-import boto3
-import json
 import logging
 from flask_wtf.csrf import CSRFError
 from flask_wtf.csrf import CSRFProtect
 from flask_wtf.csrf import generate_csrf
+from s3_cache import s3_cache
+from college_manifest import CollegeManifest
+from storage import bucket_name, get_storage
+from timetable_codec import decode as decode_body, put_encoded
+from write_coalescer import WriteCoalescer
 
 
 csrf = CSRFProtect()
 
-# Load AWS credentials
-from aws_credentials import AWS_ACCESS_KEY, AWS_SECRET_KEY, REGION_NAME, BUCKET_NAME
+# Shared storage client (S3, local disk or memory; see storage.py)
+s3_client = get_storage()
+BUCKET_NAME = bucket_name()
 
-# Initialize S3 client
-s3_client = boto3.client(
-    's3',
-    aws_access_key_id=AWS_ACCESS_KEY,
-    aws_secret_access_key=AWS_SECRET_KEY,
-    region_name=REGION_NAME
-)
+# College-wide course and department lists (snapshot plus pending deltas)
+college_manifest = CollegeManifest(s3_client, BUCKET_NAME)
+
+# Batched, conditional writes of the shared departments list
+DEPARTMENTS_KEY = 'college_data/departments.json'
+write_coalescer = WriteCoalescer(s3_client, BUCKET_NAME)
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -29,20 +32,11 @@ department_info_bp = Blueprint('department_info', __name__)
 
 # Helper functions for S3 operations
 def upload_to_s3(data, folder_name, file_name):
-    s3_client.put_object(
-        Bucket=BUCKET_NAME,
-        Key=f'{folder_name}/{file_name}.json',
-        Body=json.dumps(data),
-        ContentType='application/json'
-    )
+    put_encoded(s3_cache, s3_client, data, Bucket=BUCKET_NAME, Key=f'{folder_name}/{file_name}.json')
 
 def download_from_s3(folder_name, file_name):
     try:
-        response = s3_client.get_object(
-            Bucket=BUCKET_NAME,
-            Key=f'{folder_name}/{file_name}.json'
-        )
-        return json.loads(response['Body'].read().decode('utf-8'))
+        return s3_cache.get(s3_client, BUCKET_NAME, f'{folder_name}/{file_name}.json', decode=decode_body)
     except s3_client.exceptions.NoSuchKey:
         logging.warning(f"File not found: {folder_name}/{file_name}.json")
         return {}
@@ -52,31 +46,32 @@ def download_from_s3(folder_name, file_name):
 
 def delete_from_s3(folder_name, file_name):
     try:
-        s3_client.delete_object(
+        s3_cache.delete_object(
+            s3_client,
             Bucket=BUCKET_NAME,
             Key=f'{folder_name}/{file_name}.json'
         )
     except Exception as e:
         logging.error(f"An error occurred while deleting the file {folder_name}/{file_name}.json: {str(e)}")
 
-def list_files_from_s3(folder_name, key):
-    try:
-        response = s3_client.list_objects_v2(Bucket=BUCKET_NAME, Prefix=folder_name)
-        data_list = []
-        if 'Contents' in response:
-            for obj in response['Contents']:
-                file_key = obj['Key']
-                try:
-                    file_response = s3_client.get_object(Bucket=BUCKET_NAME, Key=file_key)
-                    file_data = json.loads(file_response['Body'].read().decode('utf-8'))
-                    if key in file_data and isinstance(file_data[key], list):
-                        data_list.extend(file_data[key])
-                except (json.JSONDecodeError, KeyError) as e:
-                    logging.error(f"Invalid JSON in file {file_key}: {str(e)}")
-        return data_list
-    except Exception as e:
-        logging.error(f"An error occurred while listing files in {folder_name}: {str(e)}")
+def _department_list(value):
+    if not isinstance(value, list):
+        logging.warning(f"Departments data is not a list: {value}. Initializing as empty list.")
         return []
+    return value
+
+def add_department(department_name):
+    def mutation(departments):
+        departments = _department_list(departments)
+        if department_name not in departments:
+            departments.append(department_name)
+        return departments
+    return write_coalescer.update(DEPARTMENTS_KEY, mutation)
+
+def remove_department(department_name):
+    def mutation(departments):
+        return [dept for dept in _department_list(departments) if dept != department_name]
+    return write_coalescer.update(DEPARTMENTS_KEY, mutation)
 
 # Existing route: Insert Department Info
 @department_info_bp.route('/insert_departmentinfo', methods=['GET', 'POST'])
@@ -119,11 +114,8 @@ def insert_departmentinfo():
         department_folder = f'department_data/{department_name}'
         upload_to_s3(department_info, department_folder, department_name)
 
-        # Update the list of departments
-        departments = download_from_s3('college_data', 'departments')
-        if department_name not in departments:
-            departments.append(department_name)
-            upload_to_s3(departments, 'college_data', 'departments')
+        # Update the list of departments (coalesced with concurrent edits, written conditionally)
+        add_department(department_name).result()
 
         flash('Department information added successfully!', 'success')
         return redirect(url_for('department_info.view_departmentinfo'))
@@ -136,8 +128,9 @@ def insert_departmentinfo():
         department_info = download_from_s3(department_folder, edit_department_name)
 
     # Retrieve departments and courses from S3
-    departments = list_files_from_s3('college_data', 'departments')
-    courses_data = list_files_from_s3('college_data', 'courses')
+    college_info = college_manifest.view()
+    departments = college_info['departments']
+    courses_data = [course for course in college_info['courses'] if isinstance(course, dict)]
 
     # Extract course names from the courses data
     courses = [course['name'] for course in courses_data if 'name' in course]
@@ -154,7 +147,7 @@ def insert_departmentinfo():
 @department_info_bp.route('/view_departmentinfo', methods=['GET'])
 def view_departmentinfo():
     # Retrieve the list of departments from S3
-    departments = list_files_from_s3('college_data', 'departments')
+    departments = college_manifest.view()['departments']
 
     # Ensure departments is a list and contains only valid strings
     if not isinstance(departments, list):
@@ -209,15 +202,8 @@ def delete_departmentinfo():
         delete_from_s3(department_folder, department_name)
         logging.info(f"Department {department_name} deleted successfully from S3.")
 
-        departments = download_from_s3('college_data', 'departments')
-        if not isinstance(departments, list):
-            logging.warning(f"Departments data is not a list: {departments}. Initializing as empty list.")
-            departments = []
-
-        if department_name in departments:
-            departments.remove(department_name)
-            upload_to_s3(departments, 'college_data', 'departments')
-            logging.info(f"Updated department list: {departments}")
+        departments = remove_department(department_name).result()
+        logging.info(f"Updated department list: {departments}")
 
         flash(f"Department {department_name} deleted successfully!", "success")
         return jsonify({'success': True, 'message': f'Department {department_name} deleted successfully'})
@@ -1,15 +1,43 @@
-from flask import Blueprint, render_template, request, url_for, jsonify
+from flask import Blueprint, Response, render_template, request, url_for, jsonify
 from flask_wtf.csrf import CSRFProtect, validate_csrf, CSRFError
-import boto3
-import pandas as pd
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Callable, Optional
 import json
-import google.generativeai as genai
-from aws_credentials import AWS_ACCESS_KEY, AWS_SECRET_KEY, REGION_NAME, BUCKET_NAME
-from gemini_api import API_KEY
+from workbook_cache import workbook_cache, TIMETABLE_DATA_FILE
+from job_queue import JobQueue, QueueFull
+from s3_cache import raw_body, s3_cache
+from timetable_codec import decode as decode_body, put_encoded
+from storage import bucket_name, get_storage
+from write_coalescer import MAX_CONFLICT_RETRIES, RETRY_BASE_DELAY, ConflictError, precondition_failed
+from botocore.exceptions import ClientError
+from instrumentation import timed
 import logging
-import re
 import random
+import re
+import threading
+import time
+import click
+import numpy as np
+
+try:
+    import google.generativeai as genai
+    from gemini_api import API_KEY
+except ImportError:  # Gemini is optional: generation, the tests and the offline benchmark run without it
+    genai = None
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from dataclasses import asdict
+from aco_solver import AcoParams, solution_cost, solve_aco
+from anytime_solver import AnytimeParams, solve_anytime
+from csp_solver import solve_csp, unary_constraint_data
+from genetic_solver import GaParams, solve_genetic
+from graph_coloring import solve_graph_coloring
+from incremental_repair import input_snapshot, repair_from_snapshot
+from generation_cache import GenerationCache, generation_key
+from timetable_bundle import BundleChanged, BundleReader, CONTENT_TYPE as BUNDLE_CONTENT_TYPE, FACULTY_PREFIX, \
+    faculty_section, pack_bundle, unpack_bundle
+from timetable_model import (
+    WEEKLY_PLAN, Problem, Timetable, assignment_records, build_class_timetable, build_lab_timetable, build_problem,
+    empty_week, encode_faculty_timetable, unplaced_lectures
+)
 
 # Blueprint for timetable routes
 timetable_bp = Blueprint('timetable', __name__)
@@ -21,77 +49,28 @@ logging.basicConfig(level=logging.INFO)
 csrf = CSRFProtect()
 
 # Configure Gemini API
-genai.configure(api_key=API_KEY)
+if genai is not None:
+    genai.configure(api_key=API_KEY)
 gemini_model = "gemini-2.0-flash-thinking-exp"
 
-# AWS S3 client setup
-s3 = boto3.client(
-    's3',
-    aws_access_key_id=AWS_ACCESS_KEY,
-    aws_secret_access_key=AWS_SECRET_KEY,
-    region_name=REGION_NAME
-)
+# Concurrent reads share the storage client; keep this within storage.S3_MAX_POOL_CONNECTIONS
+S3_FETCH_WORKERS = 16
+
+# Shared storage client (S3, local disk or memory; see storage.py)
+s3 = get_storage()
+BUCKET_NAME = bucket_name()
+
+# Job status lives in storage, so any server process can answer polls for a job
+job_queue = JobQueue(s3, BUCKET_NAME)
 
 # ------------------------------------------------------------------------
 # 1) READ & MERGE EXCEL DATA
 # ------------------------------------------------------------------------
-def read_excel_data(file_path: str = "timetable_data.xlsx") -> tuple[list[dict[str, Any]], list[dict[str, Any]], list[dict[str, Any]]]:
-    try:
-        faculty_df = pd.read_excel(file_path, sheet_name="Sheet1")
-        if faculty_df.empty:
-            logging.error("No data found in Sheet1 (Faculty Details)")
-            return [], [], []
-        
-        courses_df = pd.read_excel(file_path, sheet_name="Sheet2")
-        if courses_df.empty:
-            logging.error("No data found in Sheet2 (Courses)")
-            return [], [], []
-        
-        labs_df = pd.read_excel(file_path, sheet_name="Sheet3")
-        if labs_df.empty:
-            logging.error("No data found in Sheet3 (Labs)")
-            return [], [], []
-        
-        if all(col in faculty_df.columns for col in ["Course_Code"]) and \
-           all(col in courses_df.columns for col in ["Course_Code", "Course_Name"]):
-            faculty_df = faculty_df.merge(
-                courses_df[['Course_Code', 'Course_Name']], 
-                on='Course_Code', 
-                how='left', 
-                suffixes=('', '_course')
-            )
-            if 'Subject' not in faculty_df.columns:
-                faculty_df['Subject'] = faculty_df['Course_Name']
-                logging.info("Created 'Subject' column from Course_Name in faculty data.")
-            else:
-                faculty_df['Subject'] = faculty_df.apply(
-                    lambda row: row['Course_Name'] 
-                                if pd.isna(row['Subject']) or str(row['Subject']).strip() == "" 
-                                else row['Subject'],
-                    axis=1
-                )
-                logging.info("Filled empty 'Subject' values with Course_Name in faculty data.")
-        else:
-            logging.warning("Cannot merge courses because required columns are missing in Sheet1/Sheet2.")
-        
-        no_subject_rows = faculty_df[faculty_df['Subject'].isna() | (faculty_df['Subject'] == '')]
-        if not no_subject_rows.empty:
-            logging.warning("Some faculty rows have no Subject even after merging with courses:")
-            logging.warning(no_subject_rows)
-        
-        faculty_data = faculty_df.to_dict(orient='records')
-        courses_data = courses_df.to_dict(orient='records')
-        labs_data    = labs_df.to_dict(orient='records')
-        
-        logging.info(
-            f"Loaded {len(faculty_data)} faculty records, "
-            f"{len(courses_data)} course records, {len(labs_data)} lab records"
-        )
-        return faculty_data, courses_data, labs_data
-
-    except Exception as e:
-        logging.error(f"Error reading Excel file: {str(e)}")
-        return [], [], []
+@timed('read_excel_data')
+def read_excel_data(file_path: str = TIMETABLE_DATA_FILE) -> tuple[list[dict[str, Any]], list[dict[str, Any]], list[dict[str, Any]]]:
+    # Served from the process-wide cache; the workbook is only re-parsed when it changes on disk.
+    data = workbook_cache.get(file_path)
+    return data.faculty, data.courses, data.labs
 
 # ------------------------------------------------------------------------
 # 2) S3 UPLOAD & FETCH
@@ -111,114 +90,360 @@ def upload_timetable_to_s3(timetable: dict, department: str, type_: str, faculty
         s3_key += f'{type_}_timetable_{sanitize_faculty_name(faculty)}.json'
     else:
         s3_key += f'{type_}_timetable.json'
-    s3.put_object(
-        Bucket=BUCKET_NAME,
-        Key=s3_key,
-        Body=json.dumps(timetable),
-        ContentType='application/json'
-    )
+    # JSON or the compact codec, per TIMETABLE_CODEC (timetable_codec.py)
+    put_encoded(s3_cache, s3, timetable, Bucket=BUCKET_NAME, Key=s3_key)
     logging.info(f"Timetable stored at s3://{BUCKET_NAME}/{s3_key}")
     return s3_key
 
-def fetch_timetable_from_s3(department: str, type_: str, faculty: Optional[str] = None) -> dict:
+def fetch_timetable_from_s3(department: str, type_: str, faculty: Optional[str] = None,
+                            missing_ok: bool = True) -> dict:
     try:
         s3_key = f'timetable_generation/{department}/'
         if faculty:
             s3_key += f'{type_}_timetable_{sanitize_faculty_name(faculty)}.json'
         else:
             s3_key += f'{type_}_timetable.json'
-        response = s3.get_object(Bucket=BUCKET_NAME, Key=s3_key)
-        timetable = json.loads(response['Body'].read().decode('utf-8'))
+        timetable = s3_cache.get(s3, BUCKET_NAME, s3_key, decode=decode_body)
         if not timetable:
             logging.warning(f"Empty timetable fetched from s3://{BUCKET_NAME}/{s3_key}")
         return timetable
     except s3.exceptions.NoSuchKey:
         logging.warning(f"Timetable not found at s3://{BUCKET_NAME}/{s3_key}")
+        if not missing_ok:
+            raise
+        return {}
+
+def fetch_timetables_from_s3(department: str, type_: str,
+                             faculties: list[str]) -> tuple[dict[str, dict], dict[str, str]]:
+    """
+    Fetches one timetable per faculty concurrently on a bounded thread pool.
+    Returns the timetables that could be read and an error message per faculty that could not
+    (missing or unreadable key), so one failing key never blanks the whole page.
+    """
+    timetables: dict[str, dict] = {}
+    errors: dict[str, str] = {}
+    if not faculties:
+        return timetables, errors
+    with ThreadPoolExecutor(max_workers=min(S3_FETCH_WORKERS, len(faculties))) as pool:
+        futures = {pool.submit(fetch_timetable_from_s3, department, type_, fac, missing_ok=False): fac
+                   for fac in faculties}
+        for future in as_completed(futures):
+            fac = futures[future]
+            try:
+                timetables[fac] = future.result()
+            except s3.exceptions.NoSuchKey:
+                timetables[fac] = {}
+                errors[fac] = "none has been generated yet"
+            except Exception as e:
+                logging.error(f"Failed to fetch {type_} timetable for {fac} in {department}: {str(e)}")
+                timetables[fac] = {}
+                errors[fac] = str(e)
+    # Keep the caller's ordering for the template
+    return {fac: timetables[fac] for fac in faculties}, errors
+
+# Per-department bundle (timetable_bundle.py): every view in one object; the per-view
+# JSON keys above are still written so older readers keep working
+WRITE_LEGACY_KEYS = True
+_bundle_locks: dict[str, threading.Lock] = {}
+_bundle_locks_guard = threading.Lock()
+
+def bundle_key(department: str) -> str:
+    return f'timetable_generation/{department}/bundle.ttb'
+
+def _bundle_reader(department: str) -> BundleReader:
+    s3_key = bundle_key(department)
+
+    def fetch(start: int, end: int, etag: Optional[str]) -> tuple[bytes, str]:
+        # The probe is always revalidated (a 304 when unchanged); later ranges must match its ETag
+        try:
+            return s3_cache.get_with_etag(s3, BUCKET_NAME, s3_key, decode=raw_body, range_=f'bytes={start}-{end}',
+                                          if_match=etag, max_age=0 if etag is None else None)
+        except ClientError as e:
+            if etag is not None and precondition_failed(e):
+                raise BundleChanged(s3_key) from e
+            raise
+    return BundleReader(fetch)
+
+def upload_department_bundle(department: str, faculty: Optional[str], faculty_timetable: dict,
+                             class_timetable: dict, lab_timetable: dict,
+                             generation: Optional[str] = None) -> str:
+    """
+    Writes the department bundle. A single-faculty run only replaces that faculty's section
+    (and the class/lab views), keeping the other faculty already in the bundle.
+    ``generation`` (the generation_cache key of the run) is recorded in the manifest.
+
+    The merge is a conditional PUT on the ETag it read (IfNoneMatch='*' when there is no
+    bundle yet), so a merge from another process in between is re-read and merged again
+    rather than overwritten. The lock only saves the retries within this process.
+    """
+    s3_key = bundle_key(department)
+    with _bundle_locks_guard:
+        lock = _bundle_locks.setdefault(department, threading.Lock())
+    with lock:
+        for attempt in range(MAX_CONFLICT_RETRIES + 1):
+            sections: dict[str, Any] = {}
+            condition: dict[str, str] = {}
+            if faculty:
+                try:
+                    body, etag = s3_cache.get_with_etag(s3, BUCKET_NAME, s3_key, decode=raw_body, max_age=0)
+                    condition = {'IfMatch': etag}
+                    _, sections = unpack_bundle(body)
+                except s3.exceptions.NoSuchKey:
+                    condition = {'IfNoneMatch': '*'}
+                except ValueError as e:
+                    logging.warning(f"Replacing unreadable bundle s3://{BUCKET_NAME}/{s3_key}: {str(e)}")
+            sections['class'] = class_timetable
+            sections['lab'] = lab_timetable
+            for name, week in faculty_timetable.items():
+                sections[faculty_section(name)] = week
+            # Class and lab first, then faculty in name order, so any run of sections is one byte range
+            ordered = {name: sections[name] for name in sorted(sections, key=lambda n: (n.startswith(FACULTY_PREFIX), n))}
+            try:
+                s3_cache.put_object(
+                    s3,
+                    Bucket=BUCKET_NAME,
+                    Key=s3_key,
+                    Body=pack_bundle(ordered, department=department,
+                                     generation={'scope': faculty or '', 'key': generation}),
+                    ContentType=BUNDLE_CONTENT_TYPE,
+                    **condition
+                )
+                break
+            except ClientError as e:
+                if not condition or not precondition_failed(e):
+                    raise
+            logging.warning(f"s3://{BUCKET_NAME}/{s3_key} changed while merging {faculty}, retrying")
+            time.sleep(RETRY_BASE_DELAY * 2 ** attempt * (1 + random.random()))
+        else:
+            raise ConflictError(f"{s3_key} changed on every one of {MAX_CONFLICT_RETRIES + 1} attempts")
+    logging.info(f"Timetable bundle stored at s3://{BUCKET_NAME}/{s3_key}")
+    return s3_key
+
+def bundle_generation(department: str) -> Optional[dict]:
+    """The scope and generation key of the run that last wrote the department bundle."""
+    try:
+        return _bundle_reader(department).manifest.get('generation')
+    except s3.exceptions.NoSuchKey:
+        return None
+    except ValueError as e:
+        logging.warning(f"Unreadable bundle for {department}: {str(e)}")
+        return None
+
+def fetch_department_view(department: str, type_: str) -> dict:
+    """Class or lab view from the department bundle (one or two ranged GETs), else the legacy key."""
+    try:
+        view = _bundle_reader(department).section(type_)
+        if view is not None:
+            return view
+    except s3.exceptions.NoSuchKey:
+        pass
+    except ValueError as e:
+        logging.warning(f"Unreadable bundle for {department}: {str(e)}")
+    return fetch_timetable_from_s3(department, type_)
+
+def fetch_faculty_timetables(department: str, faculties: list[str]) -> tuple[dict[str, dict], dict[str, str]]:
+    """
+    Faculty weeks for the faculty page from one ranged read of the bundle's faculty sections.
+    Every generation writes the bundle, so once it exists faculty missing from it have no
+    timetable in this department; without a bundle the concurrent per-faculty fetch is used.
+    """
+    try:
+        sections = _bundle_reader(department).sections(faculty_section(fac) for fac in faculties)
+        weeks = {name[len(FACULTY_PREFIX):]: week for name, week in sections.items()}
+        return {fac: weeks.get(fac, {}) for fac in faculties}, {}
+    except s3.exceptions.NoSuchKey:
+        pass
+    except ValueError as e:
+        logging.warning(f"Unreadable bundle for {department}: {str(e)}")
+    legacy, errors = fetch_timetables_from_s3(department, 'faculty', faculties)
+    # Legacy per-faculty objects hold {faculty: week}
+    return {fac: tt.get(fac, tt) for fac, tt in legacy.items()}, errors
+
+def input_snapshot_key(department: str, faculty: Optional[str] = None) -> str:
+    suffix = f'_{sanitize_faculty_name(faculty)}' if faculty else ''
+    return f'timetable_generation/{department}/input_snapshot{suffix}.json'
+
+def upload_input_snapshot(snapshot: dict, department: str, faculty: Optional[str] = None) -> str:
+    """Stores the input and lecture assignment behind a timetable, for incremental repair."""
+    s3_key = input_snapshot_key(department, faculty)
+    put_encoded(s3_cache, s3, snapshot, Bucket=BUCKET_NAME, Key=s3_key)
+    return s3_key
+
+def generation_result_key(department: str, faculty: Optional[str] = None) -> str:
+    suffix = f'_{sanitize_faculty_name(faculty)}' if faculty else ''
+    return f'timetable_generation/{department}/generation_result{suffix}.json'
+
+# Memoised results of generate_all_timetables (generation_cache.py)
+generation_cache = GenerationCache(s3, BUCKET_NAME, generation_result_key)
+
+def anytime_checkpoint_key(department: str, faculty: Optional[str] = None) -> str:
+    suffix = f'_{sanitize_faculty_name(faculty)}' if faculty else ''
+    return f'timetable_generation/{department}/anytime_checkpoint{suffix}.json'
+
+def upload_anytime_checkpoint(department: str, faculty: Optional[str], faculty_timetable: dict,
+                              score: float) -> str:
+    """Best-so-far faculty timetable of a running anytime search."""
+    s3_key = anytime_checkpoint_key(department, faculty)
+    put_encoded(s3_cache, s3, {'score': score, 'saved': time.time(), 'faculty_timetable': faculty_timetable},
+                Bucket=BUCKET_NAME, Key=s3_key)
+    logging.info(f"Anytime checkpoint (score {score:.3f}) saved to s3://{BUCKET_NAME}/{s3_key}")
+    return s3_key
+
+def fetch_input_snapshot(department: str, faculty: Optional[str] = None) -> dict:
+    s3_key = input_snapshot_key(department, faculty)
+    try:
+        return s3_cache.get(s3, BUCKET_NAME, s3_key, decode=decode_body)
+    except s3.exceptions.NoSuchKey:
+        logging.info(f"No input snapshot at s3://{BUCKET_NAME}/{s3_key}; running a full generation")
         return {}
 
 # ------------------------------------------------------------------------
 # 3) ACO ALGORITHM (no lunch)
 # ------------------------------------------------------------------------
-def run_aco(data: list[dict[str, Any]], constraints: list[str], faculty: Optional[str] = None) -> dict:
+# Number of parallel colonies; None lets aco_solver pick one per CPU (up to 4)
+ACO_COLONIES: Optional[int] = None
+# Seed for the ACO and GA random streams; None draws a fresh one per run
+SOLVER_SEED: Optional[int] = None
+
+@timed('run_aco')
+def run_aco(data: list[dict[str, Any]], constraints: list[str], faculty: Optional[str] = None,
+            courses_data: Optional[list[dict[str, Any]]] = None,
+            labs_data: Optional[list[dict[str, Any]]] = None, initial: Optional[Timetable] = None,
+            problem: Optional[Problem] = None) -> Timetable:
     """
-    Creates a timetable using a simplified ACO-like approach:
+    Creates a timetable with the ant-colony solver in aco_solver:
     - If a specific faculty is provided, it builds that faculty's schedule using all matching rows (ignoring department filter).
-    - Otherwise, builds schedules for all faculties (using department filtering).
-    - Each subject is randomly assigned to an available slot.
+    - Otherwise, builds schedules for all faculties together, so no faculty, class or lab slot is double-booked.
+    - Lectures that cannot be placed without a clash are left out and logged.
+    - An ``initial`` timetable (e.g. the graph-colouring result) seeds every colony's best tour.
+    ``problem`` is the lecture problem already built from the same rows, if the caller has one.
     """
-    timetable = {}
-    days = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday']
-    periods = 8
-
     if faculty:
         # Use case-insensitive matching on Faculty_Name.
         faculty_lower = faculty.strip().lower()
-        faculty_data = [d for d in data if d.get('Faculty_Name', '').strip().lower() == faculty_lower]
-        if not faculty_data:
+        data = [d for d in data if str(d.get('Faculty_Name') or '').strip().lower() == faculty_lower]
+        if not data:
             logging.warning(f"No data found for faculty: {faculty}")
-            timetable[faculty] = {day: {f'Period{p+1}': '-' for p in range(periods)} for day in days}
-            return timetable
-        
-        timetable[faculty] = {day: {f'Period{p+1}': '-' for p in range(periods)} for day in days}
-        subjects = [(d.get('Subject'), d.get('Course_Code')) for d in faculty_data if d.get('Subject')]
-        logging.info(f"Subjects for {faculty}: {subjects}")
-        for subject, code in subjects:
-            assigned = False
-            attempts = 0
-            max_attempts = 20
-            while not assigned and attempts < max_attempts:
-                day = random.choice(days)
-                period = f'Period{random.randint(1, periods)}'
-                if timetable[faculty][day][period] == '-':
-                    timetable[faculty][day][period] = f"{subject} ({code})"
-                    assigned = True
-                attempts += 1
-            if not assigned:
-                logging.warning(f"Could not assign {subject} ({code}) for {faculty} due to slot unavailability")
-    else:
-        faculties = {d.get('Faculty_Name') for d in data if d.get('Faculty_Name')}
-        for fac in faculties:
-            fac_data = [d for d in data if d.get('Faculty_Name') == fac]
-            timetable[fac] = {day: {f'Period{p+1}': '-' for p in range(periods)} for day in days}
-            subjects = [(d.get('Subject'), d.get('Course_Code')) for d in fac_data if d.get('Subject')]
-            logging.info(f"Subjects for {fac}: {subjects}")
-            for subject, code in subjects:
-                assigned = False
-                attempts = 0
-                max_attempts = 20
-                while not assigned and attempts < max_attempts:
-                    day = random.choice(days)
-                    period = f'Period{random.randint(1, periods)}'
-                    if timetable[fac][day][period] == '-':
-                        timetable[fac][day][period] = f"{subject} ({code})"
-                        assigned = True
-                    attempts += 1
-                if not assigned:
-                    logging.warning(f"Could not assign {subject} ({code}) for {fac} due to slot unavailability")
-    return timetable
+            return Timetable.from_dict({faculty: empty_week()})
+
+    if problem is None:
+        problem = build_problem(data, courses_data or [], labs_data or [])
+    seed_assignment = encode_faculty_timetable(problem, initial) if initial else None
+    result = solve_aco(problem, n_colonies=ACO_COLONIES, seed=SOLVER_SEED, initial=seed_assignment)
+    stats = result.stats()
+    logging.info(
+        f"ACO finished: cost={stats['cost']} unplaced={stats['unplaced']} "
+        f"iterations={stats['iterations']} colonies={stats['colonies']} "
+        f"ants={stats['ants_evaluated']} in {stats['elapsed_seconds']}s"
+    )
+    for l in unplaced_lectures(problem, result.assignment):
+        names = ', '.join(problem.faculty_names[f] for f in problem.lec_faculty[l])
+        logging.warning(f"Could not assign {problem.labels[l]} for {names} without a clash")
+
+    return Timetable.from_assignment(problem, result.assignment)
 
 # ------------------------------------------------------------------------
 # 4) CSP (No Overlaps)
 # ------------------------------------------------------------------------
-def run_csp(timetable: dict, constraints: list[str]) -> dict:
-    for key, schedule in timetable.items():
-        for day, periods in schedule.items():
-            assigned_periods = [p for p, sub in periods.items() if sub != '-']
-            if len(assigned_periods) > len(set(assigned_periods)):
-                logging.warning(f"Overlap detected in {key}'s timetable for {day}")
-    return timetable
+CSP_MAX_LECTURES = 300
+CSP_TIMEOUT_SECONDS = 5.0
+
+@timed('run_csp')
+def run_csp(timetable: Timetable, constraints: list[str], problem: Optional[Problem] = None,
+            **unary_data) -> Timetable:
+    """
+    Solves the lecture problem exactly with the backtracking solver in csp_solver.
+    The incoming timetable is used as the value-ordering hint, so a clash-free ACO result
+    is usually confirmed without backtracking. Departments larger than CSP_MAX_LECTURES,
+    and the derived class/lab views (no problem given), are returned unchanged.
+    ``unary_data`` (maintenance windows, lab capacities, class sizes) comes from
+    csp_solver.unary_constraint_data.
+    """
+    if problem is None or problem.n_lectures == 0 or problem.n_lectures > CSP_MAX_LECTURES:
+        return timetable
+    hint = encode_faculty_timetable(problem, timetable)
+    result = solve_csp(problem, constraints, timeout=CSP_TIMEOUT_SECONDS, hint=hint, **unary_data)
+    stats = result.stats()
+    logging.info(
+        f"CSP finished: complete={stats['complete']} unplaced={stats['unplaced']} "
+        f"nodes={stats['nodes']} timed_out={stats['timed_out']} in {stats['elapsed_seconds']}s"
+    )
+    # Keep the incoming timetable when the (possibly timed-out) search placed fewer lectures
+    if (result.assignment >= 0).sum() < (hint >= 0).sum():
+        return timetable
+    return Timetable.from_assignment(problem, result.assignment)
 
 # ------------------------------------------------------------------------
-# 5) Graph Coloring (Placeholder)
+# 5) Graph Coloring (DSatur)
 # ------------------------------------------------------------------------
-def run_graph_coloring(timetable: dict, constraints: list[str]) -> dict:
-    return timetable
+@timed('run_graph_coloring')
+def run_graph_coloring(timetable: Optional[Timetable], constraints: list[str],
+                       problem: Optional[Problem] = None) -> Timetable:
+    """
+    Colours the lecture conflict graph with DSatur (graph_coloring.py).
+    Lectures already present in ``timetable`` keep their slots when they are clash-free;
+    the rest are placed deterministically, giving ACO and GA a clash-free starting point.
+    """
+    if problem is None or problem.n_lectures == 0:
+        return timetable if timetable is not None or problem is None else Timetable.blank(problem)
+    fixed = encode_faculty_timetable(problem, timetable) if timetable is not None else None
+    result = solve_graph_coloring(problem, fixed)
+    stats = result.stats()
+    logging.info(
+        f"Graph colouring finished: placed={stats['placed']} unplaced={stats['unplaced']} "
+        f"repaired={stats['repaired']} in {stats['elapsed_ms']}ms"
+    )
+    for l in result.unplaced:
+        logging.warning(f"Graph colouring could not place {problem.labels[l]}")
+    return Timetable.from_assignment(problem, result.assignment)
 
 # ------------------------------------------------------------------------
-# 6) Genetic Algorithm (Placeholder)
+# 6) Genetic Algorithm
 # ------------------------------------------------------------------------
-def run_genetic(timetable: dict, constraints: list[str]) -> dict:
-    return timetable
+@timed('run_genetic')
+def run_genetic(timetable: Timetable, constraints: list[str], problem: Optional[Problem] = None) -> Timetable:
+    """
+    Improves a faculty timetable with the batched genetic algorithm in genetic_solver.
+    The incoming timetable (usually the ACO result) seeds the population; the best
+    individual is returned clash-free, so the result is never worse than the seed.
+    """
+    if problem is None or problem.n_lectures == 0:
+        return timetable
+    seed_assignment = encode_faculty_timetable(problem, timetable)
+    result = solve_genetic(problem, [seed_assignment], seed=SOLVER_SEED)
+    stats = result.stats()
+    logging.info(
+        f"GA finished: fitness={stats['fitness']} {stats['components']} "
+        f"generations={stats['generations']} in {stats['elapsed_seconds']}s"
+    )
+    return Timetable.from_assignment(problem, result.assignment)
+
+# ------------------------------------------------------------------------
+# 6b) Anytime search (time-budgeted alternative to stages 3-6)
+# ------------------------------------------------------------------------
+# Longest budget a request may ask for, in seconds
+ANYTIME_MAX_BUDGET = 60.0
+
+@timed('run_anytime')
+def run_anytime(problem: Problem, budget: float, initial: Optional[np.ndarray] = None,
+                progress: Optional[Callable[[dict[str, Any]], None]] = None,
+                checkpoint: Optional[Callable[[Timetable, float], None]] = None) -> Timetable:
+    """
+    Graph colouring followed by simulated annealing with a tabu list (anytime_solver.py),
+    stopping after ``budget`` seconds. ``progress(stats)`` receives the score, unplaced count
+    and iteration rate as the search runs; ``checkpoint(timetable, score)`` the best so far.
+    """
+    def save(assignment: np.ndarray, score: float) -> None:
+        checkpoint(Timetable.from_assignment(problem, assignment), score)
+
+    result = solve_anytime(problem, AnytimeParams(budget=budget), initial=initial, seed=SOLVER_SEED,
+                           progress=progress, checkpoint=save if checkpoint is not None else None)
+    stats = result.stats()
+    logging.info(
+        f"Anytime search finished: score={stats['score']} {stats['components']} "
+        f"iterations={stats['iterations']} ({stats['iterations_per_second']}/s) in {stats['elapsed_seconds']}s"
+    )
+    return Timetable.from_assignment(problem, result.assignment)
 
 # ------------------------------------------------------------------------
 # 7) Constraints
@@ -234,93 +459,353 @@ def apply_constraints(data: list[dict[str, Any]], timetable_type: str) -> list[s
 # ------------------------------------------------------------------------
 # 8) GENERATE ALL TIMETABLES
 # ------------------------------------------------------------------------
-def generate_all_timetables(department: str, faculty: Optional[str] = None) -> tuple[dict, dict, dict, str]:
-    faculty_data, courses_data, labs_data = read_excel_data()
-    if not any([faculty_data, courses_data, labs_data]):
-        logging.error("No data loaded from Excel; cannot generate timetables")
-        return {}, {}, {}, "Error: No data loaded"
+def filter_by_department(all_data: list[dict[str, Any]], department: str) -> list[dict[str, Any]]:
+    """Rows whose "Year" column matches the department ("II Year" -> "II")."""
+    if department == "Default Department":
+        return all_data
+    year_str = department.split()[0].strip().upper()
+    filtered = []
+    for row in all_data:
+        row_year = str(row.get('Year', '')).strip().upper()
+        if row_year == year_str:
+            filtered.append(row)
+    return filtered
 
+def department_rows(department: str, faculty: Optional[str],
+                    data: tuple[list, list, list]) -> tuple[list, list, list]:
+    """(faculty rows, course rows, lab rows) a department or faculty run is solved from."""
+    faculty_data, courses_data, labs_data = data
     # If a faculty is specified, do not filter the faculty_data by department.
     if faculty:
-        dept_faculty = [d for d in faculty_data if d.get('Faculty_Name', '').strip().lower() == faculty.strip().lower()]
+        dept_faculty = [d for d in faculty_data if str(d.get('Faculty_Name') or '').strip().lower() == faculty.strip().lower()]
     else:
-        # Otherwise, filter by the department using the "Year" column.
-        def filter_by_department(all_data: list[dict[str, Any]]) -> list[dict[str, Any]]:
-            if department == "Default Department":
-                return all_data
-            year_str = department.split()[0].strip().upper()
-            filtered = []
-            for row in all_data:
-                row_year = str(row.get('Year', '')).strip().upper()
-                if row_year == year_str:
-                    filtered.append(row)
-            return filtered
-        dept_faculty = filter_by_department(faculty_data)
-
+        dept_faculty = filter_by_department(faculty_data, department)
     # For courses and labs, we still filter by department.
-    def filter_by_department(all_data: list[dict[str, Any]]) -> list[dict[str, Any]]:
-        if department == "Default Department":
-            return all_data
-        year_str = department.split()[0].strip().upper()
-        filtered = []
-        for row in all_data:
-            row_year = str(row.get('Year', '')).strip().upper()
-            if row_year == year_str:
-                filtered.append(row)
-        return filtered
-
-    dept_courses = filter_by_department(courses_data)
-    dept_labs    = filter_by_department(labs_data)
+    return dept_faculty, filter_by_department(courses_data, department), filter_by_department(labs_data, department)
 
+def department_constraints(dept_faculty: list[dict[str, Any]],
+                           dept_labs: list[dict[str, Any]]) -> tuple[list[str], list[str]]:
+    """(faculty constraints, constraints the CSP solver checks)."""
     faculty_constraints = apply_constraints(dept_faculty, "general") + apply_constraints(dept_faculty, "course")
-    faculty_timetable = run_aco(dept_faculty, faculty_constraints, faculty)
-    faculty_timetable = run_csp(faculty_timetable, faculty_constraints)
-    faculty_timetable = run_graph_coloring(faculty_timetable, faculty_constraints)
-    faculty_timetable = run_genetic(faculty_timetable, faculty_constraints)
+    # Lab lectures are scheduled together with the faculty, so the lab constraints apply here too
+    return faculty_constraints, faculty_constraints + apply_constraints(dept_labs, "lab")
+
+def solver_settings(aco_colonies: Optional[int] = None, budget: Optional[float] = None) -> dict[str, Any]:
+    """Everything besides the input rows that shapes a generated timetable."""
+    return {
+        'anytime': asdict(AnytimeParams(budget=budget)) if budget is not None else None,
+        'aco': asdict(AcoParams()),
+        'aco_colonies': aco_colonies,
+        'ga': asdict(GaParams()),
+        'csp_max_lectures': CSP_MAX_LECTURES,
+        'csp_timeout_seconds': CSP_TIMEOUT_SECONDS,
+        'weekly_plan': WEEKLY_PLAN,
+        'seed': SOLVER_SEED,
+    }
+
+def department_generation_key(department: str, faculty: Optional[str], data: tuple[list, list, list],
+                              aco_colonies: Optional[int] = None, budget: Optional[float] = None) -> str:
+    """generation_cache key of a run: its filtered rows, constraints and solver settings."""
+    faculty_data, courses_data, labs_data = data
+    dept_faculty, dept_courses, dept_labs = department_rows(department, faculty, data)
+    _, solver_constraints = department_constraints(dept_faculty, dept_labs)
+    # build_problem looks course and lab details up in the full sheets, by course code
+    codes = {str(row.get('Course_Code') or '').strip() for row in dept_faculty}
+    referenced = lambda rows: [row for row in rows if str(row.get('Course_Code') or '').strip() in codes]
+    rows = {
+        'faculty': dept_faculty,
+        'courses': dept_courses,
+        'labs': dept_labs,
+        'referenced_courses': referenced(courses_data),
+        'referenced_labs': referenced(labs_data),
+    }
+    settings = {**solver_settings(aco_colonies, budget), 'department': department, 'faculty': faculty or ''}
+    return generation_key(rows, solver_constraints, settings)
+
+def solve_department(department: str, faculty: Optional[str] = None,
+                     data: Optional[tuple[list, list, list]] = None,
+                     progress: Optional[Callable[..., None]] = None,
+                     previous: Optional[dict] = None, budget: Optional[float] = None,
+                     checkpoint: Optional[Callable[[dict, float], None]] = None) -> tuple[dict, dict, dict, str, dict]:
+    """
+    Runs the solver pipeline for one department (or faculty) without touching S3.
+    ``progress(stage, fraction, best_score)`` is called after each solver stage; the score
+    is aco_solver.solution_cost of that stage's timetable (lower is better).
+    With a ``previous`` input snapshot only the lectures whose input changed are re-placed
+    (incremental_repair.py); otherwise the full pipeline runs. The new input snapshot is
+    returned as the last element.
+    With a ``budget`` (seconds) the anytime search replaces ACO, CSP and GA: its progress
+    score is the soft_constraints score instead, the other live statistics (unplaced count,
+    iterations per second, ...) come as keyword arguments, and ``checkpoint(faculty
+    timetable, score)`` receives the best timetable found so far.
+    """
+    faculty_data, courses_data, labs_data = data if data is not None else read_excel_data()
+    if not any([faculty_data, courses_data, labs_data]):
+        logging.error("No data loaded from Excel; cannot generate timetables")
+        return {}, {}, {}, "Error: No data loaded", {}
+
+    dept_faculty, dept_courses, dept_labs = department_rows(department, faculty, data=(faculty_data, courses_data, labs_data))
+    faculty_constraints, solver_constraints = department_constraints(dept_faculty, dept_labs)
+    problem = build_problem(dept_faculty, courses_data, labs_data)
+
+    def report(stage: str, fraction: float, timetable: Timetable) -> None:
+        if progress is not None:
+            progress(stage, fraction, solution_cost(problem, encode_faculty_timetable(problem, timetable)))
+
+    def named(faculty_timetable: dict) -> dict:
+        if faculty:
+            # Key the schedule by the name the caller asked for
+            return {faculty: next(iter(faculty_timetable.values()), empty_week())}
+        return faculty_timetable
+
+    repair = repair_from_snapshot(problem, previous, dept_faculty) if previous else None
+    if budget is not None:
+        checkpointed: dict[str, Any] = {}
+
+        def anytime_progress(stats: dict[str, Any]) -> None:
+            if progress is not None:
+                fraction = 0.05 + 0.85 * min(stats['elapsed_seconds'] / budget, 1.0) if budget else 0.9
+                progress('anytime', fraction, **stats, **checkpointed)
+
+        def anytime_checkpoint(timetable: Timetable, score: float) -> None:
+            checkpointed['checkpoint_score'] = round(score, 3)
+            if checkpoint is not None:
+                checkpoint(named(timetable.to_dict()), score)
+
+        # An incremental repair, when there is one, is where the search starts
+        timetable = run_anytime(problem, budget, repair.assignment if repair is not None else None,
+                                progress=anytime_progress, checkpoint=anytime_checkpoint)
+    elif repair is not None:
+        stats = repair.stats()
+        logging.info(
+            f"Incremental repair for {faculty or department}: kept={stats['kept']} "
+            f"replaced={stats['replaced']} unplaced={stats['unplaced']} "
+            f"rows +{stats['rows_added']}/-{stats['rows_removed']} in {stats['elapsed_ms']}ms"
+        )
+        for l in repair.unplaced:
+            logging.warning(f"Incremental repair could not place {problem.labels[l]}")
+        timetable = Timetable.from_assignment(problem, repair.assignment)
+        report('incremental_repair', 0.85, timetable)
+    else:
+        # Stages hand each other the array-backed Timetable; dicts are only built for upload below
+        timetable = run_graph_coloring(None, faculty_constraints, problem)
+        report('graph_coloring', 0.1, timetable)
+        timetable = run_aco(dept_faculty, faculty_constraints, faculty, courses_data, labs_data,
+                            initial=timetable, problem=problem)
+        report('aco', 0.5, timetable)
+        timetable = run_csp(timetable, solver_constraints, problem, **unary_constraint_data(courses_data, labs_data))
+        report('csp', 0.6, timetable)
+        timetable = run_genetic(timetable, faculty_constraints, problem)
+        report('genetic', 0.85, timetable)
+    assignment = encode_faculty_timetable(problem, timetable)
+    records = assignment_records(problem, assignment)
+    faculty_timetable = named(timetable.to_dict())
     if not faculty_timetable:
         logging.warning(f"Faculty timetable empty for {faculty or 'all'} in {department}")
 
-    class_constraints = apply_constraints(dept_courses, "general") + apply_constraints(dept_courses, "course")
-    class_timetable = {}
-    for course in dept_courses:
-        year = course['Year']
-        semester = course['Semester']
-        class_timetable.setdefault(year, {}).setdefault(semester, {})
-        for fac in dept_faculty:
-            if course['Course_Code'] == fac.get('Course_Code', ''):
-                fac_timetable = faculty_timetable.get(fac['Faculty_Name'], {})
-                for day, periods in fac_timetable.items():
-                    for period, subject_info in periods.items():
-                        if subject_info != '-' and course['Course_Name'] in subject_info:
-                            class_timetable[year][semester][f'{day} {period}'] = subject_info
-
-    class_timetable = run_csp(class_timetable, class_constraints)
+    # Class and lab views are hash joins of the assignment records on Course_Code and (Year, Semester)
+    class_timetable = build_class_timetable(records, dept_courses)
     if not class_timetable:
         logging.warning(f"Class timetable empty for {department}")
 
-    lab_constraints = apply_constraints(dept_labs, "general") + apply_constraints(dept_labs, "lab")
-    lab_timetable = {}
-    for lab in dept_labs:
-        lab_timetable[lab['Lab_Name']] = {}
-        for course in dept_courses:
-            if course['Course_Code'] == lab['Course_Code'] and lab['Type'] == 'Lab':
-                year = course['Year']
-                semester = course['Semester']
-                for time_slot, subject_info in class_timetable.get(year, {}).get(semester, {}).items():
-                    if course['Course_Name'] in subject_info:
-                        lab_timetable[lab['Lab_Name']][time_slot] = subject_info
-    lab_timetable = run_csp(lab_timetable, lab_constraints)
+    lab_timetable = build_lab_timetable(records, dept_courses, dept_labs)
     if not lab_timetable:
         logging.warning(f"Lab timetable empty for {department}")
 
-    if faculty:
-        upload_timetable_to_s3(faculty_timetable, department, 'faculty', faculty)
-    else:
-        upload_timetable_to_s3(faculty_timetable, department, 'faculty')
-    upload_timetable_to_s3(class_timetable, department, 'class')
-    upload_timetable_to_s3(lab_timetable, department, 'lab')
+    snapshot = input_snapshot(problem, assignment, dept_faculty)
+    return faculty_timetable, class_timetable, lab_timetable, "No suggestions", snapshot
+
+def upload_department_timetables(department: str, faculty: Optional[str], faculty_timetable: dict,
+                                 class_timetable: dict, lab_timetable: dict,
+                                 snapshot: Optional[dict] = None, generation: Optional[str] = None) -> list[str]:
+    keys = [upload_department_bundle(department, faculty, faculty_timetable, class_timetable, lab_timetable,
+                                     generation)]
+    if WRITE_LEGACY_KEYS:
+        keys += [
+            upload_timetable_to_s3(faculty_timetable, department, 'faculty', faculty),
+            upload_timetable_to_s3(class_timetable, department, 'class'),
+            upload_timetable_to_s3(lab_timetable, department, 'lab'),
+        ]
+    if snapshot:
+        keys.append(upload_input_snapshot(snapshot, department, faculty))
+    return [key for key in keys if key]
+
+def generate_all_timetables(department: str, faculty: Optional[str] = None,
+                            progress: Optional[Callable[..., None]] = None,
+                            incremental: bool = False,
+                            use_cache: bool = True,
+                            budget: Optional[float] = None) -> tuple[dict, dict, dict, str, bool]:
+    """
+    Generates and uploads one department's (or faculty's) timetables. With ``incremental``
+    the input snapshot of the previous run is diffed against the current rows and only
+    changed lectures move; without a stored snapshot this falls back to a full generation.
+
+    Unless ``use_cache`` is off, a run whose rows, constraints and solver settings match a
+    stored result returns that result without solving; the last element says whether it did.
+
+    With a ``budget`` in seconds this runs the anytime search instead of the full pipeline,
+    reports its score, unplaced count and iteration rate through ``progress`` and
+    checkpoints the best timetable so far to anytime_checkpoint_key.
+    """
+    data = read_excel_data()
+    key = department_generation_key(department, faculty, data, ACO_COLONIES, budget) if use_cache else None
+    cached = generation_cache.get(department, faculty, key) if key is not None else None
+    if cached is not None:
+        logging.info(f"Reusing cached timetables for {department} / {faculty or 'all faculty'}")
+        if progress is not None:
+            progress('cached', 0.9)
+        # Another scope may have rewritten the bundle since; put this result back
+        if bundle_generation(department) != {'scope': faculty or '', 'key': key}:
+            upload_department_timetables(department, faculty, cached['faculty_timetable'],
+                                         cached['class_timetable'], cached['lab_timetable'],
+                                         cached['snapshot'], key)
+        return (cached['faculty_timetable'], cached['class_timetable'], cached['lab_timetable'],
+                cached['suggestion'], True)
+
+    previous = fetch_input_snapshot(department, faculty) if incremental else None
+    def save_checkpoint(faculty_timetable: dict, score: float) -> None:
+        try:
+            upload_anytime_checkpoint(department, faculty, faculty_timetable, score)
+        except Exception as e:
+            logging.warning(f"Could not save anytime checkpoint for {department}: {str(e)}")
+    checkpoint = save_checkpoint if budget is not None else None
+    faculty_timetable, class_timetable, lab_timetable, suggestion, snapshot = solve_department(
+        department, faculty, progress=progress, previous=previous, data=data, budget=budget,
+        checkpoint=checkpoint)
+    if progress is not None:
+        progress('upload', 0.95)
+    upload_department_timetables(department, faculty, faculty_timetable, class_timetable, lab_timetable,
+                                 snapshot, key)
+    if key is not None and faculty_timetable:
+        store_generation(department, faculty, key, faculty_timetable, class_timetable, lab_timetable,
+                         suggestion, snapshot)
+    return faculty_timetable, class_timetable, lab_timetable, suggestion, False
+
+def store_generation(department: str, faculty: Optional[str], key: str, faculty_timetable: dict,
+                     class_timetable: dict, lab_timetable: dict, suggestion: str, snapshot: dict) -> None:
+    try:
+        generation_cache.put(department, faculty, key, {
+            'faculty_timetable': faculty_timetable,
+            'class_timetable': class_timetable,
+            'lab_timetable': lab_timetable,
+            'suggestion': suggestion,
+            'snapshot': snapshot,
+        })
+    except Exception as e:
+        # The timetables are already uploaded; only the next identical run loses its shortcut
+        logging.warning(f"Could not store generation result for {department}: {str(e)}")
+
+# ------------------------------------------------------------------------
+# 8b) BULK GENERATION (every department in one call)
+# ------------------------------------------------------------------------
+BULK_MAX_WORKERS = 4
+BULK_UPLOAD_THREADS = 8
+
+# Set in each bulk worker process so every department is solved from the same parsed input
+_bulk_input: Optional[tuple[list, list, list]] = None
+
+def _init_bulk_worker(data: tuple[list, list, list]) -> None:
+    global _bulk_input, ACO_COLONIES
+    _bulk_input = data
+    # Departments already run in parallel; nested colony pools would only oversubscribe the CPUs
+    ACO_COLONIES = 1
+
+def _solve_department_task(department: str) -> tuple[str, tuple[dict, dict, dict, str, dict], float]:
+    started = time.perf_counter()
+    result = solve_department(department, data=_bulk_input)
+    return department, result, time.perf_counter() - started
+
+def _upload_and_store(department: str, key: Optional[str], faculty_tt: dict, class_tt: dict,
+                      lab_tt: dict, suggestion: str, snapshot: dict) -> list[str]:
+    keys = upload_department_timetables(department, None, faculty_tt, class_tt, lab_tt, snapshot, key)
+    if key is not None and faculty_tt:
+        store_generation(department, None, key, faculty_tt, class_tt, lab_tt, suggestion, snapshot)
+    return keys
+
+def generate_college_timetables(departments: Optional[list[str]] = None,
+                                max_workers: int = BULK_MAX_WORKERS,
+                                progress: Optional[Callable[..., None]] = None,
+                                use_cache: bool = True) -> dict[str, Any]:
+    """
+    Solves every department on a process pool with the workbook loaded once, and uploads
+    each department's timetables on a thread pool as soon as it is solved. Departments with
+    a stored generation result for the same input are not solved again.
+    Returns per-department timings plus a summary; ``progress`` is told each finished department.
+    """
+    started = time.perf_counter()
+    workbook = workbook_cache.get(TIMETABLE_DATA_FILE)
+    data = (workbook.faculty, workbook.courses, workbook.labs)
+    departments = departments or workbook.departments
+    report: dict[str, dict[str, Any]] = {}
+    uploads = {}
+    # Bulk workers run one colony each, which is part of the key
+    keys = {dept: department_generation_key(dept, None, data, aco_colonies=1) if use_cache else None
+            for dept in departments}
+    pending = []
+    for department in departments:
+        cached = generation_cache.get(department, None, keys[department]) if use_cache else None
+        if cached is None:
+            pending.append(department)
+            continue
+        report[department] = {
+            'status': 'success',
+            'cached': True,
+            'faculty_count': len(cached['faculty_timetable']),
+            'class_count': sum(len(semesters) for semesters in cached['class_timetable'].values()),
+            'lab_count': len(cached['lab_timetable']),
+        }
+        if bundle_generation(department) != {'scope': '', 'key': keys[department]}:
+            report[department]['uploaded_keys'] = upload_department_timetables(
+                department, None, cached['faculty_timetable'], cached['class_timetable'],
+                cached['lab_timetable'], cached['snapshot'], keys[department])
+
+    with ThreadPoolExecutor(max_workers=BULK_UPLOAD_THREADS) as uploader, \
+         ProcessPoolExecutor(max_workers=max(1, min(max_workers, len(pending) or 1)),
+                             initializer=_init_bulk_worker, initargs=(data,)) as solver:
+        futures = {solver.submit(_solve_department_task, dept): dept for dept in pending}
+        for future in as_completed(futures):
+            department = futures[future]
+            try:
+                _, (faculty_tt, class_tt, lab_tt, suggestion, snapshot), seconds = future.result()
+            except Exception as e:
+                logging.error(f"Bulk generation failed for {department}: {str(e)}")
+                report[department] = {'status': 'error', 'message': str(e)}
+                continue
+            report[department] = {
+                'status': 'success',
+                'cached': False,
+                'solve_seconds': round(seconds, 3),
+                'faculty_count': len(faculty_tt),
+                'class_count': sum(len(semesters) for semesters in class_tt.values()),
+                'lab_count': len(lab_tt),
+            }
+            uploads[uploader.submit(_upload_and_store, department, keys[department],
+                                    faculty_tt, class_tt, lab_tt, suggestion, snapshot)] = department
+            if progress is not None:
+                progress(f"solved {department}", 0.9 * len(report) / len(departments))
+
+        for future in as_completed(uploads):
+            department = uploads[future]
+            try:
+                report[department]['uploaded_keys'] = future.result()
+            except Exception as e:
+                logging.error(f"Bulk upload failed for {department}: {str(e)}")
+                report[department].update(status='error', message=f"Upload failed: {str(e)}")
 
-    return faculty_timetable, class_timetable, lab_timetable, "No suggestions"
+    succeeded = sum(1 for r in report.values() if r['status'] == 'success')
+    summary = {
+        'departments': len(departments),
+        'succeeded': succeeded,
+        'failed': len(departments) - succeeded,
+        'cached': sum(1 for r in report.values() if r.get('cached')),
+        'total_seconds': round(time.perf_counter() - started, 3),
+        'slowest_department': max(
+            (d for d in report if 'solve_seconds' in report[d]),
+            key=lambda d: report[d]['solve_seconds'], default=None
+        ),
+    }
+    logging.info(f"Bulk generation finished: {summary}")
+    return {'departments': report, 'summary': summary}
 
 # ------------------------------------------------------------------------
 # 9) FLASK ROUTES
@@ -328,16 +813,9 @@ def generate_all_timetables(department: str, faculty: Optional[str] = None) -> t
 @timetable_bp.route('/faculty-timetable', methods=['GET'])
 def faculty_timetable() -> str:
     try:
-        faculty_df = pd.read_excel("timetable_data.xlsx", sheet_name="Sheet1")
-        if 'Year' in faculty_df.columns:
-            valid_years = [str(y).strip() for y in faculty_df['Year'].unique() if pd.notna(y)]
-            departments = [f"{y} Year" for y in valid_years]
-        else:
-            departments = ["Default Department"]
-            logging.warning("No 'Year' column found in Sheet1; using default department.")
-
-        faculty_data, _, _ = read_excel_data()
-        faculties = sorted(list(set(d.get('Faculty_Name', '') for d in faculty_data if pd.notna(d.get('Faculty_Name', '')))))
+        workbook = workbook_cache.get(TIMETABLE_DATA_FILE)
+        departments = workbook.departments
+        faculties = workbook.faculties
         logging.info(f"Retrieved unique faculties: {faculties}")
 
         user_department = request.args.get('department')
@@ -346,7 +824,9 @@ def faculty_timetable() -> str:
         else:
             department = departments[0] if departments else 'Default Department'
 
-        faculty_timetables = {fac: fetch_timetable_from_s3(department, 'faculty', fac) for fac in faculties}
+        faculty_timetables, fetch_errors = fetch_faculty_timetables(department, faculties)
+        if fetch_errors:
+            logging.warning(f"{len(fetch_errors)} of {len(faculties)} faculty timetables could not be fetched")
         gemini_suggestion = ""
 
         return render_template(
@@ -354,6 +834,7 @@ def faculty_timetable() -> str:
             departments=departments, 
             faculties=faculties, 
             timetables=faculty_timetables, 
+            fetch_errors=fetch_errors,
             selected_department=department,
             gemini_suggestion=gemini_suggestion
         )
@@ -381,30 +862,113 @@ def generate_faculty_timetable(faculty: str) -> tuple[jsonify, int]:
         # CSRF is bypassed here for testing; in production include a valid CSRF token.
         department = request.form.get('department', 'Default Department')
         logging.info(f"Using department: {department}")
+        # incremental=1 keeps the previous timetable and only re-places lectures whose input changed
+        incremental = request.form.get('incremental', '').lower() in ('1', 'true', 'on', 'yes')
+        # budget=<seconds> runs the anytime search: the best timetable it finds in that time
+        budget = request.form.get('budget', '').strip()
+        if budget:
+            try:
+                budget = float(budget)
+            except ValueError:
+                budget = -1.0
+            if not 0 < budget <= ANYTIME_MAX_BUDGET:
+                return jsonify({'status': 'error',
+                                'message': f'budget must be a number of seconds in (0, {ANYTIME_MAX_BUDGET:g}]'}), 400
+        else:
+            budget = None
 
-        faculty_timetable, _, _, gemini_suggestion = generate_all_timetables(department, faculty)
-
-        return jsonify({
-            'faculty_timetable': faculty_timetable,
-            'gemini_suggestion': gemini_suggestion,
-            'status': 'success'
-        }), 200
+        # The solver runs on the job queue; poll /jobs/<job_id> or stream /jobs/<job_id>/events
+        job, deduplicated = job_queue.submit(('faculty', department, faculty, incremental, budget),
+                                             _faculty_timetable_job, department, faculty, incremental, budget)
+        return _job_accepted(job, deduplicated)
+    except QueueFull as e:
+        return _queue_full(e)
     except Exception as e:
         logging.error(f"Error generating timetable for {faculty}: {str(e)}")
         return jsonify({'status': 'error', 'message': f'Failed to generate timetable: {str(e)}'}), 400
 
+def _faculty_timetable_job(department: str, faculty: str, incremental: bool, budget: Optional[float],
+                           progress: Callable[..., None]) -> dict[str, Any]:
+    faculty_timetable, _, _, gemini_suggestion, cached = generate_all_timetables(department, faculty, progress,
+                                                                                 incremental, budget=budget)
+    return {'faculty_timetable': faculty_timetable, 'gemini_suggestion': gemini_suggestion, 'cached': cached}
+
+def _job_accepted(job, deduplicated: bool) -> tuple[jsonify, int]:
+    return jsonify({
+        'status': 'accepted',
+        'job_id': job.id,
+        'job_status': job.status,
+        'deduplicated': deduplicated,
+        'status_url': url_for('timetable.job_status', job_id=job.id),
+        'events_url': url_for('timetable.job_events', job_id=job.id),
+    }), 202
+
+def _queue_full(error: QueueFull) -> tuple[jsonify, int]:
+    logging.warning(f"Timetable job rejected: {str(error)}")
+    response = jsonify({'status': 'error', 'message': 'Too many timetable jobs queued; try again shortly.'})
+    response.headers['Retry-After'] = '30'
+    return response, 503
+
+@timetable_bp.route('/jobs/<job_id>', methods=['GET'])
+def job_status(job_id: str) -> tuple[jsonify, int]:
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({'status': 'error', 'message': f'Unknown job: {job_id}'}), 404
+    return jsonify(job.to_dict()), 200
+
+# Seconds between keep-alive comments on an idle event stream
+SSE_KEEPALIVE_SECONDS = 15.0
+
+def _sse(event: str, payload: dict[str, Any], event_id: int) -> str:
+    return f"id: {event_id}\nevent: {event}\ndata: {json.dumps(payload)}\n\n"
+
+@timetable_bp.route('/jobs/<job_id>/events', methods=['GET'])
+def job_events(job_id: str) -> Response:
+    """
+    Server-Sent Events stream of a job: a ``progress`` event whenever its stage, progress or
+    details change (for anytime runs: score, unplaced count, iterations per second), then
+    one ``done`` event carrying the full job status, after which the stream closes.
+    """
+    if job_queue.get(job_id) is None:
+        return jsonify({'status': 'error', 'message': f'Unknown job: {job_id}'}), 404
+    try:
+        # A reconnecting EventSource resumes after the last version it saw
+        version = int(request.headers.get('Last-Event-ID', -1))
+    except ValueError:
+        version = -1
+
+    def stream():
+        nonlocal version
+        while True:
+            job = job_queue.wait_for_update(job_id, version, SSE_KEEPALIVE_SECONDS)
+            if job is None:
+                yield _sse('error', {'message': f'Unknown job: {job_id}'}, version)
+                return
+            if job.done:
+                yield _sse('done', job.to_dict(), job.version)
+                return
+            if job.version == version:
+                yield ': keep-alive\n\n'
+                continue
+            version = job.version
+            status = job.to_dict()
+            del status['result']
+            yield _sse('progress', status, version)
+
+    return Response(stream(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@timetable_bp.route('/jobs', methods=['GET'])
+def job_queue_stats() -> tuple[jsonify, int]:
+    return jsonify(job_queue.stats()), 200
+
 @csrf.exempt
 @timetable_bp.route('/class-timetable')
 def class_timetable() -> str:
-    faculty_df = pd.read_excel("timetable_data.xlsx", sheet_name="Sheet1")
-    if 'Year' in faculty_df.columns:
-        valid_years = [str(y).strip() for y in faculty_df['Year'].unique() if pd.notna(y)]
-        departments = [f"{y} Year" for y in valid_years]
-    else:
-        departments = ["Default Department"]
+    departments = workbook_cache.get(TIMETABLE_DATA_FILE).departments
 
     department = request.args.get('department', departments[0])
-    class_timetable = fetch_timetable_from_s3(department, 'class')
+    class_timetable = fetch_department_view(department, 'class')
     return render_template(
         'class_timetable.html', 
         departments=departments, 
@@ -415,15 +979,10 @@ def class_timetable() -> str:
 @csrf.exempt
 @timetable_bp.route('/lab-timetable')
 def lab_timetable() -> str:
-    faculty_df = pd.read_excel("timetable_data.xlsx", sheet_name="Sheet1")
-    if 'Year' in faculty_df.columns:
-        valid_years = [str(y).strip() for y in faculty_df['Year'].unique() if pd.notna(y)]
-        departments = [f"{y} Year" for y in valid_years]
-    else:
-        departments = ["Default Department"]
+    departments = workbook_cache.get(TIMETABLE_DATA_FILE).departments
 
     department = request.args.get('department', departments[0])
-    lab_timetable = fetch_timetable_from_s3(department, 'lab')
+    lab_timetable = fetch_department_view(department, 'lab')
     return render_template(
         'lab_timetable.html', 
         departments=departments, 
@@ -431,6 +990,42 @@ def lab_timetable() -> str:
         selected_department=department
     )
 
+@csrf.exempt
+@timetable_bp.route('/generate-all-timetables', methods=['POST'])
+def generate_all_timetables_route() -> tuple[jsonify, int]:
+    try:
+        departments = request.form.getlist('department') or None
+        job, deduplicated = job_queue.submit(('bulk', tuple(departments or ())),
+                                             generate_college_timetables, departments)
+        return _job_accepted(job, deduplicated)
+    except QueueFull as e:
+        return _queue_full(e)
+    except Exception as e:
+        logging.error(f"Error in bulk timetable generation: {str(e)}")
+        return jsonify({'status': 'error', 'message': f'Failed to generate timetables: {str(e)}'}), 500
+
+@timetable_bp.cli.command('generate-all')
+@click.option('--department', '-d', multiple=True, help='Department to generate (default: every department).')
+@click.option('--workers', '-w', default=BULK_MAX_WORKERS, show_default=True, help='Solver processes.')
+def generate_all_command(department: tuple[str, ...], workers: int) -> None:
+    """Generate and upload timetables for every department in one run."""
+    report = generate_college_timetables(list(department) or None, max_workers=workers)
+    for name, result in report['departments'].items():
+        click.echo(f"{name}: {result}")
+    click.echo(f"Summary: {report['summary']}")
+
+@timetable_bp.route('/generation-cache/stats', methods=['GET'])
+def generation_cache_stats() -> tuple[jsonify, int]:
+    return jsonify(generation_cache.stats()), 200
+
+@timetable_bp.route('/workbook-cache/stats', methods=['GET'])
+def workbook_cache_stats() -> tuple[jsonify, int]:
+    return jsonify(workbook_cache.stats()), 200
+
+@timetable_bp.route('/s3-cache/stats', methods=['GET'])
+def s3_cache_stats() -> tuple[jsonify, int]:
+    return jsonify(s3_cache.stats()), 200
+
 @csrf.exempt
 @timetable_bp.route('/')
 def index() -> str:
@@ -1,18 +1,14 @@
 from flask import Blueprint, render_template, request
-import boto3
-from aws_credentials import AWS_ACCESS_KEY, AWS_SECRET_KEY, REGION_NAME, BUCKET_NAME
+from s3_listing import iter_keys
+from storage import bucket_name, get_storage
 
 timetable_bp = Blueprint('timetable', __name__)
 
-s3 = boto3.client('s3',
-    aws_access_key_id=AWS_ACCESS_KEY,
-    aws_secret_access_key=AWS_SECRET_KEY,
-    region_name=REGION_NAME
-)
+s3 = get_storage()
+BUCKET_NAME = bucket_name()
 
 def list_files_from_s3(bucket, prefix):
-    response = s3.list_objects_v2(Bucket=bucket, Prefix=prefix)
-    return [obj['Key'].split('/')[-1] for obj in response.get('Contents', [])]
+    return [key.split('/')[-1] for key in iter_keys(s3, bucket, prefix)]
 
 @timetable_bp.route('/table-generation')
 def table_generation():
@@ -0,0 +1,261 @@
+# college_manifest.py
+"""College info as an append log of small delta objects plus a compacted snapshot.
+
+Every submission from the college info form is written as its own delta
+object ``college_data/info_<ms>_<id>.json`` holding ``courses``,
+``departments`` and ``periods`` lists. Readers apply the unfolded deltas on top of
+``college_manifest/snapshot.json`` in write order. Once more than
+``COMPACT_THRESHOLD`` deltas are pending, ``compact()`` folds them into a
+new snapshot and then deletes them. The snapshot lists the keys it has
+folded, so a delta whose delete failed is skipped rather than applied
+twice. The older ``info_<timestamp>.json`` files have the same shape and
+are folded in the same way.
+
+Writers read the snapshot straight from the client with its ETag and put
+it back with ``IfMatch`` (``IfNoneMatch='*'`` when it does not exist yet),
+retrying on 412. Two compactions in different processes therefore cannot
+overwrite each other's snapshot, and folded deltas are only deleted once
+the snapshot that holds them has been written.
+
+Deleting an item uses an index from item name to the objects containing
+it, kept per delta ETag, so only those objects are read back and
+rewritten, each with a conditional PUT on an uncached read.
+"""
+import json
+import logging
+import random
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Optional
+
+from botocore.exceptions import ClientError
+
+from s3_cache import json_body, s3_cache
+from s3_listing import fetch_objects, iter_objects
+from write_coalescer import MAX_CONFLICT_RETRIES, RETRY_BASE_DELAY, ConflictError, precondition_failed
+
+INFO_PREFIX = 'college_data/info_'
+SNAPSHOT_KEY = 'college_manifest/snapshot.json'
+SNAPSHOT_VERSION = 1
+FIELDS = ('courses', 'departments', 'periods')
+COMPACT_THRESHOLD = 16
+WRITE_WORKERS = 8
+
+_compact_lock = threading.Lock()
+
+
+def empty_info() -> dict[str, list]:
+    return {field: [] for field in FIELDS}
+
+
+def item_name(item: Any) -> Any:
+    """Courses are stored as {"name", "branch"} dicts or, when added one by one, as plain names."""
+    return item.get('name') if isinstance(item, dict) else item
+
+
+def apply_delta(info: dict[str, list], delta: dict[str, Any]) -> None:
+    for field in FIELDS:
+        info[field].extend(delta.get(field, []))
+
+
+def item_names(info: dict[str, Any]) -> dict[str, set]:
+    return {field: {item_name(item) for item in info.get(field, []) if isinstance(item, (dict, str))}
+            for field in FIELDS}
+
+
+def new_delta_key() -> str:
+    return f'{INFO_PREFIX}{int(time.time() * 1000)}_{uuid.uuid4().hex[:8]}.json'
+
+
+def empty_snapshot() -> dict[str, Any]:
+    return {'version': SNAPSHOT_VERSION, **empty_info(), 'folded': []}
+
+
+def _backoff(attempt: int) -> None:
+    time.sleep(RETRY_BASE_DELAY * 2 ** attempt * (1 + random.random()))
+
+
+class CollegeManifest:
+    def __init__(self, client, bucket: str, threshold: int = COMPACT_THRESHOLD):
+        self.client = client
+        self.bucket = bucket
+        self.threshold = threshold
+        # Delta key -> (ETag, item names per field); entries are replaced when the ETag changes
+        self._index: dict[str, tuple[str, dict[str, set]]] = {}
+        self._index_lock = threading.Lock()
+
+    def snapshot(self) -> dict[str, Any]:
+        try:
+            snapshot = s3_cache.get(self.client, self.bucket, SNAPSHOT_KEY)
+        except self.client.exceptions.NoSuchKey:
+            return empty_snapshot()
+        return snapshot
+
+    def read_snapshot(self) -> tuple[dict[str, Any], Optional[str]]:
+        """Uncached snapshot and its ETag (None when there is none yet), for conditional rewrites."""
+        try:
+            response = self.client.get_object(Bucket=self.bucket, Key=SNAPSHOT_KEY)
+        except self.client.exceptions.NoSuchKey:
+            return empty_snapshot(), None
+        try:
+            snapshot = json.loads(response['Body'].read().decode('utf-8'))
+        except ValueError as e:
+            logging.warning(f"Replacing undecodable {SNAPSHOT_KEY}: {str(e)}")
+            snapshot = None
+        return snapshot if isinstance(snapshot, dict) else empty_snapshot(), response.get('ETag')
+
+    def pending_deltas(self, snapshot: dict[str, Any]) -> list[dict[str, Any]]:
+        """Listed delta objects not yet folded into ``snapshot``, oldest first."""
+        folded = set(snapshot.get('folded', []))
+        deltas = [obj for obj in iter_objects(self.client, self.bucket, INFO_PREFIX) if obj['Key'] not in folded]
+        return sorted(deltas, key=lambda obj: (obj['LastModified'], obj['Key']))
+
+    def _read_deltas(self, deltas: list[dict[str, Any]]) -> list[tuple[str, dict[str, Any]]]:
+        bodies = []
+        for key, body, error in fetch_objects(self.client, self.bucket, deltas):
+            if error is not None:
+                raise error
+            if isinstance(body, dict):
+                bodies.append((key, body))
+        return bodies
+
+    def load(self, snapshot: Optional[dict[str, Any]] = None
+             ) -> tuple[dict[str, list], dict[str, Any], list[tuple[str, dict[str, Any]]]]:
+        """Combined info, the snapshot it was built on and the pending deltas applied to it."""
+        snapshot = self.snapshot() if snapshot is None else snapshot
+        deltas = self._read_deltas(self.pending_deltas(snapshot))
+        info = {field: list(snapshot.get(field, [])) for field in FIELDS}
+        for _, delta in deltas:
+            apply_delta(info, delta)
+        return info, snapshot, deltas
+
+    def objects_containing(self, field: str, value: Any,
+                           deltas: list[dict[str, Any]]) -> list[str]:
+        """Pending delta keys whose ``field`` holds ``value``; only unindexed or changed deltas are read."""
+        etags = {obj['Key']: obj.get('ETag') for obj in deltas}
+        stale = [obj for obj in deltas if self._index.get(obj['Key'], ('',))[0] != etags[obj['Key']]]
+        for key, body, error in fetch_objects(self.client, self.bucket, stale):
+            if error is not None:
+                raise error
+            with self._index_lock:
+                self._index[key] = (etags[key], item_names(body if isinstance(body, dict) else {}))
+        with self._index_lock:
+            for key in [key for key in self._index if key not in etags]:
+                del self._index[key]
+            return [obj['Key'] for obj in deltas if value in self._index[obj['Key']][1].get(field, set())]
+
+    def _rewrite_delta(self, key: str, field: str, value: Any) -> None:
+        """Drops ``value`` from one delta with a conditional PUT on an uncached read."""
+        for attempt in range(MAX_CONFLICT_RETRIES + 1):
+            try:
+                response = self.client.get_object(Bucket=self.bucket, Key=key)
+            except self.client.exceptions.NoSuchKey:
+                # Folded and deleted by a compaction; the snapshot write in remove_item catches that
+                return
+            body = json_body(response['Body'].read())
+            items = body.get(field, []) if isinstance(body, dict) else []
+            kept = [item for item in items if item_name(item) != value]
+            if len(kept) == len(items):
+                return
+            body[field] = kept
+            try:
+                s3_cache.put_object(self.client, Bucket=self.bucket, Key=key, Body=json.dumps(body),
+                                    ContentType='application/json', IfMatch=response.get('ETag'))
+                return
+            except ClientError as e:
+                if not precondition_failed(e):
+                    raise
+            _backoff(attempt)
+        raise ConflictError(f"{key} changed on every one of {MAX_CONFLICT_RETRIES + 1} attempts")
+
+    def remove_item(self, field: str, value: Any) -> int:
+        """
+        Removes ``value`` from ``field`` everywhere; rewrites only the objects holding it, concurrently.
+
+        The snapshot is written last, under IfMatch on the ETag read at the start, even when
+        it does not hold ``value``. If a compaction folded the deltas in between, that write
+        fails and the removal is applied again on top of the new snapshot.
+        """
+        for attempt in range(MAX_CONFLICT_RETRIES + 1):
+            snapshot, etag = self.read_snapshot()
+            targets = self.objects_containing(field, value, self.pending_deltas(snapshot))
+            in_snapshot = value in item_names(snapshot)[field]
+            if not targets and not in_snapshot:
+                return 0
+            if targets:
+                with ThreadPoolExecutor(max_workers=min(WRITE_WORKERS, len(targets))) as pool:
+                    for future in [pool.submit(self._rewrite_delta, key, field, value) for key in targets]:
+                        future.result()
+            info = {f: snapshot.get(f, []) for f in FIELDS}
+            info[field] = [item for item in info[field] if item_name(item) != value]
+            if self.write_snapshot(info, snapshot.get('folded', []), etag) is not None:
+                changed = len(targets) + int(in_snapshot)
+                logging.info(f"Removed {field[:-1]} {value!r} from {changed} college info objects")
+                return changed
+            logging.warning(f"{SNAPSHOT_KEY} changed while removing {value!r}, retrying")
+            _backoff(attempt)
+        raise ConflictError(f"{SNAPSHOT_KEY} changed on every one of {MAX_CONFLICT_RETRIES + 1} attempts")
+
+    def view(self) -> dict[str, list]:
+        info, _, deltas = self.load()
+        if len(deltas) > self.threshold:
+            try:
+                self.compact()
+            except Exception as e:
+                logging.warning(f"College manifest compaction failed: {str(e)}")
+        return info
+
+    def append(self, delta: dict[str, Any]) -> str:
+        key = new_delta_key()
+        s3_cache.put_object(self.client, Bucket=self.bucket, Key=key, Body=json.dumps(delta),
+                            ContentType='application/json')
+        return key
+
+    def write_snapshot(self, info: dict[str, list], folded: list[str], etag: Optional[str]) -> Optional[str]:
+        """
+        Replaces the snapshot if it still has ``etag`` (or, with None, if there is none yet).
+        Returns the new ETag, or None when another writer changed it first.
+        """
+        snapshot = {'version': SNAPSHOT_VERSION, **info, 'folded': folded, 'compacted_at': time.time()}
+        condition = {'IfMatch': etag} if etag is not None else {'IfNoneMatch': '*'}
+        try:
+            response = s3_cache.put_object(self.client, Bucket=self.bucket, Key=SNAPSHOT_KEY,
+                                           Body=json.dumps(snapshot), ContentType='application/json', **condition)
+        except ClientError as e:
+            if not precondition_failed(e):
+                raise
+            return None
+        return response.get('ETag', '')
+
+    def compact(self) -> dict[str, int]:
+        """Folds every pending delta into the snapshot and deletes the folded delta objects."""
+        with _compact_lock:
+            for attempt in range(MAX_CONFLICT_RETRIES + 1):
+                snapshot, etag = self.read_snapshot()
+                info, _, deltas = self.load(snapshot)
+                keys = [key for key, _ in deltas]
+                # Keys folded earlier whose delete failed stay listed until they are gone
+                still_listed = {obj['Key'] for obj in self.pending_deltas({'folded': []})}
+                folded = [key for key in snapshot.get('folded', []) if key in still_listed] + keys
+                etag = self.write_snapshot(info, folded, etag)
+                if etag is not None:
+                    break
+                logging.warning(f"{SNAPSHOT_KEY} changed during compaction, folding again")
+                _backoff(attempt)
+            else:
+                raise ConflictError(f"{SNAPSHOT_KEY} changed on every one of {MAX_CONFLICT_RETRIES + 1} attempts")
+            deleted = 0
+            for key in folded:
+                try:
+                    s3_cache.delete_object(self.client, Bucket=self.bucket, Key=key)
+                    deleted += 1
+                except Exception as e:
+                    logging.warning(f"Could not delete folded delta {key}: {str(e)}")
+            # If someone rewrote the snapshot meanwhile, the next compaction prunes the list instead
+            if deleted == len(folded) and folded:
+                self.write_snapshot(info, [], etag)
+        logging.info(f"Compacted {len(keys)} college info deltas into {SNAPSHOT_KEY}")
+        return {'folded': len(keys), 'deleted': deleted}
+
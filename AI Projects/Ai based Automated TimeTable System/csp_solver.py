@@ -0,0 +1,273 @@
+# csp_solver.py
+"""Backtracking constraint solver for small departments.
+
+Every lecture is a variable whose domain is a bitmask of legal start
+slots. Unary constraints (blocks must stay inside one day, maintenance
+windows, room capacity) are applied to the domains up front; the binary
+no-overlap constraint between lectures that share a faculty, class or lab
+is enforced by AC-3 before the search and by forward checking during it.
+Variables are chosen by MRV with the degree heuristic as tie-break. The
+search stops at a timeout and then returns the largest consistent partial
+assignment it has seen.
+
+The data behind the maintenance and capacity constraints comes from
+optional workbook columns (see ``unary_constraint_data``); without them
+those two constraints do not remove any start slot.
+"""
+import logging
+import re
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Iterable, Optional
+
+import numpy as np
+
+from graph_coloring import conflict_bitsets
+from timetable_model import DAYS, PERIODS, UNPLACED, Problem, clean_value
+
+# Optional workbook columns: Sheet3 Maintenance ("Monday 3; Friday 7", 1-based periods)
+# and Capacity (seats per lab), Sheet2 Class_Size (students per class)
+MAINTENANCE_COLUMN = 'Maintenance'
+CAPACITY_COLUMN = 'Capacity'
+CLASS_SIZE_COLUMN = 'Class_Size'
+
+
+@dataclass
+class CspResult:
+    assignment: np.ndarray
+    complete: bool
+    timed_out: bool
+    nodes: int
+    elapsed: float
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            'complete': self.complete,
+            'timed_out': self.timed_out,
+            'unplaced': int((self.assignment < 0).sum()),
+            'nodes': self.nodes,
+            'elapsed_seconds': round(self.elapsed, 3),
+        }
+
+
+def _bits(mask: int):
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+def _cells(start: int, length: int) -> int:
+    return ((1 << length) - 1) << start
+
+
+def _overlapping_starts(cells: int, length: int) -> int:
+    """Starts of a block of ``length`` that would overlap ``cells``."""
+    mask = cells
+    for k in range(1, length):
+        mask |= cells >> k
+    return mask
+
+
+def _count(value: Any) -> Optional[int]:
+    text = clean_value(value)
+    try:
+        return int(float(text)) if text else None
+    except ValueError:
+        logging.warning(f"Ignoring non-numeric capacity {text!r}")
+        return None
+
+
+def parse_maintenance(value: Any) -> list[tuple[str, int]]:
+    """(day, period) windows from a cell such as "Monday 3; Friday 7"; bad entries are skipped."""
+    windows = []
+    for entry in filter(None, (part.strip() for part in re.split(r'[;,]', clean_value(value)))):
+        day, _, period = entry.rpartition(' ')
+        day = day.strip().capitalize()
+        if day in DAYS and period.isdigit() and 1 <= int(period) <= PERIODS:
+            windows.append((day, int(period)))
+        else:
+            logging.warning(f"Ignoring maintenance window {entry!r}")
+    return windows
+
+
+def unary_constraint_data(courses_data: Iterable[dict[str, Any]],
+                          labs_data: Iterable[dict[str, Any]]) -> dict[str, Any]:
+    """
+    ``maintenance``, ``lab_capacity`` and ``class_size`` for initial_domains from the optional
+    workbook columns. A lab listed on several rows gets every window and its smallest
+    capacity; a class gets the largest size given for any of its courses.
+    """
+    maintenance: dict[str, list[tuple[str, int]]] = {}
+    lab_capacity: dict[str, int] = {}
+    class_size: dict[tuple[str, str], int] = {}
+    for lab in labs_data:
+        name = clean_value(lab.get('Lab_Name'))
+        if not name:
+            continue
+        for window in parse_maintenance(lab.get(MAINTENANCE_COLUMN)):
+            if window not in maintenance.setdefault(name, []):
+                maintenance[name].append(window)
+        capacity = _count(lab.get(CAPACITY_COLUMN))
+        if capacity is not None:
+            lab_capacity[name] = min(capacity, lab_capacity.get(name, capacity))
+    for course in courses_data:
+        size = _count(course.get(CLASS_SIZE_COLUMN))
+        if size is not None:
+            key = (clean_value(course.get('Year')), clean_value(course.get('Semester')))
+            class_size[key] = max(size, class_size.get(key, size))
+    return {'maintenance': maintenance, 'lab_capacity': lab_capacity, 'class_size': class_size}
+
+
+def initial_domains(problem: Problem, constraints: list[str],
+                    maintenance: Optional[dict[str, list[tuple[str, int]]]] = None,
+                    lab_capacity: Optional[dict[str, int]] = None,
+                    class_size: Optional[dict[tuple[str, str], int]] = None) -> list[int]:
+    """Domain bitmask per lecture after applying the unary hard constraints."""
+    maintenance = maintenance or {}
+    domains = []
+    for l in range(problem.n_lectures):
+        length = int(problem.lec_length[l])
+        # "continuous slots": a block never crosses into the next day
+        domain = sum(1 << int(s) for s in np.flatnonzero(problem.start_mask[l]))
+        lab_names = [problem.lab_names[lab_id] for lab_id in problem.lec_labs[l]]
+        if lab_names and "maintenance windows" in constraints:
+            for day, period in [window for name in lab_names for window in maintenance.get(name, [])]:
+                cell = DAYS.index(day) * PERIODS + period - 1
+                domain &= ~_overlapping_starts(1 << cell, length)
+        if lab_names and "room capacity" in constraints and lab_capacity and class_size:
+            # A course held in several labs splits the class across all of them
+            size = class_size.get(problem.class_keys[problem.lec_class[l]])
+            capacities = [lab_capacity.get(name) for name in lab_names]
+            if size is not None and None not in capacities and size > sum(capacities):
+                domain = 0
+        domains.append(domain)
+    return domains
+
+
+class _Search:
+    def __init__(self, problem: Problem, domains: list[int], deadline: float,
+                 hint: Optional[np.ndarray] = None):
+        self.problem = problem
+        self.n = problem.n_lectures
+        self.lengths = [int(k) for k in problem.lec_length]
+        # Lectures whose domain is empty before the search can never be placed; leave them out
+        self.active = [l for l in range(self.n) if domains[l]]
+        active_mask = sum(1 << l for l in self.active)
+        self.neighbours = [list(_bits(a & active_mask)) for a in conflict_bitsets(problem)]
+        self.deadline = deadline
+        self.hint = hint
+        self.assignment = [UNPLACED] * self.n
+        self.best = list(self.assignment)
+        self.best_count = 0
+        self.assigned = 0
+        self.nodes = 0
+        self.timed_out = False
+
+    def revise(self, x: int, y: int, domains: list[int]) -> bool:
+        """Removes starts of x that leave y no compatible start; True when D(x) changed."""
+        dy = domains[y]
+        # A block of x can knock out at most len_x + len_y - 1 starts of y
+        if dy.bit_count() > self.lengths[x] + self.lengths[y] - 1:
+            return False
+        removed = 0
+        for s in _bits(domains[x]):
+            if not dy & ~_overlapping_starts(_cells(s, self.lengths[x]), self.lengths[y]):
+                removed |= 1 << s
+        if removed:
+            domains[x] &= ~removed
+        return bool(removed)
+
+    def ac3(self, domains: list[int], queue: Optional[deque] = None) -> bool:
+        if queue is None:
+            queue = deque((x, y) for x in self.active for y in self.neighbours[x])
+        while queue:
+            x, y = queue.popleft()
+            if self.assignment[x] >= 0:
+                continue
+            if self.revise(x, y, domains):
+                if not domains[x]:
+                    return False
+                queue.extend((z, x) for z in self.neighbours[x] if z != y and self.assignment[z] < 0)
+        return True
+
+    def select_variable(self, domains: list[int]) -> int:
+        best, best_key = -1, None
+        for l in self.active:
+            if self.assignment[l] >= 0:
+                continue
+            unassigned_degree = sum(1 for u in self.neighbours[l] if self.assignment[u] < 0)
+            key = (domains[l].bit_count(), -unassigned_degree)
+            if best_key is None or key < best_key:
+                best, best_key = l, key
+        return best
+
+    def ordered_values(self, l: int, domain: int) -> list[int]:
+        values = list(_bits(domain))
+        if self.hint is not None and self.hint[l] >= 0 and domain >> int(self.hint[l]) & 1:
+            values.remove(int(self.hint[l]))
+            values.insert(0, int(self.hint[l]))
+        return values
+
+    def forward_check(self, l: int, start: int, domains: list[int]) -> Optional[list[int]]:
+        cells = _cells(start, self.lengths[l])
+        new_domains = list(domains)
+        new_domains[l] = 1 << start
+        for u in self.neighbours[l]:
+            if self.assignment[u] >= 0:
+                continue
+            new_domains[u] &= ~_overlapping_starts(cells, self.lengths[u])
+            if not new_domains[u]:
+                return None
+        return new_domains
+
+    def search(self, domains: list[int]) -> bool:
+        if self.assigned > self.best_count:
+            self.best, self.best_count = list(self.assignment), self.assigned
+        if self.assigned == len(self.active):
+            return True
+        if time.perf_counter() > self.deadline:
+            self.timed_out = True
+            return False
+        l = self.select_variable(domains)
+        for start in self.ordered_values(l, domains[l]):
+            self.nodes += 1
+            new_domains = self.forward_check(l, start, domains)
+            if new_domains is None:
+                continue
+            self.assignment[l] = start
+            self.assigned += 1
+            queue = deque((u, l) for u in self.neighbours[l] if self.assignment[u] < 0)
+            queue.extend((z, u) for u in self.neighbours[l] if self.assignment[u] < 0
+                         for z in self.neighbours[u] if z != l and self.assignment[z] < 0)
+            if self.ac3(new_domains, queue) and self.search(new_domains):
+                return True
+            self.assignment[l] = UNPLACED
+            self.assigned -= 1
+            if self.timed_out:
+                return False
+        return False
+
+
+def solve_csp(problem: Problem, constraints: list[str], timeout: float = 5.0,
+              hint: Optional[np.ndarray] = None, **unary_data) -> CspResult:
+    """Finds a clash-free assignment of every lecture, or the best partial one within ``timeout``.
+
+    ``hint`` (e.g. the ACO result) is tried first for each lecture, which
+    usually lets the search complete without backtracking.
+    """
+    started = time.perf_counter()
+    domains = initial_domains(problem, constraints, **unary_data)
+    search = _Search(problem, domains, started + timeout, hint)
+    # If AC-3 already proves there is no full solution, the search still runs for the best partial one
+    pruned = list(domains)
+    solved = search.search(pruned if search.ac3(pruned) else domains)
+    assignment = np.asarray(search.assignment if solved else search.best, dtype=np.int32)
+    return CspResult(
+        assignment=assignment,
+        complete=bool((assignment >= 0).all()),
+        timed_out=search.timed_out,
+        nodes=search.nodes,
+        elapsed=time.perf_counter() - started,
+    )
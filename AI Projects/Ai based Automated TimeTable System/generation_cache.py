@@ -0,0 +1,114 @@
+# generation_cache.py
+"""Memoised timetable generation results.
+
+A result is keyed on ``generation_key``: a SHA-256 of the department's
+filtered input rows, the constraint list from ``apply_constraints`` and the
+solver settings (including the seed). Cells are normalised with
+``clean_value``, so the key does not change between the Excel parser and
+the columnar snapshot loader, or after a no-op re-save of the workbook.
+
+Results live in a small in-process LRU and in one object per department
+(or per faculty run), stored next to that department's timetables. Each
+object holds the key it was produced for, so a changed input simply
+overwrites it. Any process can serve a repeat request without
+solving again, and only the latest result per scope is kept in S3.
+"""
+import copy
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Iterable, Optional
+
+from s3_cache import s3_cache
+from timetable_codec import decode, put_encoded
+from timetable_model import clean_value
+
+GENERATION_CACHE_VERSION = 1
+GENERATION_CACHE_ENTRIES = 64
+
+
+def _normalised_rows(rows: Iterable[dict[str, Any]]) -> list[dict[str, str]]:
+    return [{str(column): clean_value(value) for column, value in row.items()} for row in rows]
+
+
+def generation_key(rows: dict[str, Iterable[dict[str, Any]]], constraints: list[str],
+                   settings: dict[str, Any]) -> str:
+    """Stable hash of named row sets, the constraint list and the solver settings."""
+    document = {
+        'version': GENERATION_CACHE_VERSION,
+        'rows': {name: _normalised_rows(table) for name, table in rows.items()},
+        'constraints': list(constraints),
+        'settings': settings,
+    }
+    encoded = json.dumps(document, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(encoded.encode('utf-8')).hexdigest()
+
+
+class GenerationCache:
+    """
+    ``object_key(department, faculty)`` names the storage object for one scope, so
+    results sit next to the timetables they belong to.
+    """
+
+    def __init__(self, client, bucket: str, object_key: Callable[[str, Optional[str]], str],
+                 max_entries: int = GENERATION_CACHE_ENTRIES):
+        self.client = client
+        self.bucket = bucket
+        self.object_key = object_key
+        self.max_entries = max_entries
+        self._entries: OrderedDict[str, dict[str, Any]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.memory_hits = self.storage_hits = self.misses = 0
+
+    def get(self, department: str, faculty: Optional[str], key: str) -> Optional[dict[str, Any]]:
+        with self._lock:
+            result = self._entries.get(key)
+            if result is not None:
+                self._entries.move_to_end(key)
+                self.memory_hits += 1
+                return copy.deepcopy(result)
+        s3_key = self.object_key(department, faculty)
+        try:
+            stored = s3_cache.get(self.client, self.bucket, s3_key, decode=decode)
+        except self.client.exceptions.NoSuchKey:
+            stored = None
+        except Exception as e:
+            logging.warning(f"Could not read generation result s3://{self.bucket}/{s3_key}: {str(e)}")
+            stored = None
+        if not isinstance(stored, dict) or stored.get('key') != key:
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.storage_hits += 1
+            self._remember(key, copy.deepcopy(stored['result']))
+        # s3_cache values are shared with every other reader of the object
+        return copy.deepcopy(stored['result'])
+
+    def put(self, department: str, faculty: Optional[str], key: str, result: dict[str, Any]) -> str:
+        s3_key = self.object_key(department, faculty)
+        put_encoded(s3_cache, self.client, {'key': key, 'created': time.time(), 'result': result},
+                    Bucket=self.bucket, Key=s3_key)
+        with self._lock:
+            self._remember(key, copy.deepcopy(result))
+        return s3_key
+
+    def _remember(self, key: str, result: dict[str, Any]) -> None:
+        self._entries[key] = result
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            lookups = self.memory_hits + self.storage_hits + self.misses
+            return {
+                'memory_hits': self.memory_hits,
+                'storage_hits': self.storage_hits,
+                'misses': self.misses,
+                'entries': len(self._entries),
+                'hit_ratio': round((self.memory_hits + self.storage_hits) / lookups, 3) if lookups else 0.0,
+            }
@@ -0,0 +1,189 @@
+# genetic_solver.py
+"""Population-level genetic algorithm over lecture start slots.
+
+Individuals are rows of an int32 population matrix holding one start
+slot per lecture (-1 = unplaced). Fitness, selection, crossover and
+mutation all operate on the whole population at once; fitness is the
+soft_constraints objective, evaluated for the whole population in one
+batched pass, and can additionally be spread over a process pool in chunks. The search is
+seeded from existing assignments (e.g. the ACO result) and stops on a
+generation limit or a wall-clock budget, whichever comes first.
+"""
+import logging
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass, field
+from typing import Any, Optional, Sequence
+
+import numpy as np
+
+from soft_constraints import ScoreWeights, default_weights, population_components, population_scores
+from timetable_model import N_SLOTS, UNPLACED, Problem
+
+
+@dataclass
+class GaParams:
+    population: int = 80
+    generations: int = 200
+    time_budget: Optional[float] = 5.0
+    elite: int = 4
+    tournament: int = 3
+    crossover_rate: float = 0.9
+    mutation_rate: float = 0.02
+    unplace_rate: float = 0.1
+    workers: int = 0
+    # Fitness is the weighted soft-constraint score; lower is better
+    weights: ScoreWeights = field(default_factory=default_weights)
+
+
+@dataclass
+class GaResult:
+    assignment: np.ndarray
+    fitness: float
+    components: dict[str, float]
+    generations: int = 0
+    elapsed: float = 0.0
+    history: list[float] = field(default_factory=list)
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            'fitness': round(self.fitness, 3),
+            'components': {k: round(v, 3) for k, v in self.components.items()},
+            'generations': self.generations,
+            'elapsed_seconds': round(self.elapsed, 3),
+        }
+
+
+def population_fitness(problem: Problem, population: np.ndarray, params: GaParams) -> np.ndarray:
+    return population_scores(problem, population, params.weights)
+
+
+def _fitness_chunk(args: tuple[Problem, np.ndarray, GaParams]) -> np.ndarray:
+    return population_fitness(*args)
+
+
+def valid_start_table(problem: Problem) -> tuple[np.ndarray, np.ndarray]:
+    """Padded table of legal start slots per lecture and how many each lecture has."""
+    counts = problem.start_mask.sum(axis=1)
+    table = np.zeros((problem.n_lectures, N_SLOTS), dtype=np.int32)
+    for l in range(problem.n_lectures):
+        valid = np.flatnonzero(problem.start_mask[l])
+        table[l, :len(valid)] = valid
+    return table, counts
+
+
+def drop_clashes(problem: Problem, assignment: np.ndarray) -> np.ndarray:
+    """Unplaces lectures until no resource is double-booked; the earliest-placed lecture keeps its slot."""
+    assignment = assignment.copy()
+    busy = np.zeros((problem.n_resources, N_SLOTS), dtype=bool)
+    for l in np.flatnonzero(assignment >= 0):
+        start, length = int(assignment[l]), int(problem.lec_length[l])
+        res = problem.lec_resources[l]
+        if busy[res, start:start + length].any():
+            assignment[l] = UNPLACED
+        else:
+            busy[res, start:start + length] = True
+    return assignment
+
+
+class _Evaluator:
+    def __init__(self, problem: Problem, params: GaParams):
+        self.problem = problem
+        self.params = params
+        self.pool = None
+        if params.workers > 1:
+            try:
+                self.pool = ProcessPoolExecutor(max_workers=params.workers)
+            except OSError as e:
+                logging.warning(f"GA process pool unavailable, evaluating in-process: {str(e)}")
+
+    def __call__(self, population: np.ndarray) -> np.ndarray:
+        if self.pool is not None:
+            chunks = np.array_split(population, self.params.workers)
+            try:
+                return np.concatenate(list(self.pool.map(
+                    _fitness_chunk, [(self.problem, chunk, self.params) for chunk in chunks])))
+            except BrokenProcessPool as e:
+                logging.warning(f"GA process pool failed, evaluating in-process: {str(e)}")
+                self.pool = None
+        return population_fitness(self.problem, population, self.params)
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.shutdown()
+
+
+def solve_genetic(problem: Problem, seeds: Sequence[np.ndarray] = (), params: Optional[GaParams] = None,
+                  seed: Optional[int] = None) -> GaResult:
+    params = params or GaParams()
+    started = time.perf_counter()
+    rng = np.random.default_rng(seed)
+    n, size = problem.n_lectures, params.population
+    if n == 0:
+        return GaResult(np.empty(0, dtype=np.int32), 0.0, {})
+
+    table, n_valid = valid_start_table(problem)
+
+    def random_starts(shape):
+        lectures = np.broadcast_to(np.arange(n), shape)
+        picks = (rng.random(shape) * n_valid[lectures]).astype(np.int64)
+        return table[lectures, picks]
+
+    # Seed population: the given assignments plus mutated copies of them; random individuals without seeds
+    population = random_starts((size, n))
+    seeds = [np.asarray(s, dtype=np.int32) for s in seeds][:size]
+    for i in range(len(seeds), size if seeds else 0):
+        base = seeds[i % len(seeds)].copy()
+        mask = rng.random(n) < params.mutation_rate * 4
+        base[mask] = population[i][mask]
+        population[i] = base
+    for i, s in enumerate(seeds):
+        population[i] = s
+
+    evaluate = _Evaluator(problem, params)
+    try:
+        fitness = evaluate(population)
+        history = [float(fitness.min())]
+        generation = 0
+        for generation in range(1, params.generations + 1):
+            order = np.argsort(fitness)
+            elite = population[order[:params.elite]]
+
+            # Batched tournament selection
+            n_children = size - params.elite
+            entrants = rng.integers(0, size, (2, n_children, params.tournament))
+            winners = entrants[np.arange(2)[:, None], np.arange(n_children)[None, :],
+                               fitness[entrants].argmin(axis=2)]
+            parents_a, parents_b = population[winners[0]], population[winners[1]]
+
+            # Uniform crossover for the rows selected for crossover
+            cross_rows = rng.random(n_children) < params.crossover_rate
+            gene_mask = rng.random((n_children, n)) < 0.5
+            children = np.where(cross_rows[:, None] & gene_mask, parents_b, parents_a)
+
+            # Mutation: move to a random legal slot, or occasionally unplace
+            mutate = rng.random((n_children, n)) < params.mutation_rate
+            unplace = mutate & (rng.random((n_children, n)) < params.unplace_rate)
+            children = np.where(mutate, random_starts((n_children, n)), children)
+            children[unplace] = UNPLACED
+
+            population = np.concatenate([elite, children])
+            fitness = evaluate(population)
+            history.append(float(fitness.min()))
+
+            if params.time_budget is not None and time.perf_counter() - started > params.time_budget:
+                break
+    finally:
+        evaluate.close()
+
+    best = drop_clashes(problem, population[int(np.argmin(fitness))])
+    components = {k: float(v[0]) for k, v in population_components(problem, best[None, :], params.weights).items()}
+    return GaResult(
+        assignment=best,
+        fitness=float(population_fitness(problem, best[None, :], params)[0]),
+        components=components,
+        generations=generation,
+        elapsed=time.perf_counter() - started,
+        history=history,
+    )
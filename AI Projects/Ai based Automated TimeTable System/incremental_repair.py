@@ -0,0 +1,221 @@
+# incremental_repair.py
+"""Incremental repair of a stored timetable after a small input change.
+
+Every generated timetable is stored together with an input snapshot: the
+department's faculty rows and, per lecture, a stable key (class, course,
+block number), a fingerprint of what defines it (label, block length,
+faculty, lab) and the start slot it got. On the next run the new problem
+is diffed against that snapshot: lectures whose key and fingerprint are
+unchanged keep their slot, and only the new or changed ones are placed
+again. Placement is a local search over the changed lectures alone: each
+one takes the free start closest to its old slot, and a lecture with no
+free start may evict one other changed lecture that can move elsewhere.
+Unchanged lectures are never moved.
+"""
+import time
+from dataclasses import dataclass, field
+from typing import Any, Iterable, Optional
+
+import numpy as np
+
+from timetable_model import N_SLOTS, PERIODS, UNPLACED, Problem, clean_value
+
+SNAPSHOT_VERSION = 1
+ROW_COLUMNS = ('Faculty_Name', 'Subject', 'Course_Code', 'Year')
+
+
+@dataclass
+class RepairResult:
+    assignment: np.ndarray
+    kept: int
+    affected: list[int] = field(default_factory=list)
+    unplaced: list[int] = field(default_factory=list)
+    evictions: int = 0
+    rows_added: int = 0
+    rows_removed: int = 0
+    elapsed: float = 0.0
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            'kept': self.kept,
+            'replaced': len(self.affected) - len(self.unplaced),
+            'unplaced': len(self.unplaced),
+            'evictions': self.evictions,
+            'rows_added': self.rows_added,
+            'rows_removed': self.rows_removed,
+            'elapsed_ms': round(self.elapsed * 1000, 3),
+        }
+
+
+def lecture_keys(problem: Problem) -> list[tuple[str, ...]]:
+    """(year, semester, course, block number) per lecture; stable across rebuilds of the same input."""
+    keys, seen = [], {}
+    for l in range(problem.n_lectures):
+        year, semester = problem.class_keys[problem.lec_class[l]]
+        course = problem.course_codes[l] or problem.labels[l]
+        block = seen[(year, semester, course)] = seen.get((year, semester, course), -1) + 1
+        keys.append((year, semester, course, str(block)))
+    return keys
+
+
+def lecture_fingerprints(problem: Problem) -> list[tuple[Any, ...]]:
+    return [(
+        problem.labels[l],
+        int(problem.lec_length[l]),
+        tuple(sorted(problem.faculty_names[f] for f in problem.lec_faculty[l])),
+        ', '.join(problem.lab_names[lab] for lab in problem.lec_labs[l]),
+    ) for l in range(problem.n_lectures)]
+
+
+def normalised_rows(rows: Iterable[dict[str, Any]]) -> list[list[str]]:
+    return sorted([clean_value(row.get(c)) for c in ROW_COLUMNS] for row in rows)
+
+
+def input_snapshot(problem: Problem, assignment: np.ndarray, rows: Iterable[dict[str, Any]]) -> dict[str, Any]:
+    """JSON-serialisable record of the input and assignment, stored next to the timetable."""
+    return {
+        'version': SNAPSHOT_VERSION,
+        'rows': normalised_rows(rows),
+        'lectures': [
+            {'key': list(key), 'fingerprint': [label, length, list(faculty), lab], 'start': int(start)}
+            for key, (label, length, faculty, lab), start
+            in zip(lecture_keys(problem), lecture_fingerprints(problem), assignment)
+        ],
+    }
+
+
+def _fingerprint_from_json(value: list) -> tuple[Any, ...]:
+    label, length, faculty, lab = value
+    return label, int(length), tuple(faculty), lab
+
+
+def diff_snapshot(problem: Problem, snapshot: dict[str, Any]) -> tuple[np.ndarray, np.ndarray, list[int]]:
+    """
+    Fixed starts for unchanged lectures (-1 elsewhere), the old start of each lecture by key
+    (a placement hint, -1 when new) and the list of lectures that must be placed again.
+    """
+    previous = {tuple(lec['key']): lec for lec in snapshot.get('lectures', [])}
+    fixed = np.full(problem.n_lectures, UNPLACED, dtype=np.int32)
+    hint = np.full(problem.n_lectures, UNPLACED, dtype=np.int32)
+    for l, (key, fingerprint) in enumerate(zip(lecture_keys(problem), lecture_fingerprints(problem))):
+        old = previous.get(key)
+        if old is None or old['start'] < 0:
+            continue
+        start = int(old['start'])
+        if start < N_SLOTS and problem.start_mask[l, start]:
+            hint[l] = start
+            if _fingerprint_from_json(old['fingerprint']) == fingerprint:
+                fixed[l] = start
+    affected = [int(l) for l in np.flatnonzero(fixed < 0)]
+    return fixed, hint, affected
+
+
+class _Repairer:
+    def __init__(self, problem: Problem, hint: np.ndarray):
+        self.problem = problem
+        self.hint = hint
+        self.lengths = [int(k) for k in problem.lec_length]
+        self.resources = [r.tolist() for r in problem.lec_resources]
+        self.start_bits = [sum(1 << int(s) for s in np.flatnonzero(row)) for row in problem.start_mask]
+        # Occupied cells per resource as an int bitset
+        self.busy = [0] * problem.n_resources
+        self.assignment = np.full(problem.n_lectures, UNPLACED, dtype=np.int32)
+
+    def cells(self, l: int, start: int) -> int:
+        return ((1 << self.lengths[l]) - 1) << start
+
+    def place(self, l: int, start: int) -> None:
+        self.assignment[l] = start
+        for r in self.resources[l]:
+            self.busy[r] |= self.cells(l, start)
+
+    def unplace(self, l: int) -> None:
+        cells = self.cells(l, int(self.assignment[l]))
+        self.assignment[l] = UNPLACED
+        for r in self.resources[l]:
+            self.busy[r] &= ~cells
+
+    def free_starts(self, l: int) -> int:
+        blocked = 0
+        for r in self.resources[l]:
+            blocked |= self.busy[r]
+        free = ~blocked & ((1 << N_SLOTS) - 1)
+        starts = free
+        for k in range(1, self.lengths[l]):
+            starts &= free >> k
+        return starts & self.start_bits[l]
+
+    def closest(self, l: int, starts: int) -> int:
+        target = int(self.hint[l]) if self.hint[l] >= 0 else 0
+        return min((s for s in range(N_SLOTS) if starts >> s & 1),
+                   key=lambda s: (abs(s // PERIODS - target // PERIODS), abs(s - target), s))
+
+    def evict_one(self, l: int, movable: set[int]) -> bool:
+        """Places l by moving exactly one already re-placed lecture to another free start."""
+        placed = [u for u in movable if self.assignment[u] >= 0
+                  and set(self.resources[u]) & set(self.resources[l])]
+        for start in (s for s in range(N_SLOTS) if self.start_bits[l] >> s & 1):
+            cells = self.cells(l, start)
+            blockers = [u for u in placed if self.cells(u, int(self.assignment[u])) & cells]
+            if len(blockers) != 1:
+                continue
+            u = blockers[0]
+            old = int(self.assignment[u])
+            self.unplace(u)
+            if self.free_starts(l) >> start & 1:
+                self.place(l, start)
+                alternatives = self.free_starts(u) & ~(1 << old)
+                if alternatives:
+                    self.place(u, self.closest(u, alternatives))
+                    return True
+                self.unplace(l)
+            self.place(u, old)
+        return False
+
+
+def repair_assignment(problem: Problem, fixed: np.ndarray, hint: np.ndarray,
+                      affected: list[int]) -> RepairResult:
+    """Keeps every start in ``fixed`` and re-places only the ``affected`` lectures."""
+    started = time.perf_counter()
+    repairer = _Repairer(problem, hint)
+    kept = 0
+    for l in np.flatnonzero(fixed >= 0):
+        # Two unchanged lectures can still collide if the input moved them into a shared resource
+        if repairer.free_starts(int(l)) >> int(fixed[l]) & 1:
+            repairer.place(int(l), int(fixed[l]))
+            kept += 1
+        else:
+            affected.append(int(l))
+
+    order = sorted(affected, key=lambda l: (repairer.free_starts(l).bit_count(), -repairer.lengths[l]))
+    movable = set(order)
+    unplaced, evictions = [], 0
+    for l in order:
+        starts = repairer.free_starts(l)
+        if starts:
+            repairer.place(l, repairer.closest(l, starts))
+        elif repairer.evict_one(l, movable):
+            evictions += 1
+        else:
+            unplaced.append(l)
+    return RepairResult(
+        assignment=repairer.assignment,
+        kept=kept,
+        affected=sorted(affected),
+        unplaced=sorted(unplaced),
+        evictions=evictions,
+        elapsed=time.perf_counter() - started,
+    )
+
+
+def repair_from_snapshot(problem: Problem, snapshot: dict[str, Any],
+                         rows: Iterable[dict[str, Any]]) -> Optional[RepairResult]:
+    """Incremental solve against a stored snapshot; None when the snapshot cannot be used."""
+    if not snapshot or snapshot.get('version') != SNAPSHOT_VERSION:
+        return None
+    fixed, hint, affected = diff_snapshot(problem, snapshot)
+    result = repair_assignment(problem, fixed, hint, affected)
+    old_rows = {tuple(r) for r in snapshot.get('rows', [])}
+    new_rows = {tuple(r) for r in normalised_rows(rows)}
+    result.rows_added, result.rows_removed = len(new_rows - old_rows), len(old_rows - new_rows)
+    return result
@@ -0,0 +1,250 @@
+# instrumentation.py
+"""Per-stage latency histograms, a Prometheus ``/metrics`` endpoint and a slow-request log.
+
+Code marks its stages with ``span('name')`` (a context manager) or the
+``timed('name')`` decorator. Every span is observed in the
+``timetable_stage_seconds{stage=...}`` histogram with its full duration. A
+span that runs on the thread handling a request is also added to that
+request's breakdown with its self-time: the time spent in spans nested
+inside it is counted for those stages only, so the breakdown adds up to at
+most the request time. Spans on worker threads, such as job-queue solves or
+pooled S3 fetches, only reach the histograms.
+
+``init_app(app)`` adds the request middleware:
+
+- ``timetable_request_seconds{method, endpoint, status}`` times each request;
+- template rendering is timed as the ``render_template`` stage;
+- requests slower than ``SLOW_REQUEST_SECONDS`` are logged with their per-stage
+  breakdown;
+- ``GET /metrics`` serves every histogram in the Prometheus text format.
+
+``instrument_client`` wraps a storage client so every S3 call is timed as
+``s3.<operation>``. Metrics are kept per process; with several server
+processes each one exports its own.
+"""
+import contextvars
+import functools
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Iterator, Optional
+
+SLOW_REQUEST_SECONDS = float(os.environ.get('TIMETABLE_SLOW_REQUEST_SECONDS', '1.0'))
+# Upper bounds in seconds; spans range from sub-millisecond cache hits to multi-second solves
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+S3_OPERATIONS = {'get_object', 'head_object', 'put_object', 'delete_object', 'list_objects_v2'}
+PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_bound(bound: float) -> str:
+    return '+Inf' if bound == float('inf') else repr(bound)
+
+
+class Histogram:
+    """Cumulative-bucket histogram with one series per label combination."""
+
+    def __init__(self, name: str, help_text: str, labels: tuple[str, ...], buckets: tuple[float, ...] = BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self.bounds = tuple(buckets) + (float('inf'),)
+        # label values -> [bucket counts..., sum, count]
+        self._series: dict[tuple[str, ...], list[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *label_values: str) -> None:
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [0] * len(self.bounds) + [0.0, 0]
+            for i, bound in enumerate(self.bounds):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self) -> list[str]:
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            series = sorted((k, list(v)) for k, v in self._series.items())
+        for label_values, values in series:
+            labels = ','.join(f'{n}="{_escape(v)}"' for n, v in zip(self.labels, label_values))
+            prefix = f'{labels},' if labels else ''
+            for bound, count in zip(self.bounds, values):
+                lines.append(f'{self.name}_bucket{{{prefix}le="{_format_bound(bound)}"}} {count}')
+            lines.append(f'{self.name}_sum{{{labels}}} {values[-2]}')
+            lines.append(f'{self.name}_count{{{labels}}} {values[-1]}')
+        return lines
+
+
+stage_seconds = Histogram('timetable_stage_seconds', 'Time spent in each instrumented stage.', ('stage',))
+request_seconds = Histogram('timetable_request_seconds', 'HTTP request latency.', ('method', 'endpoint', 'status'))
+HISTOGRAMS = [stage_seconds, request_seconds]
+
+# (stage, seconds) spans recorded on the thread handling the current request
+_request_spans: contextvars.ContextVar[Optional[list[tuple[str, float]]]] = \
+    contextvars.ContextVar('request_spans', default=None)
+_render_started: contextvars.ContextVar[Optional[float]] = contextvars.ContextVar('render_started', default=None)
+# Seconds spent in spans nested inside the innermost open span, as a one-element list
+_child_seconds: contextvars.ContextVar[Optional[list[float]]] = contextvars.ContextVar('child_seconds', default=None)
+
+
+def _observe(stage: str, seconds: float, self_seconds: float) -> None:
+    stage_seconds.observe(seconds, stage)
+    spans = _request_spans.get()
+    if spans is not None:
+        spans.append((stage, self_seconds))
+
+
+def record(stage: str, seconds: float) -> None:
+    """Records a stage timed by the caller; it counts as nested in the enclosing span, if any."""
+    parent = _child_seconds.get()
+    if parent is not None:
+        parent[0] += seconds
+    _observe(stage, seconds, seconds)
+
+
+@contextmanager
+def span(stage: str) -> Iterator[None]:
+    children = [0.0]
+    token = _child_seconds.set(children)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        _child_seconds.reset(token)
+        parent = _child_seconds.get()
+        if parent is not None:
+            parent[0] += elapsed
+        _observe(stage, elapsed, max(elapsed - children[0], 0.0))
+
+
+def timed(stage: str) -> Callable[[Callable], Callable]:
+    def decorator(fn: Callable) -> Callable:
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(stage):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def breakdown(spans: list[tuple[str, float]]) -> dict[str, dict[str, float]]:
+    """Total self-time seconds and call count per stage, slowest stage first."""
+    totals: dict[str, list[float]] = {}
+    for stage, seconds in spans:
+        entry = totals.setdefault(stage, [0.0, 0])
+        entry[0] += seconds
+        entry[1] += 1
+    return {stage: {'seconds': round(total, 4), 'calls': calls}
+            for stage, (total, calls) in sorted(totals.items(), key=lambda item: -item[1][0])}
+
+
+def render_metrics() -> str:
+    lines = []
+    for histogram in HISTOGRAMS:
+        lines += histogram.render()
+    return '\n'.join(lines) + '\n'
+
+
+# ------------------------------------------------------------------------
+# Storage client wrapper
+# ------------------------------------------------------------------------
+class _InstrumentedPaginator:
+    def __init__(self, paginator, operation: str):
+        self._paginator = paginator
+        self._operation = operation
+
+    def paginate(self, **kwargs) -> Iterator[dict[str, Any]]:
+        pages = iter(self._paginator.paginate(**kwargs))
+        while True:
+            # Each page is one request; the exhausted call after the last page is not
+            started = time.perf_counter()
+            page = next(pages, None)
+            if page is None:
+                return
+            record(f's3.{self._operation}', time.perf_counter() - started)
+            yield page
+
+
+class InstrumentedClient:
+    """Forwards everything to ``client``; the S3 operations in S3_OPERATIONS are timed."""
+
+    def __init__(self, client):
+        self._client = client
+
+    def __getattr__(self, name: str) -> Any:
+        attr = getattr(self._client, name)
+        if name in S3_OPERATIONS:
+            return timed(f's3.{name}')(attr)
+        return attr
+
+    def get_paginator(self, operation: str) -> _InstrumentedPaginator:
+        return _InstrumentedPaginator(self._client.get_paginator(operation), operation)
+
+
+def instrument_client(client) -> InstrumentedClient:
+    return InstrumentedClient(client)
+
+
+# ------------------------------------------------------------------------
+# Flask middleware
+# ------------------------------------------------------------------------
+def init_app(app, slow_request_seconds: float = SLOW_REQUEST_SECONDS) -> None:
+    from flask import Response, g, request
+    from flask.signals import before_render_template, template_rendered
+
+    @app.before_request
+    def _start_request() -> None:
+        g.instrumentation_started = time.perf_counter()
+        g.instrumentation_token = _request_spans.set([])
+
+    @app.after_request
+    def _finish_request(response):
+        started = g.pop('instrumentation_started', None)
+        if started is None:
+            return response
+        elapsed = time.perf_counter() - started
+        # The URL rule rather than the path keeps the endpoint label's cardinality bounded
+        endpoint = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+        request_seconds.observe(elapsed, request.method, endpoint, str(response.status_code))
+        if elapsed >= slow_request_seconds:
+            stages = breakdown(_request_spans.get() or [])
+            accounted = sum(stage['seconds'] for stage in stages.values())
+            parts = ', '.join(f"{name}={s['seconds']:.3f}s x{s['calls']}" for name, s in stages.items())
+            logging.warning(
+                f"Slow request {request.method} {request.path} -> {response.status_code} "
+                f"in {elapsed:.3f}s: {parts or 'no instrumented stages'}; "
+                f"other={max(elapsed - accounted, 0):.3f}s"
+            )
+        return response
+
+    @app.teardown_request
+    def _reset_spans(error: Optional[BaseException] = None) -> None:
+        token = g.pop('instrumentation_token', None)
+        if token is not None:
+            _request_spans.reset(token)
+
+    def _render_start(sender, template, context, **extra) -> None:
+        _render_started.set(time.perf_counter())
+
+    def _render_done(sender, template, context, **extra) -> None:
+        started = _render_started.get()
+        if started is not None:
+            _render_started.set(None)
+            record('render_template', time.perf_counter() - started)
+
+    before_render_template.connect(_render_start, app, weak=False)
+    template_rendered.connect(_render_done, app, weak=False)
+
+    def metrics() -> Response:
+        return Response(render_metrics(), content_type=PROMETHEUS_CONTENT_TYPE)
+
+    app.add_url_rule('/metrics', 'metrics', metrics, methods=['GET'])
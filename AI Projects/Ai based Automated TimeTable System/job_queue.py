@@ -0,0 +1,340 @@
+# job_queue.py
+"""Background jobs for long-running timetable generation.
+
+Routes submit work with ``job_queue.submit(key, fn, ...)`` and return the
+job id straight away; a small thread pool runs the work. Solver stages
+already fan out to process pools of their own, so threads are enough here.
+The callable receives a
+``progress(stage, fraction, best_score=None, **details)`` keyword argument
+it can call between stages; ``details`` (e.g. the anytime solver's
+iteration rate) replace the job's previous details. Every change bumps
+``Job.version``, and ``wait_for_update`` blocks until a job moves past a
+given version, which is what the Server-Sent Events route streams.
+A job submitted while an identical one (same key) is still queued or
+running is answered with the existing job, and at most ``max_pending``
+jobs may wait at once, beyond which ``QueueFull`` is raised.
+
+With a storage client (``JobQueue(client, bucket)``) the queue works across
+server processes. The process that runs a job writes its status to
+``jobs/status/<id>.json``. State changes are written at once, and progress at
+most every ``JOB_PERSIST_SECONDS``. A running job is rewritten every
+``JOB_HEARTBEAT_SECONDS`` even without progress. Any process can then answer
+polls and event streams for the job by reading that object.
+
+An unfinished job also holds a marker ``jobs/active/<key hash>.json`` that
+names it. The marker is created with ``IfNoneMatch='*'``, so identical
+submissions to different processes share one job. The pending limit counts
+the queued jobs behind every marker. A marker whose job status has not been
+written for ``JOB_STALE_SECONDS`` belongs to a process that died; it is
+taken over under ``IfMatch`` and is not counted. Without a client, jobs are
+only visible in the process that submitted them.
+"""
+import hashlib
+import json
+import logging
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Callable, Hashable, Optional
+
+from botocore.exceptions import ClientError
+
+from write_coalescer import precondition_failed
+
+JOB_WORKERS = 2
+JOB_MAX_PENDING = 16
+# Finished jobs kept for polling before the oldest are forgotten
+JOB_HISTORY = 200
+
+JOB_PREFIX = 'jobs/'
+JOB_PERSIST_SECONDS = 1.0
+JOB_HEARTBEAT_SECONDS = 30.0
+JOB_STALE_SECONDS = 3 * JOB_HEARTBEAT_SECONDS
+# How often a process without the job re-reads its status while streaming events
+JOB_POLL_SECONDS = 0.5
+MARKER_ATTEMPTS = 3
+
+QUEUED, RUNNING, SUCCEEDED, FAILED = 'queued', 'running', 'succeeded', 'failed'
+
+
+class QueueFull(Exception):
+    """Raised when the pending-job limit is reached; callers should retry later."""
+
+
+def status_key(job_id: str) -> str:
+    return f'{JOB_PREFIX}status/{job_id}.json'
+
+
+def marker_key(key: Hashable) -> str:
+    digest = hashlib.sha256(json.dumps(key, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+    return f'{JOB_PREFIX}active/{digest[:32]}.json'
+
+
+@dataclass
+class Job:
+    id: str
+    key: Hashable
+    status: str = QUEUED
+    stage: str = ''
+    progress: float = 0.0
+    best_score: Optional[float] = None
+    details: dict[str, Any] = field(default_factory=dict)
+    version: int = 0
+    result: Any = None
+    error: Optional[str] = None
+    created: float = field(default_factory=time.time)
+    started: Optional[float] = None
+    finished: Optional[float] = None
+    # When the status was last written to storage (and so when its owner was last seen alive)
+    updated: float = 0.0
+
+    @property
+    def done(self) -> bool:
+        return self.status in (SUCCEEDED, FAILED)
+
+    @property
+    def stale(self) -> bool:
+        return not self.done and time.time() - self.updated > JOB_STALE_SECONDS
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            'job_id': self.id,
+            'status': self.status,
+            'stage': self.stage,
+            'progress': round(self.progress, 3),
+            'best_score': self.best_score,
+            'details': self.details,
+            'result': self.result,
+            'error': self.error,
+            'queued_seconds': round((self.started or time.time()) - self.created, 3),
+            'run_seconds': round((self.finished or time.time()) - self.started, 3) if self.started else None,
+        }
+
+    def record(self) -> dict[str, Any]:
+        """Every field, as stored in ``jobs/status/<id>.json``."""
+        return {name: getattr(self, name) for name in self.__dataclass_fields__}
+
+    @classmethod
+    def from_record(cls, record: dict[str, Any]) -> 'Job':
+        return cls(**{name: record[name] for name in cls.__dataclass_fields__ if name in record})
+
+
+class JobQueue:
+    def __init__(self, client=None, bucket: Optional[str] = None, workers: int = JOB_WORKERS,
+                 max_pending: int = JOB_MAX_PENDING, history: int = JOB_HISTORY):
+        self.client = client
+        self.bucket = bucket
+        self.max_pending = max_pending
+        self.history = history
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='timetable-job')
+        self._jobs: OrderedDict[str, Job] = OrderedDict()
+        self._active: dict[Hashable, Job] = {}
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+        if client is not None:
+            heartbeat = threading.Thread(target=self._heartbeat, name='timetable-job-heartbeat', daemon=True)
+            heartbeat.start()
+
+    def submit(self, key: Hashable, fn: Callable[..., Any], *args, **kwargs) -> tuple[Job, bool]:
+        """Queues ``fn(*args, progress=..., **kwargs)``; returns the job and whether it already existed."""
+        with self._lock:
+            existing = self._active.get(key)
+            if existing is not None:
+                return existing, True
+            if self.client is None:
+                pending = sum(1 for job in self._active.values() if job.status == QUEUED)
+                if pending >= self.max_pending:
+                    raise QueueFull(f"{pending} jobs already waiting")
+        job = Job(id=uuid.uuid4().hex, key=key)
+        if self.client is not None:
+            # Another process, or another thread of this one, may hold an identical job
+            existing = self._claim(job)
+            if existing is not None:
+                return existing, True
+        with self._lock:
+            self._jobs[job.id] = job
+            self._active[key] = job
+            forgotten = self._forget_old()
+        self._executor.submit(self._run, job, fn, args, kwargs)
+        if self.client is not None:
+            for job_id in forgotten:
+                self._delete(status_key(job_id))
+        return job, False
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is None and self.client is not None:
+            return self._load(job_id)
+        return job
+
+    def wait_for_update(self, job_id: str, version: int, timeout: float) -> Optional[Job]:
+        """The job once its version exceeds ``version`` or it is done, else after ``timeout`` seconds."""
+        with self._changed:
+            if job_id in self._jobs:
+                self._changed.wait_for(lambda: (job_id not in self._jobs or self._jobs[job_id].version > version
+                                                or self._jobs[job_id].done), timeout)
+                return self._jobs.get(job_id)
+        if self.client is None:
+            return None
+        # Run by another process: poll its stored status
+        deadline = time.monotonic() + timeout
+        while True:
+            job = self._load(job_id)
+            if job is None or job.version > version or job.done or time.monotonic() >= deadline:
+                return job
+            time.sleep(min(JOB_POLL_SECONDS, max(0.0, deadline - time.monotonic())))
+
+    def _touch(self, job: Job, force: bool = False) -> None:
+        with self._changed:
+            job.version += 1
+            self._changed.notify_all()
+        if self.client is not None and (force or time.time() - job.updated >= JOB_PERSIST_SECONDS):
+            self._persist(job)
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            counts = {QUEUED: 0, RUNNING: 0, SUCCEEDED: 0, FAILED: 0}
+            for job in self._jobs.values():
+                counts[job.status] += 1
+        return {**counts, 'max_pending': self.max_pending}
+
+    def _run(self, job: Job, fn: Callable[..., Any], args: tuple, kwargs: dict) -> None:
+        def progress(stage: str, fraction: float, best_score: Optional[float] = None, **details) -> None:
+            job.stage = stage
+            job.progress = max(job.progress, min(fraction, 1.0))
+            if best_score is not None:
+                job.best_score = best_score if job.best_score is None else min(job.best_score, best_score)
+            if details:
+                job.details = details
+            self._touch(job)
+
+        job.status, job.started = RUNNING, time.time()
+        self._touch(job, force=True)
+        try:
+            job.result = fn(*args, progress=progress, **kwargs)
+            job.status, job.progress, job.stage = SUCCEEDED, 1.0, 'done'
+        except Exception as e:
+            logging.error(f"Job {job.id} ({job.key}) failed: {str(e)}")
+            job.status, job.error = FAILED, str(e)
+        finally:
+            job.finished = time.time()
+            with self._lock:
+                if self._active.get(job.key) is job:
+                    del self._active[job.key]
+            # The final status is written before the marker goes, so no poll ever misses the result
+            self._touch(job, force=True)
+            if self.client is not None:
+                self._release(job)
+
+    def _forget_old(self) -> list[str]:
+        finished = [job_id for job_id, job in self._jobs.items() if job.done]
+        forgotten = finished[:max(0, len(finished) - self.history)]
+        for job_id in forgotten:
+            del self._jobs[job_id]
+        return forgotten
+
+    # ------------------------------------------------------------------
+    # Shared state in storage
+    # ------------------------------------------------------------------
+    def _read(self, key: str) -> tuple[Optional[dict[str, Any]], Optional[str]]:
+        """(decoded JSON, ETag) read straight from the client; ``s3_cache`` could be up to a TTL stale."""
+        try:
+            response = self.client.get_object(Bucket=self.bucket, Key=key)
+        except self.client.exceptions.NoSuchKey:
+            return None, None
+        try:
+            value = json.loads(response['Body'].read().decode('utf-8'))
+        except ValueError as e:
+            logging.warning(f"Ignoring undecodable job object {key}: {str(e)}")
+            value = None
+        return value if isinstance(value, dict) else None, response.get('ETag')
+
+    def _load(self, job_id: str) -> Optional[Job]:
+        try:
+            record, _ = self._read(status_key(job_id))
+        except Exception as e:
+            logging.warning(f"Could not read job {job_id}: {str(e)}")
+            return None
+        return Job.from_record(record) if record is not None else None
+
+    def _persist(self, job: Job) -> None:
+        job.updated = time.time()
+        try:
+            self.client.put_object(Bucket=self.bucket, Key=status_key(job.id),
+                                   Body=json.dumps(job.record(), default=str), ContentType='application/json')
+        except Exception as e:
+            logging.warning(f"Could not store status of job {job.id}: {str(e)}")
+
+    def _delete(self, key: str) -> None:
+        try:
+            self.client.delete_object(Bucket=self.bucket, Key=key)
+        except Exception as e:
+            logging.warning(f"Could not delete {key}: {str(e)}")
+
+    def _claim(self, job: Job) -> Optional[Job]:
+        """
+        Stores ``job`` as queued and points the marker for its key at it. Returns the live job
+        another process already holds for the key instead, or raises QueueFull.
+        """
+        self._check_pending()
+        key = marker_key(job.key)
+        body = json.dumps({'job_id': job.id, 'created': job.created})
+        # The status goes first: a marker must never name a job that cannot be read
+        self._persist(job)
+        try:
+            for _ in range(MARKER_ATTEMPTS):
+                record, etag = self._read(key)
+                if record is not None:
+                    holder = self._load(record.get('job_id', ''))
+                    if holder is not None and not holder.done and not holder.stale:
+                        self._delete(status_key(job.id))
+                        return holder
+                condition = {'IfMatch': etag} if etag is not None else {'IfNoneMatch': '*'}
+                try:
+                    self.client.put_object(Bucket=self.bucket, Key=key, Body=body,
+                                           ContentType='application/json', **condition)
+                except ClientError as e:
+                    if not precondition_failed(e):
+                        raise
+                    continue
+                return None
+        except Exception:
+            self._delete(status_key(job.id))
+            raise
+        self._delete(status_key(job.id))
+        raise QueueFull(f"Job marker {key} kept changing")
+
+    def _check_pending(self) -> None:
+        pending = 0
+        for page in self.client.get_paginator('list_objects_v2').paginate(Bucket=self.bucket,
+                                                                          Prefix=f'{JOB_PREFIX}active/'):
+            for obj in page.get('Contents', []):
+                record, _ = self._read(obj['Key'])
+                holder = self._load(record.get('job_id', '')) if record is not None else None
+                if holder is not None and holder.status == QUEUED and not holder.stale:
+                    pending += 1
+        if pending >= self.max_pending:
+            raise QueueFull(f"{pending} jobs already waiting")
+
+    def _release(self, job: Job) -> None:
+        key = marker_key(job.key)
+        try:
+            record, _ = self._read(key)
+            if record is not None and record.get('job_id') == job.id:
+                self.client.delete_object(Bucket=self.bucket, Key=key)
+        except Exception as e:
+            # A leftover marker is taken over once the job's status shows it is done
+            logging.warning(f"Could not release job marker {key}: {str(e)}")
+
+    def _heartbeat(self) -> None:
+        while True:
+            time.sleep(JOB_HEARTBEAT_SECONDS / 3)
+            with self._lock:
+                running = [job for job in self._active.values()
+                           if time.time() - job.updated >= JOB_HEARTBEAT_SECONDS]
+            for job in running:
+                self._persist(job)
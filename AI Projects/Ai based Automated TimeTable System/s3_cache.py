@@ -0,0 +1,171 @@
+# s3_cache.py
+"""Read-through cache of decoded S3 objects shared by the blueprints.
+
+Entries hold the decoded value (usually parsed JSON) and the object's
+ETag, and are evicted least-recently-used beyond ``max_entries``. Within
+``ttl`` seconds an entry is served straight from memory; after that it is
+revalidated with a conditional GET (``IfNoneMatch``), which costs a round
+trip but no body transfer or parsing when the object is unchanged. When a
+listing already supplies the current ETag, a matching entry is served
+without any request. Writes and deletes made through ``put_object`` /
+``delete_object`` here drop the affected entries immediately; other
+processes only see them on revalidation, so readers that must not lag
+pass ``max_age=0``.
+
+A read with ``if_match`` is sent with ``IfMatch`` and cached under that
+ETag. Content for a given ETag never changes, so such entries are served
+without revalidation. A mismatch raises the 412 ClientError, which lets a
+reader take byte ranges of one object version only (see
+timetable_bundle.BundleReader).
+
+Cached values are shared between callers, not copied, so callers must
+treat them as read-only and copy whatever they modify.
+"""
+import json
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Hashable, Optional
+
+from botocore.exceptions import ClientError
+
+CACHE_MAX_ENTRIES = 1024
+CACHE_TTL_SECONDS = 30.0
+
+
+def json_body(body: bytes) -> Any:
+    return json.loads(body.decode('utf-8'))
+
+
+def raw_body(body: bytes) -> bytes:
+    return body
+
+
+def _not_modified(error: ClientError) -> bool:
+    status = error.response.get('ResponseMetadata', {}).get('HTTPStatusCode')
+    return status == 304 or error.response.get('Error', {}).get('Code') in ('304', 'NotModified')
+
+
+@dataclass
+class _Entry:
+    etag: str
+    value: Any
+    checked: float
+
+
+class S3ObjectCache:
+    def __init__(self, max_entries: int = CACHE_MAX_ENTRIES, ttl: float = CACHE_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: OrderedDict[Hashable, _Entry] = OrderedDict()
+        # (bucket, key) -> cache keys for that object (one per byte range read)
+        self._by_object: dict[tuple[str, str], set[Hashable]] = {}
+        self._lock = threading.Lock()
+        self.hits = self.revalidated = self.misses = self.evictions = 0
+
+    def get(self, client, bucket: str, key: str, decode: Callable[[bytes], Any] = json_body,
+            range_: Optional[str] = None, etag: Optional[str] = None, if_match: Optional[str] = None,
+            max_age: Optional[float] = None) -> Any:
+        """
+        Decoded object body, from memory when possible. ``etag`` is the object's current
+        ETag when the caller already knows it (e.g. from list_objects_v2); ``if_match``
+        requires that ETag (412 otherwise). ``max_age`` overrides ``ttl`` for this read.
+        Errors such as NoSuchKey propagate unchanged.
+        """
+        return self.get_with_etag(client, bucket, key, decode, range_, etag, if_match, max_age)[0]
+
+    def get_with_etag(self, client, bucket: str, key: str, decode: Callable[[bytes], Any] = json_body,
+                      range_: Optional[str] = None, etag: Optional[str] = None, if_match: Optional[str] = None,
+                      max_age: Optional[float] = None) -> tuple[Any, str]:
+        """``get`` that also returns the ETag of the object version the value came from."""
+        cache_key = (bucket, key, range_, decode, if_match)
+        max_age = self.ttl if max_age is None else max_age
+        with self._lock:
+            entry = self._entries.get(cache_key)
+            if entry is not None:
+                self._entries.move_to_end(cache_key)
+                if if_match is not None:
+                    fresh = True
+                elif etag is not None:
+                    fresh = entry.etag == etag
+                else:
+                    fresh = time.monotonic() - entry.checked < max_age
+                if fresh:
+                    self.hits += 1
+                    return entry.value, entry.etag
+
+        request = {'Bucket': bucket, 'Key': key}
+        if range_:
+            request['Range'] = range_
+        if if_match is not None:
+            request['IfMatch'] = if_match
+        elif entry is not None:
+            request['IfNoneMatch'] = entry.etag
+        try:
+            response = client.get_object(**request)
+        except ClientError as e:
+            if entry is None or not _not_modified(e):
+                raise
+            with self._lock:
+                entry.checked = time.monotonic()
+                self.revalidated += 1
+            return entry.value, entry.etag
+
+        value = decode(response['Body'].read())
+        new_etag = response.get('ETag', '')
+        with self._lock:
+            self.misses += 1
+            if any(self._entries[k].etag != new_etag for k in self._by_object.get((bucket, key), ())):
+                # The object changed: cached ranges of it may no longer line up
+                self._drop_object(bucket, key)
+            self._entries[cache_key] = _Entry(new_etag, value, time.monotonic())
+            self._entries.move_to_end(cache_key)
+            self._by_object.setdefault((bucket, key), set()).add(cache_key)
+            while len(self._entries) > self.max_entries:
+                old_key, _ = self._entries.popitem(last=False)
+                self._by_object.get(old_key[:2], set()).discard(old_key)
+                self.evictions += 1
+        return value, new_etag
+
+    def invalidate(self, bucket: str, key: str) -> None:
+        with self._lock:
+            self._drop_object(bucket, key)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._by_object.clear()
+
+    def _drop_object(self, bucket: str, key: str) -> None:
+        for cache_key in self._by_object.pop((bucket, key), set()):
+            self._entries.pop(cache_key, None)
+
+    def put_object(self, client, **kwargs) -> dict:
+        """client.put_object that also drops the cached copies of the written key."""
+        try:
+            return client.put_object(**kwargs)
+        finally:
+            self.invalidate(kwargs['Bucket'], kwargs['Key'])
+
+    def delete_object(self, client, **kwargs) -> dict:
+        try:
+            return client.delete_object(**kwargs)
+        finally:
+            self.invalidate(kwargs['Bucket'], kwargs['Key'])
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            served = self.hits + self.revalidated
+            total = served + self.misses
+            return {
+                'hits': self.hits,
+                'revalidated': self.revalidated,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'entries': len(self._entries),
+                'hit_ratio': round(served / total, 3) if total else 0.0,
+            }
+
+
+s3_cache = S3ObjectCache()
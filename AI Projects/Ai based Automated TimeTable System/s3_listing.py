@@ -0,0 +1,79 @@
+# s3_listing.py
+"""Complete, concurrent listing and fetching of S3 prefixes.
+
+``list_objects_v2`` returns at most 1000 keys per call, so ``iter_objects``
+walks every page with the client's paginator and yields the listing
+entries one at a time. ``fetch_objects`` then reads the bodies on a
+bounded thread pool through the shared ``s3_cache`` (passing the listed
+ETag, so unchanged objects are not downloaded again), retrying throttled
+or dropped requests with exponential backoff. Results come back in
+listing order.
+"""
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Iterable, Iterator, Optional
+
+from botocore.exceptions import BotoCoreError, ClientError
+
+from s3_cache import json_body, s3_cache
+
+FETCH_WORKERS = 8
+FETCH_RETRIES = 3
+RETRY_BASE_DELAY = 0.2
+RETRYABLE_CODES = {'SlowDown', 'Throttling', 'ThrottlingException', 'RequestTimeout',
+                   'InternalError', 'ServiceUnavailable', '500', '503'}
+
+
+def iter_objects(client, bucket: str, prefix: str) -> Iterator[dict[str, Any]]:
+    """Every listing entry (Key, ETag, LastModified, Size) under ``prefix``, across all pages."""
+    paginator = client.get_paginator('list_objects_v2')
+    for page in paginator.paginate(Bucket=bucket, Prefix=prefix):
+        yield from page.get('Contents', [])
+
+
+def iter_keys(client, bucket: str, prefix: str) -> Iterator[str]:
+    for obj in iter_objects(client, bucket, prefix):
+        yield obj['Key']
+
+
+def _retryable(error: Exception) -> bool:
+    if isinstance(error, ClientError):
+        return error.response.get('Error', {}).get('Code') in RETRYABLE_CODES
+    return isinstance(error, BotoCoreError)
+
+
+def fetch_object(client, bucket: str, obj: dict[str, Any], decode: Callable[[bytes], Any] = json_body,
+                 retries: int = FETCH_RETRIES) -> Any:
+    for attempt in range(retries + 1):
+        try:
+            return s3_cache.get(client, bucket, obj['Key'], decode=decode, etag=obj.get('ETag'))
+        except Exception as e:
+            if attempt == retries or not _retryable(e):
+                raise
+            delay = RETRY_BASE_DELAY * 2 ** attempt
+            logging.warning(f"Retrying s3://{bucket}/{obj['Key']} in {delay:.1f}s: {str(e)}")
+            time.sleep(delay)
+
+
+def fetch_objects(client, bucket: str, objects: Iterable[dict[str, Any]],
+                  decode: Callable[[bytes], Any] = json_body, max_workers: int = FETCH_WORKERS,
+                  retries: int = FETCH_RETRIES) -> Iterator[tuple[str, Any, Optional[Exception]]]:
+    """
+    Yields ``(key, value, error)`` for every object, in input order. At most ``max_workers``
+    requests are in flight; a failed object yields its exception instead of stopping the rest.
+    """
+    def task(obj):
+        try:
+            return obj['Key'], fetch_object(client, bucket, obj, decode, retries), None
+        except Exception as e:
+            return obj['Key'], None, e
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        # map() keeps input order; the pool runs at most max_workers requests at a time
+        yield from pool.map(task, objects)
+
+
+def fetch_prefix(client, bucket: str, prefix: str, decode: Callable[[bytes], Any] = json_body,
+                 max_workers: int = FETCH_WORKERS) -> Iterator[tuple[str, Any, Optional[Exception]]]:
+    return fetch_objects(client, bucket, iter_objects(client, bucket, prefix), decode, max_workers)
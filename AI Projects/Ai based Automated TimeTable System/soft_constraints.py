@@ -0,0 +1,404 @@
+# soft_constraints.py
+"""Weighted soft-constraint objective with incremental (delta) evaluation.
+
+The objective of an assignment is a weighted sum of these components:
+
+- ``clashes``: cells where a faculty, class or lab holds more than one lecture;
+- ``unplaced``: lectures without a start slot;
+- ``balance``: for every faculty and class, ``DAYS`` times the variance of its
+  daily load. This is zero when the busy periods are spread evenly over the week;
+- ``consecutive``: faculty periods beyond ``max_consecutive`` in a row;
+- ``gaps``: free periods between the first and last busy period of a faculty's
+  or class's day;
+- ``lab_block``: lab lectures that do not start at one of ``lab_block_starts``.
+
+Every per-day component depends only on the 8-bit occupancy mask of one
+(entity, day). The weighted cost of each mask is precomputed into a
+256-entry table. ``ScoreState`` keeps per-resource occupancy counts,
+day masks and weekly loads up to date. Moving a lecture therefore
+touches only its k resources and at most two days, so ``move_delta`` and
+``swap_delta`` cost O(k). ``move_deltas`` scores every start slot of one
+lecture in a single NumPy pass. ``population_scores`` evaluates whole GA
+populations with the same tables, so every solver optimises the same
+objective.
+
+Weights come from ``ScoreWeights``; ``default_weights()`` applies JSON
+overrides from ``TIMETABLE_SCORE_WEIGHTS``, for example
+``{"gaps": 2, "max_consecutive": 4}``.
+"""
+import json
+import logging
+import os
+from dataclasses import dataclass, fields, replace
+from typing import Optional
+
+import numpy as np
+
+from timetable_model import DAYS, N_SLOTS, PERIODS, UNPLACED, Problem
+
+COMPONENTS = ('clashes', 'unplaced', 'balance', 'consecutive', 'gaps', 'lab_block')
+DAY_COMPONENTS = ('balance', 'consecutive', 'gaps')
+N_MASKS = 1 << PERIODS
+SLOT_DAY = np.arange(N_SLOTS) // PERIODS
+BIT_VALUES = 1 << np.arange(PERIODS)
+# Resource kinds, in Problem resource order
+FACULTY, CLASS, LAB = 0, 1, 2
+
+
+@dataclass
+class ScoreWeights:
+    clashes: float = 1000.0
+    unplaced: float = 100.0
+    balance: float = 1.0
+    consecutive: float = 5.0
+    gaps: float = 0.5
+    lab_block: float = 2.0
+    # Longest run of periods a faculty teaches without penalty
+    max_consecutive: int = 3
+    # 0-based periods where lab blocks should start; the default keeps 2-period labs inside a session pair
+    lab_block_starts: tuple[int, ...] = (0, 2, 4, 6)
+
+
+def default_weights() -> ScoreWeights:
+    """ScoreWeights with the overrides in TIMETABLE_SCORE_WEIGHTS applied."""
+    raw = os.environ.get('TIMETABLE_SCORE_WEIGHTS')
+    if not raw:
+        return ScoreWeights()
+    try:
+        overrides = json.loads(raw)
+        known = {f.name for f in fields(ScoreWeights)}
+        unknown = set(overrides) - known
+        if unknown:
+            logging.warning(f"Ignoring unknown score weights: {sorted(unknown)}")
+        overrides = {k: v for k, v in overrides.items() if k in known}
+        if 'lab_block_starts' in overrides:
+            overrides['lab_block_starts'] = tuple(overrides['lab_block_starts'])
+        return replace(ScoreWeights(), **overrides)
+    except (ValueError, TypeError) as e:
+        logging.warning(f"Invalid TIMETABLE_SCORE_WEIGHTS, using defaults: {str(e)}")
+        return ScoreWeights()
+
+
+def mask_tables(max_consecutive: int) -> dict[str, np.ndarray]:
+    """Per-mask popcount, squared load, over-long runs and internal gaps of one day."""
+    popcount = np.zeros(N_MASKS, dtype=np.int64)
+    consecutive = np.zeros(N_MASKS, dtype=np.int64)
+    gaps = np.zeros(N_MASKS, dtype=np.int64)
+    for mask in range(N_MASKS):
+        bits = [(mask >> p) & 1 for p in range(PERIODS)]
+        popcount[mask] = sum(bits)
+        if mask:
+            first, last = bits.index(1), PERIODS - 1 - bits[::-1].index(1)
+            gaps[mask] = last - first + 1 - popcount[mask]
+        run = 0
+        for bit in bits + [0]:
+            if bit:
+                run += 1
+            else:
+                consecutive[mask] += max(run - max_consecutive, 0)
+                run = 0
+    return {'popcount': popcount, 'balance': popcount ** 2, 'consecutive': consecutive, 'gaps': gaps}
+
+
+def _resource_kinds(problem: Problem) -> np.ndarray:
+    n_fac, n_cls = len(problem.faculty_names), len(problem.class_keys)
+    kinds = np.full(problem.n_resources, LAB, dtype=np.int8)
+    kinds[:n_fac] = FACULTY
+    kinds[n_fac:n_fac + n_cls] = CLASS
+    return kinds
+
+
+def _kind_tables(weights: ScoreWeights) -> tuple[np.ndarray, np.ndarray]:
+    """(component tables [kind, component, mask], weighted cost tables [kind, mask])."""
+    base = mask_tables(weights.max_consecutive)
+    components = np.zeros((3, len(DAY_COMPONENTS), N_MASKS), dtype=np.int64)
+    # Labs have no day-level preferences; classes are not limited in consecutive periods
+    components[FACULTY] = [base[name] for name in DAY_COMPONENTS]
+    components[CLASS] = [base['balance'], np.zeros(N_MASKS, dtype=np.int64), base['gaps']]
+    day_weights = np.asarray([getattr(weights, name) for name in DAY_COMPONENTS], dtype=float)
+    return components, np.tensordot(day_weights, components, axes=(0, 1))
+
+
+def lab_block_penalties(problem: Problem, weights: ScoreWeights) -> np.ndarray:
+    """(lecture, slot) bool: the lecture is a lab block starting outside lab_block_starts."""
+    preferred = np.isin(np.arange(N_SLOTS) % PERIODS, weights.lab_block_starts)
+    return (problem.lec_lab >= 0)[:, None] & ~preferred[None, :]
+
+
+def weighted_score(components: dict[str, float], weights: ScoreWeights) -> float:
+    return float(sum(getattr(weights, name) * components[name] for name in COMPONENTS))
+
+
+def population_components(problem: Problem, population: np.ndarray,
+                          weights: Optional[ScoreWeights] = None) -> dict[str, np.ndarray]:
+    """Every component for each row of ``population`` (pop, lectures), in one batched pass."""
+    weights = weights or default_weights()
+    population = np.atleast_2d(population)
+    n_pop, n_res = population.shape[0], problem.n_resources
+    starts = population[:, problem.cover_lecture]
+    placed = starts >= 0
+    cells = (np.arange(n_pop)[:, None] * n_res + problem.cover_resource[None, :]) * N_SLOTS \
+        + starts + problem.cover_offset[None, :]
+    counts = np.bincount(cells[placed], minlength=n_pop * n_res * N_SLOTS).reshape(n_pop, n_res, N_SLOTS)
+
+    busy = (counts > 0).reshape(n_pop, n_res, len(DAYS), PERIODS)
+    masks = busy.astype(np.int64) @ BIT_VALUES
+    components, _ = _kind_tables(weights)
+    kinds = _resource_kinds(problem)
+    # (pop, res, days, component)
+    per_day = components[kinds[None, :, None], :, masks].astype(float)
+    load = mask_tables(weights.max_consecutive)['popcount'][masks].sum(axis=2)
+    totals = np.where(kinds[None, :] != LAB, load, 0)
+    result = {
+        'clashes': np.maximum(counts - 1, 0).sum(axis=(1, 2)),
+        'unplaced': (population < 0).sum(axis=1),
+        'balance': per_day[..., 0].sum(axis=(1, 2)) - (totals ** 2).sum(axis=1) / len(DAYS),
+        'consecutive': per_day[..., 1].sum(axis=(1, 2)),
+        'gaps': per_day[..., 2].sum(axis=(1, 2)),
+    }
+    lectures = np.broadcast_to(np.arange(problem.n_lectures), population.shape)
+    off_block = lab_block_penalties(problem, weights)[lectures, np.maximum(population, 0)]
+    result['lab_block'] = (off_block & (population >= 0)).sum(axis=1)
+    return result
+
+
+def population_scores(problem: Problem, population: np.ndarray,
+                      weights: Optional[ScoreWeights] = None) -> np.ndarray:
+    weights = weights or default_weights()
+    components = population_components(problem, population, weights)
+    return sum(getattr(weights, name) * components[name] for name in COMPONENTS)
+
+
+def score_assignment(problem: Problem, assignment: np.ndarray,
+                     weights: Optional[ScoreWeights] = None) -> tuple[float, dict[str, float]]:
+    """From-scratch (score, components) of one assignment."""
+    weights = weights or default_weights()
+    components = {k: float(v[0]) for k, v in population_components(problem, assignment[None, :], weights).items()}
+    return weighted_score(components, weights), components
+
+
+class ScoreState:
+    """
+    Incrementally maintained score of one assignment.
+
+    ``move_delta(l, start)`` and ``swap_delta(a, b)`` return the change in score without
+    modifying anything, or inf when a lecture would start outside its ``start_mask`` (e.g.
+    swapping lectures of different lengths); ``apply_move`` and ``apply_swap`` commit a
+    change. ``start`` may be UNPLACED. Counters are plain Python lists: per-element access is what the deltas do,
+    and lists are several times faster at that than NumPy scalars.
+    """
+
+    def __init__(self, problem: Problem, assignment: np.ndarray, weights: Optional[ScoreWeights] = None):
+        self.problem = problem
+        self.weights = weights or default_weights()
+        w = self.weights
+        components, costs = _kind_tables(w)
+        kinds = _resource_kinds(problem)
+        self._popcount = mask_tables(w.max_consecutive)['popcount'].tolist()
+        self._bit = [1 << (s % PERIODS) for s in range(N_SLOTS)]
+        # Per resource: weighted day cost table and component tables, None for labs
+        self._cost = [None if kind == LAB else costs[kind].tolist() for kind in kinds]
+        self._tables = [None if kind == LAB else [t.tolist() for t in components[kind]] for kind in kinds]
+        self._resources = [res.tolist() for res in problem.lec_resources]
+        self._length = problem.lec_length.tolist()
+        self._start_ok = problem.start_mask.tolist()
+        off_block = lab_block_penalties(problem, w)
+        # Trailing 0 so that index UNPLACED (-1) reads "no penalty"
+        self._lab_block = [row.tolist() + [0] for row in off_block.astype(int)]
+        self._inv_days = 1.0 / len(DAYS)
+        # NumPy copies of the tables for move_deltas
+        self._popcount_array = np.asarray(self._popcount)
+        self._cost_array = [None if kind == LAB else costs[kind] for kind in kinds]
+        self._lab_block_array = w.lab_block * off_block.astype(float)
+        self._block_array = np.where(problem.start_mask,
+                                     ((1 << problem.lec_length.astype(np.int64)[:, None]) - 1)
+                                     << (np.arange(N_SLOTS) % PERIODS)[None, :], 0)
+
+        self.start = [UNPLACED] * problem.n_lectures
+        self._counts = [[0] * N_SLOTS for _ in range(problem.n_resources)]
+        self._masks = [[0] * len(DAYS) for _ in range(problem.n_resources)]
+        self._load = [0] * problem.n_resources
+        self.components = dict.fromkeys(COMPONENTS, 0.0)
+        self.components['unplaced'] = float(problem.n_lectures)
+        for l, start in enumerate(np.asarray(assignment).tolist()):
+            if start >= 0:
+                self.apply_move(l, int(start))
+
+    # -- queries ---------------------------------------------------------
+    @property
+    def score(self) -> float:
+        return weighted_score(self.components, self.weights)
+
+    def assignment(self) -> np.ndarray:
+        return np.asarray(self.start, dtype=np.int32)
+
+    def _block(self, start: int, length: int) -> int:
+        return ((1 << length) - 1) << (start % PERIODS)
+
+    def _allowed(self, lecture: int, start: int) -> bool:
+        return start == UNPLACED or 0 <= start < N_SLOTS and self._start_ok[lecture][start]
+
+    def move_delta(self, lecture: int, start: int) -> float:
+        """Score change if ``lecture`` moved to ``start``; inf when it cannot start there."""
+        old = self.start[lecture]
+        if start == old:
+            return 0.0
+        if not self._allowed(lecture, start):
+            return float('inf')
+        w = self.weights
+        length = self._length[lecture]
+        lab_block = self._lab_block[lecture]
+        delta = w.lab_block * (lab_block[start] - lab_block[old])
+        if old < 0:
+            delta -= w.unplaced
+        if start < 0:
+            delta += w.unplaced
+        old_day = old // PERIODS if old >= 0 else -1
+        new_day = start // PERIODS if start >= 0 else -1
+        added = self._block(start, length) if start >= 0 else 0
+        for r in self._resources[lecture]:
+            counts = self._counts[r]
+            removed = 0
+            if old >= 0:
+                for c in range(old, old + length):
+                    if counts[c] >= 2:
+                        delta -= w.clashes
+                    else:
+                        removed |= self._bit[c]
+            if start >= 0:
+                for c in range(start, start + length):
+                    n = counts[c] - (1 if 0 <= old <= c < old + length else 0)
+                    if n >= 1:
+                        delta += w.clashes
+            cost = self._cost[r]
+            if cost is None:
+                continue
+            masks = self._masks[r]
+            popcount = self._popcount
+            changed_load = 0
+            if old_day == new_day:
+                m = masks[old_day]
+                after = (m & ~removed) | added
+                delta += cost[after] - cost[m]
+                changed_load += popcount[after] - popcount[m]
+            else:
+                if old_day >= 0:
+                    m = masks[old_day]
+                    delta += cost[m & ~removed] - cost[m]
+                    changed_load -= popcount[removed]
+                if new_day >= 0:
+                    m = masks[new_day]
+                    delta += cost[m | added] - cost[m]
+                    changed_load += popcount[added & ~m]
+            if changed_load:
+                load = self._load[r]
+                delta -= w.balance * ((load + changed_load) ** 2 - load ** 2) * self._inv_days
+        return delta
+
+    def swap_delta(self, a: int, b: int) -> float:
+        """Score change if lectures ``a`` and ``b`` exchanged start slots; inf when either cannot."""
+        start_a, start_b = self.start[a], self.start[b]
+        if start_a == start_b:
+            return 0.0
+        if not (self._allowed(a, start_b) and self._allowed(b, start_a)):
+            return float('inf')
+        first = self.move_delta(a, start_b)
+        # Lectures that share a resource interact, so b is scored against a's new position
+        self._move(a, start_b)
+        second = self.move_delta(b, start_a)
+        self._move(a, start_a)
+        return first + second
+
+    def move_deltas(self, lecture: int) -> np.ndarray:
+        """Score change for every start slot of ``lecture`` (inf where it cannot start)."""
+        w = self.weights
+        old = self.start[lecture]
+        length = self._length[lecture]
+        removal = self.move_delta(lecture, UNPLACED) if old >= 0 else 0.0
+        block = self._block_array[lecture]
+        deltas = self._lab_block_array[lecture] + (removal - w.unplaced)
+        popcount = self._popcount_array
+        for r in self._resources[lecture]:
+            counts = np.array(self._counts[r])
+            masks = np.array(self._masks[r])
+            load = self._load[r]
+            if old >= 0:
+                counts[old:old + length] -= 1
+                old_day = old // PERIODS
+                masks[old_day] = (counts[old_day * PERIODS:(old_day + 1) * PERIODS] > 0) @ BIT_VALUES
+                load += int(popcount[masks[old_day]]) - self._popcount[self._masks[r][old_day]]
+            # Busy cells each start would overlap
+            busy = np.concatenate([counts > 0, np.zeros(length, dtype=bool)])
+            overlap = busy[:N_SLOTS].astype(float)
+            for k in range(1, length):
+                overlap += busy[k:k + N_SLOTS]
+            deltas += w.clashes * overlap
+            cost = self._cost_array[r]
+            if cost is None:
+                continue
+            before = masks[SLOT_DAY]
+            after = before | block
+            grown = popcount[after] - popcount[before]
+            deltas += cost[after] - cost[before]
+            deltas -= w.balance * ((load + grown) ** 2 - load ** 2) * self._inv_days
+        deltas[~self.problem.start_mask[lecture]] = np.inf
+        if old >= 0:
+            deltas[old] = 0.0
+        return deltas
+
+    # -- updates ---------------------------------------------------------
+    def apply_move(self, lecture: int, start: int) -> float:
+        """Moves ``lecture`` to ``start`` and returns the score change."""
+        before = self.score
+        self._move(lecture, start)
+        return self.score - before
+
+    def apply_swap(self, a: int, b: int) -> float:
+        before = self.score
+        start_a, start_b = self.start[a], self.start[b]
+        self._move(a, start_b)
+        self._move(b, start_a)
+        return self.score - before
+
+    def _move(self, lecture: int, start: int) -> None:
+        old = self.start[lecture]
+        if start == old:
+            return
+        counters = self.components
+        length = self._length[lecture]
+        lab_block = self._lab_block[lecture]
+        counters['lab_block'] += lab_block[start] - lab_block[old]
+        counters['unplaced'] += (start < 0) - (old < 0)
+        days = {d for d in (old // PERIODS if old >= 0 else -1, start // PERIODS if start >= 0 else -1) if d >= 0}
+        for r in self._resources[lecture]:
+            counts = self._counts[r]
+            if old >= 0:
+                for c in range(old, old + length):
+                    counts[c] -= 1
+                    if counts[c] >= 1:
+                        counters['clashes'] -= 1
+            if start >= 0:
+                for c in range(start, start + length):
+                    if counts[c] >= 1:
+                        counters['clashes'] += 1
+                    counts[c] += 1
+            tables = self._tables[r]
+            if tables is None:
+                continue
+            masks = self._masks[r]
+            load = self._load[r]
+            for d in days:
+                m = masks[d]
+                after = 0
+                for p in range(PERIODS):
+                    if counts[d * PERIODS + p]:
+                        after |= 1 << p
+                if after == m:
+                    continue
+                for name, table in zip(DAY_COMPONENTS, tables):
+                    counters[name] += table[after] - table[m]
+                self._load[r] += self._popcount[after] - self._popcount[m]
+                masks[d] = after
+            if self._load[r] != load:
+                counters['balance'] -= (self._load[r] ** 2 - load ** 2) * self._inv_days
+        self.start[lecture] = start
@@ -0,0 +1,333 @@
+# storage.py
+"""Object storage shared by the blueprints, selected through configuration.
+
+Every backend offers the subset of the boto3 S3 client API the app uses
+(``get_object`` with ``Range``/``IfMatch``/``IfNoneMatch``, ``put_object`` with
+``IfMatch``/``IfNoneMatch='*'`` conditions,
+``delete_object``, ``head_object``, ``list_objects_v2``, the
+``list_objects_v2`` paginator and ``exceptions.NoSuchKey``), so the
+caches, listing helpers and routes work unchanged on any of them:
+
+- ``s3``: one boto3 client with a tuned connection pool, shared by all blueprints.
+- ``local``: files under a root directory (``<root>/<bucket>/<key>``); writes go
+  to a temporary file that is renamed into place, so readers never see a partial object.
+- ``memory``: a process-local dict, for single-node deployments, tests and offline benchmarks.
+
+The backend comes from the ``TIMETABLE_STORAGE`` environment variable
+(``s3`` by default) and ``TIMETABLE_STORAGE_ROOT`` for the local backend.
+The bucket is ``TIMETABLE_BUCKET``; without it the S3 backend uses
+``aws_credentials.BUCKET_NAME`` and the local and memory backends use
+``DEFAULT_BUCKET``. Only the S3 backend imports ``aws_credentials``.
+"""
+import contextlib
+import hashlib
+import io
+import os
+import tempfile
+import threading
+from datetime import datetime, timezone
+from types import SimpleNamespace
+from typing import Any, Iterator, Optional
+
+import boto3
+from botocore.config import Config
+from botocore.exceptions import ClientError
+
+try:
+    import fcntl
+except ImportError:  # Windows: conditional writes are only serialised within the process
+    fcntl = None
+
+from instrumentation import instrument_client
+
+STORAGE_BACKEND = os.environ.get('TIMETABLE_STORAGE', 's3')
+STORAGE_ROOT = os.environ.get('TIMETABLE_STORAGE_ROOT', 'storage_data')
+DEFAULT_BUCKET = 'timetable-data'
+S3_MAX_POOL_CONNECTIONS = 32
+LIST_PAGE_SIZE = 1000
+
+
+class NoSuchKey(ClientError):
+    def __init__(self, key: str):
+        super().__init__({'Error': {'Code': 'NoSuchKey', 'Message': f'No such key: {key}'},
+                          'ResponseMetadata': {'HTTPStatusCode': 404}}, 'GetObject')
+
+
+def _not_modified() -> ClientError:
+    return ClientError({'Error': {'Code': '304', 'Message': 'Not Modified'},
+                        'ResponseMetadata': {'HTTPStatusCode': 304}}, 'GetObject')
+
+
+def _precondition_failed(key: str, operation: str = 'PutObject') -> ClientError:
+    return ClientError({'Error': {'Code': 'PreconditionFailed', 'Message': f'Precondition failed: {key}'},
+                        'ResponseMetadata': {'HTTPStatusCode': 412}}, operation)
+
+
+def _byte_range(header: Optional[str], size: int) -> tuple[int, int]:
+    """(start, end) exclusive for an HTTP ``bytes=a-b`` / ``bytes=a-`` range."""
+    if not header:
+        return 0, size
+    start, _, end = header.split('=', 1)[1].partition('-')
+    return int(start), min(int(end) + 1, size) if end else size
+
+
+def _to_bytes(body: Any) -> bytes:
+    if isinstance(body, str):
+        return body.encode('utf-8')
+    if hasattr(body, 'read'):
+        return body.read()
+    return bytes(body)
+
+
+class _Paginator:
+    def __init__(self, backend: 'ObjectStore'):
+        self.backend = backend
+
+    def paginate(self, Bucket: str, Prefix: str = '', **kwargs) -> Iterator[dict[str, Any]]:
+        token = None
+        while True:
+            page = self.backend.list_objects_v2(Bucket=Bucket, Prefix=Prefix, ContinuationToken=token)
+            yield page
+            token = page.get('NextContinuationToken')
+            if not token:
+                return
+
+
+class ObjectStore:
+    """S3-shaped interface implemented by the local and in-memory backends."""
+
+    exceptions = SimpleNamespace(NoSuchKey=NoSuchKey)
+    _write_lock = threading.Lock()
+
+    def _locked(self, bucket: str, key: str):
+        """Serialises conditional writes so the check and the write cannot interleave."""
+        return self._write_lock
+
+    # Subclasses store and load (body, etag, last_modified, content_type)
+    def _load(self, bucket: str, key: str) -> Optional[tuple[bytes, str, datetime, str]]:
+        raise NotImplementedError
+
+    def _store(self, bucket: str, key: str, body: bytes, content_type: str) -> str:
+        raise NotImplementedError
+
+    def _remove(self, bucket: str, key: str) -> None:
+        raise NotImplementedError
+
+    def _keys(self, bucket: str, prefix: str) -> list[str]:
+        raise NotImplementedError
+
+    def _describe(self, bucket: str, key: str) -> Optional[tuple[str, datetime, int]]:
+        """(etag, last_modified, size) without reading the body where the backend allows it."""
+        stored = self._load(bucket, key)
+        return None if stored is None else (stored[1], stored[2], len(stored[0]))
+
+    def get_object(self, Bucket: str, Key: str, Range: Optional[str] = None, IfMatch: Optional[str] = None,
+                   IfNoneMatch: Optional[str] = None, **kwargs) -> dict[str, Any]:
+        stored = self._load(Bucket, Key)
+        if stored is None:
+            raise NoSuchKey(Key)
+        body, etag, modified, content_type = stored
+        if IfMatch is not None and IfMatch != etag:
+            raise _precondition_failed(Key, 'GetObject')
+        if IfNoneMatch is not None and IfNoneMatch == etag:
+            raise _not_modified()
+        start, end = _byte_range(Range, len(body))
+        return {'Body': io.BytesIO(body[start:end]), 'ETag': etag, 'LastModified': modified,
+                'ContentLength': max(0, end - start), 'ContentType': content_type}
+
+    def head_object(self, Bucket: str, Key: str, **kwargs) -> dict[str, Any]:
+        stored = self._load(Bucket, Key)
+        if stored is None:
+            raise NoSuchKey(Key)
+        body, etag, modified, content_type = stored
+        return {'ETag': etag, 'LastModified': modified, 'ContentLength': len(body), 'ContentType': content_type}
+
+    def put_object(self, Bucket: str, Key: str, Body: Any = b'', ContentType: str = 'binary/octet-stream',
+                   IfMatch: Optional[str] = None, IfNoneMatch: Optional[str] = None, **kwargs) -> dict[str, Any]:
+        body = _to_bytes(Body)
+        if IfMatch is None and IfNoneMatch is None:
+            return {'ETag': self._store(Bucket, Key, body, ContentType)}
+        with self._locked(Bucket, Key):
+            current = self._describe(Bucket, Key)
+            if IfMatch is not None and (current is None or current[0] != IfMatch):
+                raise _precondition_failed(Key)
+            if IfNoneMatch == '*' and current is not None:
+                raise _precondition_failed(Key)
+            return {'ETag': self._store(Bucket, Key, body, ContentType)}
+
+    def delete_object(self, Bucket: str, Key: str, **kwargs) -> dict[str, Any]:
+        self._remove(Bucket, Key)
+        return {}
+
+    def list_objects_v2(self, Bucket: str, Prefix: str = '', ContinuationToken: Optional[str] = None,
+                        MaxKeys: int = LIST_PAGE_SIZE, **kwargs) -> dict[str, Any]:
+        keys = sorted(k for k in self._keys(Bucket, Prefix) if not ContinuationToken or k > ContinuationToken)
+        page, more = keys[:MaxKeys], len(keys) > MaxKeys
+        contents = []
+        for key in page:
+            described = self._describe(Bucket, key)
+            if described is not None:
+                etag, modified, size = described
+                contents.append({'Key': key, 'ETag': etag, 'LastModified': modified, 'Size': size})
+        response: dict[str, Any] = {'KeyCount': len(contents), 'IsTruncated': more}
+        if contents:
+            response['Contents'] = contents
+        if more:
+            response['NextContinuationToken'] = page[-1]
+        return response
+
+    def get_paginator(self, operation: str) -> _Paginator:
+        if operation != 'list_objects_v2':
+            raise NotImplementedError(operation)
+        return _Paginator(self)
+
+
+class MemoryStore(ObjectStore):
+    def __init__(self):
+        self._objects: dict[tuple[str, str], tuple[bytes, str, datetime, str]] = {}
+        self._lock = threading.Lock()
+
+    def _load(self, bucket, key):
+        with self._lock:
+            return self._objects.get((bucket, key))
+
+    def _store(self, bucket, key, body, content_type):
+        etag = f'"{hashlib.md5(body).hexdigest()}"'
+        with self._lock:
+            self._objects[(bucket, key)] = (body, etag, datetime.now(timezone.utc), content_type)
+        return etag
+
+    def _remove(self, bucket, key):
+        with self._lock:
+            self._objects.pop((bucket, key), None)
+
+    def _keys(self, bucket, prefix):
+        with self._lock:
+            return [k for b, k in self._objects if b == bucket and k.startswith(prefix)]
+
+
+def _file_etag(stat: os.stat_result) -> str:
+    # mtime and size identify a version: every write replaces the file
+    return f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+
+
+class LocalStore(ObjectStore):
+    def __init__(self, root: str = STORAGE_ROOT):
+        self.root = os.path.abspath(root)
+
+    @contextlib.contextmanager
+    def _locked(self, bucket: str, key: str):
+        # Other processes sharing the directory take the same per-bucket file lock
+        os.makedirs(os.path.join(self.root, bucket), exist_ok=True)
+        with self._write_lock, open(os.path.join(self.root, bucket, '.lock'), 'a') as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _path(self, bucket: str, key: str) -> str:
+        path = os.path.abspath(os.path.join(self.root, bucket, key))
+        if not path.startswith(os.path.join(self.root, bucket) + os.sep):
+            raise ValueError(f"Key escapes the storage root: {key}")
+        return path
+
+    def _load(self, bucket, key):
+        path = self._path(bucket, key)
+        try:
+            with open(path, 'rb') as f:
+                body = f.read()
+                stat = os.fstat(f.fileno())
+        except (FileNotFoundError, IsADirectoryError):
+            return None
+        return body, _file_etag(stat), datetime.fromtimestamp(stat.st_mtime, timezone.utc), 'application/octet-stream'
+
+    def _describe(self, bucket, key):
+        try:
+            stat = os.stat(self._path(bucket, key))
+        except FileNotFoundError:
+            return None
+        return _file_etag(stat), datetime.fromtimestamp(stat.st_mtime, timezone.utc), stat.st_size
+
+    def _store(self, bucket, key, body, content_type):
+        path = self._path(bucket, key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.tmp-')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(body)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, path)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.unlink(tmp)
+            raise
+        return _file_etag(os.stat(path))
+
+    def _remove(self, bucket, key):
+        try:
+            os.unlink(self._path(bucket, key))
+        except FileNotFoundError:
+            pass
+
+    def _keys(self, bucket, prefix):
+        base = os.path.join(self.root, bucket)
+        keys = []
+        for directory, _, files in os.walk(base):
+            for name in files:
+                if name.startswith('.tmp-') or name == '.lock' and directory == base:
+                    continue
+                key = os.path.relpath(os.path.join(directory, name), base).replace(os.sep, '/')
+                if key.startswith(prefix):
+                    keys.append(key)
+        return keys
+
+
+def s3_client():
+    from aws_credentials import AWS_ACCESS_KEY, AWS_SECRET_KEY, REGION_NAME
+    return boto3.client(
+        's3',
+        aws_access_key_id=AWS_ACCESS_KEY,
+        aws_secret_access_key=AWS_SECRET_KEY,
+        region_name=REGION_NAME,
+        config=Config(max_pool_connections=S3_MAX_POOL_CONNECTIONS, tcp_keepalive=True,
+                      retries={'max_attempts': 3, 'mode': 'standard'})
+    )
+
+
+def create_storage(backend: str = STORAGE_BACKEND, root: str = STORAGE_ROOT):
+    if backend == 's3':
+        return s3_client()
+    if backend == 'local':
+        return LocalStore(root)
+    if backend == 'memory':
+        return MemoryStore()
+    raise ValueError(f"Unknown storage backend: {backend}")
+
+
+def bucket_name(backend: str = STORAGE_BACKEND) -> str:
+    """The bucket every blueprint reads and writes, from ``TIMETABLE_BUCKET``."""
+    configured = os.environ.get('TIMETABLE_BUCKET')
+    if configured:
+        return configured
+    if backend == 's3':
+        from aws_credentials import BUCKET_NAME
+        return BUCKET_NAME
+    return DEFAULT_BUCKET
+
+
+_storage = None
+_storage_lock = threading.Lock()
+
+
+def get_storage():
+    """The process-wide storage client, created on first use from the configuration.
+    Every S3 call made through it is timed (instrumentation.py)."""
+    global _storage
+    with _storage_lock:
+        if _storage is None:
+            _storage = instrument_client(create_storage())
+        return _storage
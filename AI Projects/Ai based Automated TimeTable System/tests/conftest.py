@@ -0,0 +1,48 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('TIMETABLE_STORAGE', 'memory')
+
+from benchmark import synthetic_sheets  # noqa: E402
+from s3_cache import s3_cache  # noqa: E402
+from storage import MemoryStore  # noqa: E402
+from timetable_model import build_problem, count_clashes  # noqa: E402
+
+BUCKET = 'test-bucket'
+
+
+def assert_feasible(problem, assignment):
+    """No double-booked resource, and every placed lecture starts where its start_mask allows."""
+    assert assignment.shape == (problem.n_lectures,)
+    placed = assignment >= 0
+    assert problem.start_mask[placed, assignment[placed]].all()
+    assert count_clashes(problem, assignment) == 0
+
+
+@pytest.fixture
+def store():
+    return MemoryStore()
+
+
+@pytest.fixture(autouse=True)
+def clear_s3_cache():
+    # The process-wide cache would otherwise carry objects from one test's store into the next
+    s3_cache.clear()
+    yield
+    s3_cache.clear()
+
+
+@pytest.fixture(scope='session')
+def sheets():
+    """Faculty, course and lab rows of a small synthetic department; one lab course uses two labs."""
+    faculty, courses, labs = (frame.to_dict('records') for frame in synthetic_sheets(8, 16, 2, 2, seed=1))
+    shared = dict(labs[0], Lab_Name='Lab Shared')
+    return faculty, courses, labs + [shared]
+
+
+@pytest.fixture(scope='session')
+def problem(sheets):
+    return build_problem(*sheets)
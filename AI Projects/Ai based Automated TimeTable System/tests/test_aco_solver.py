@@ -0,0 +1,44 @@
+import numpy as np
+
+from aco_solver import AcoParams, construct_solution, heuristic_matrix, placement_order, solution_cost, solve_aco
+from conftest import assert_feasible
+from timetable_model import UNPLACED, build_problem
+
+FAST = AcoParams(n_ants=4, n_iterations=5, time_limit=5.0)
+
+
+def test_constructed_solutions_are_clash_free(problem):
+    rng = np.random.default_rng(0)
+    weights, difficulty = heuristic_matrix(problem), placement_order(problem)
+    for _ in range(5):
+        assert_feasible(problem, construct_solution(problem, weights, difficulty, rng))
+
+
+def test_solve_aco_places_everything_without_clashes(problem):
+    result = solve_aco(problem, FAST, n_colonies=1, seed=1)
+    assert_feasible(problem, result.assignment)
+    assert result.unplaced == 0
+    assert result.cost == solution_cost(problem, result.assignment)
+    assert result.history == sorted(result.history, reverse=True)
+
+
+def test_solve_aco_is_reproducible_for_a_seed(problem):
+    first = solve_aco(problem, FAST, n_colonies=1, seed=5)
+    second = solve_aco(problem, FAST, n_colonies=1, seed=5)
+    np.testing.assert_array_equal(first.assignment, second.assignment)
+
+
+def test_overloaded_faculty_leaves_lectures_unplaced():
+    # 60 single periods for one teacher do not fit in a 48-slot week
+    rows = [{'Faculty_Name': 'A', 'Subject': f'S{i}', 'Course_Code': f'C{i}', 'Year': 'I'} for i in range(15)]
+    courses = [{'Course_Code': f'C{i}', 'Year': 'I', 'Semester': 'I', 'Course_Type': 'Theory'} for i in range(15)]
+    problem = build_problem(rows, courses)
+    result = solve_aco(problem, FAST, n_colonies=1, seed=0)
+    assert_feasible(problem, result.assignment)
+    assert result.unplaced == problem.n_lectures - 48
+    assert (result.assignment == UNPLACED).sum() == result.unplaced
+
+
+def test_empty_problem():
+    result = solve_aco(build_problem([]), FAST)
+    assert result.assignment.size == 0 and result.cost == 0
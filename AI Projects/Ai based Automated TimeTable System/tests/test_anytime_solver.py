@@ -0,0 +1,40 @@
+import pytest
+
+from anytime_solver import AnytimeParams, solve_anytime
+from conftest import assert_feasible
+from graph_coloring import solve_graph_coloring
+from soft_constraints import score_assignment
+from timetable_model import build_problem
+
+SHORT = AnytimeParams(budget=0.3, progress_interval=0.05, checkpoint_interval=0.05)
+
+
+def test_result_is_clash_free_and_no_worse_than_the_construction(problem):
+    result = solve_anytime(problem, SHORT, seed=0)
+    assert_feasible(problem, result.assignment)
+    score, components = score_assignment(problem, result.assignment)
+    assert result.score == score and result.components == components
+    start_score, _ = score_assignment(problem, solve_graph_coloring(problem).assignment)
+    assert result.score <= start_score
+    assert result.iterations > 0 and result.elapsed < SHORT.budget + 1.0
+    assert [best for _, best in result.history] == sorted((best for _, best in result.history), reverse=True)
+
+
+def test_progress_and_checkpoints_are_streamed(problem):
+    reports, checkpoints = [], []
+    result = solve_anytime(problem, SHORT, seed=1, progress=reports.append,
+                           checkpoint=lambda assignment, score: checkpoints.append((assignment.copy(), score)))
+    assert len(reports) >= 2
+    assert {'score', 'best_score', 'iterations_per_second', 'temperature', 'budget_seconds'} <= set(reports[0])
+    assert reports[-1]['best_score'] == round(result.score, 3)
+    if result.improvements:
+        assert checkpoints
+        scores = [score for _, score in checkpoints]
+        assert scores == sorted(scores, reverse=True)
+        for assignment, score in checkpoints:
+            assert score_assignment(problem, assignment)[0] == pytest.approx(score)
+
+
+def test_empty_problem():
+    result = solve_anytime(build_problem([]), SHORT)
+    assert result.assignment.size == 0 and result.iterations == 0
@@ -0,0 +1,59 @@
+import pytest
+
+from benchmark import compare, department_rows, run_benchmark, synthetic_sheets
+
+
+def test_synthetic_sheets_spread_courses_over_classes():
+    faculty, courses, labs = synthetic_sheets(5, 20, 3, 4, semesters=2, seed=0)
+    assert len(faculty) == len(courses) == 20
+    assert courses.groupby(['Year', 'Semester']).size().tolist() == [3] * 4 + [2] * 4
+    assert set(labs['Course_Code']) == set(courses.loc[courses['Course_Type'] == 'Lab', 'Course_Code'])
+    # Round-robin over the roster keeps the load within one course
+    load = faculty['Faculty_Name'].value_counts()
+    assert load.max() - load.min() <= 1
+    assert (faculty['No.of.Subjects_Handling'] == faculty['Faculty_Name'].map(load)).all()
+
+
+def test_synthetic_sheets_are_reproducible():
+    first, second = synthetic_sheets(8, 16, 2, 2, seed=3), synthetic_sheets(8, 16, 2, 2, seed=3)
+    for a, b in zip(first, second):
+        assert a.equals(b)
+    with pytest.raises(ValueError):
+        synthetic_sheets(8, 16, 2, 11)
+
+
+def test_synthetic_sheets_always_have_a_lab_course():
+    for seed in range(20):
+        _, courses, labs = synthetic_sheets(8, 8, 1, 2, seed=seed)
+        assert len(labs) >= 1 and (courses['Course_Type'] == 'Lab').sum() == len(labs)
+    assert synthetic_sheets(8, 8, 0, 2)[2].empty
+
+
+def test_run_benchmark_on_memory_backend():
+    result = run_benchmark(8, 8, 1, 2)
+    assert result['workbook']['departments'] == ['I Year', 'II Year']
+    assert result['workbook']['lab_rows'] >= 1
+    assert result['summary']['lectures'] > 0 and result['summary']['clashes'] == 0
+    assert {'workbook', 'upload', 'fetch'} <= set(result['summary']['stage_seconds'])
+
+
+def test_run_benchmark_rejects_an_empty_workbook():
+    with pytest.raises(ValueError):
+        run_benchmark(4, 0, 1, 1)
+
+
+def test_department_rows_filter_on_year():
+    rows = [{'Year': 'I'}, {'Year': ' ii '}, {'Year': 'II'}]
+    assert department_rows(rows, 'II Year') == rows[1:]
+    assert department_rows(rows, 'Default Department') == rows
+
+
+def test_compare_reports_relative_change():
+    def result(solve, unplaced):
+        return {'config': {'faculty': 4}, 'summary': {'stage_seconds': {'aco': solve}, 'total_seconds': solve,
+                                                      'unplaced': unplaced, 'clashes': 0, 'soft_score': 1.0}}
+    lines = compare(result(1.5, 0), result(1.0, 2))
+    assert lines[0].split()[:2] == ['aco', '1.0'] and lines[0].endswith('+50.0%')
+    assert lines[2].split()[-1] == '-100.0%'
+    assert lines[3].endswith('n/a')
+    assert compare(result(1.0, 0), {**result(1.0, 0), 'config': {}})[0].startswith('warning')
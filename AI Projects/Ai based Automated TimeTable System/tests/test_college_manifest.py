@@ -0,0 +1,111 @@
+import json
+
+import pytest
+
+from college_manifest import INFO_PREFIX, SNAPSHOT_KEY, CollegeManifest
+from conftest import BUCKET
+from write_coalescer import ConflictError
+
+
+class HookedClient:
+    """Store wrapper that calls ``hook(key, kwargs)`` before every put_object."""
+
+    def __init__(self, store, hook):
+        self.store = store
+        self.hook = hook
+
+    def put_object(self, **kwargs):
+        self.hook(kwargs['Key'], kwargs)
+        return self.store.put_object(**kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self.store, name)
+
+
+def deltas(store):
+    return [obj['Key'] for obj in store.list_objects_v2(Bucket=BUCKET, Prefix=INFO_PREFIX).get('Contents', [])]
+
+
+def stored_snapshot(store):
+    return json.loads(store.get_object(Bucket=BUCKET, Key=SNAPSHOT_KEY)['Body'].read())
+
+
+def fill(manifest, n=3):
+    for i in range(n):
+        manifest.append({'courses': [{'name': f'C{i}', 'branch': 'CSE'}], 'departments': [f'D{i}'], 'periods': []})
+
+
+def test_view_applies_deltas_in_order_and_compaction_keeps_it(store):
+    manifest = CollegeManifest(store, BUCKET)
+    fill(manifest)
+    before = manifest.view()
+    assert before['departments'] == ['D0', 'D1', 'D2']
+    assert manifest.compact() == {'folded': 3, 'deleted': 3}
+    assert deltas(store) == [] and stored_snapshot(store)['folded'] == []
+    manifest.append({'departments': ['D3']})
+    assert manifest.view()['departments'] == ['D0', 'D1', 'D2', 'D3']
+
+
+def test_view_compacts_past_the_threshold(store):
+    manifest = CollegeManifest(store, BUCKET, threshold=2)
+    fill(manifest)
+    assert manifest.view()['departments'] == ['D0', 'D1', 'D2']
+    assert deltas(store) == []
+
+
+def test_compaction_folds_again_over_a_concurrent_snapshot(store):
+    raced = []
+
+    def concurrent_writer(key, kwargs):
+        if key == SNAPSHOT_KEY and not raced:
+            raced.append(key)
+            # Another process compacts first, with an item this one has not seen
+            CollegeManifest(store, BUCKET).write_snapshot({'courses': [], 'departments': ['Other'], 'periods': []},
+                                                          [], None)
+    manifest = CollegeManifest(HookedClient(store, concurrent_writer), BUCKET)
+    fill(CollegeManifest(store, BUCKET))
+    manifest.compact()
+    assert raced
+    assert manifest.view()['departments'] == ['Other', 'D0', 'D1', 'D2']
+    assert deltas(store) == []
+
+
+def test_deltas_survive_a_compaction_that_never_wins(store, monkeypatch):
+    monkeypatch.setattr('college_manifest.RETRY_BASE_DELAY', 0.0)
+    writes = iter(range(1000))
+
+    def always_first(key, kwargs):
+        if key == SNAPSHOT_KEY:
+            store.put_object(Bucket=BUCKET, Key=SNAPSHOT_KEY, Body=json.dumps({'version': 1, 'n': next(writes)}))
+    fill(CollegeManifest(store, BUCKET))
+    with pytest.raises(ConflictError):
+        CollegeManifest(HookedClient(store, always_first), BUCKET).compact()
+    assert len(deltas(store)) == 3
+
+
+def test_remove_item_rewrites_only_objects_holding_it(store):
+    manifest = CollegeManifest(store, BUCKET)
+    fill(manifest)
+    manifest.compact()
+    fill(manifest)
+    untouched = {key: store.head_object(Bucket=BUCKET, Key=key)['ETag'] for key in deltas(store)}
+    assert manifest.remove_item('courses', 'C1') == 2
+    assert [c['name'] for c in manifest.view()['courses']] == ['C0', 'C2', 'C0', 'C2']
+    changed = [key for key, etag in untouched.items() if store.head_object(Bucket=BUCKET, Key=key)['ETag'] != etag]
+    assert len(changed) == 1
+    assert manifest.remove_item('courses', 'missing') == 0
+
+
+def test_remove_item_survives_a_compaction_in_between(store):
+    compacted = []
+
+    def compact_before_first_rewrite(key, kwargs):
+        if key.startswith(INFO_PREFIX) and not compacted:
+            compacted.append(key)
+            CollegeManifest(store, BUCKET).compact()
+    fill(CollegeManifest(store, BUCKET))
+    manifest = CollegeManifest(HookedClient(store, compact_before_first_rewrite), BUCKET)
+    manifest.remove_item('departments', 'D1')
+    assert compacted
+    assert manifest.view()['departments'] == ['D0', 'D2']
+    assert 'D1' not in stored_snapshot(store)['departments']
@@ -0,0 +1,80 @@
+import numpy as np
+
+from conftest import assert_feasible
+from csp_solver import initial_domains, parse_maintenance, solve_csp, unary_constraint_data
+from timetable_model import DAYS, PERIODS
+
+CONSTRAINTS = ["continuous slots", "maintenance windows", "room capacity"]
+
+
+def domain_starts(domain):
+    return [s for s in range(len(DAYS) * PERIODS) if domain >> s & 1]
+
+
+def multi_lab_lecture(problem):
+    return next(l for l in range(problem.n_lectures) if len(problem.lec_labs[l]) > 1)
+
+
+def test_domains_follow_start_mask(problem):
+    domains = initial_domains(problem, CONSTRAINTS, maintenance={})
+    for l, domain in enumerate(domains):
+        assert domain_starts(domain) == np.flatnonzero(problem.start_mask[l]).tolist()
+
+
+def test_maintenance_windows_apply_to_every_lab_of_a_lecture(problem):
+    lecture = multi_lab_lecture(problem)
+    second_lab = problem.lab_names[problem.lec_labs[lecture][1]]
+    domains = initial_domains(problem, CONSTRAINTS, maintenance={second_lab: [('Monday', 3)]})
+    # A double block starting in period 2 or 3 would run into the window
+    assert domain_starts(domains[lecture])[:6] == [0, 3, 4, 5, 6, 8]
+
+
+def test_room_capacity_sums_the_labs_of_a_lecture(problem):
+    lecture = multi_lab_lecture(problem)
+    names = [problem.lab_names[lab] for lab in problem.lec_labs[lecture]]
+    class_key = problem.class_keys[problem.lec_class[lecture]]
+    capacity = {name: 30 for name in names}
+    fits = initial_domains(problem, CONSTRAINTS, maintenance={}, lab_capacity=capacity, class_size={class_key: 60})
+    too_big = initial_domains(problem, CONSTRAINTS, maintenance={}, lab_capacity=capacity, class_size={class_key: 61})
+    assert fits[lecture] and not too_big[lecture]
+
+
+def test_parse_maintenance_skips_bad_entries():
+    assert parse_maintenance('monday 3; Friday 7, Funday 2, Tuesday 99') == [('Monday', 3), ('Friday', 7)]
+    assert parse_maintenance(float('nan')) == []
+
+
+def test_unary_data_comes_from_the_optional_workbook_columns(problem, sheets):
+    _, courses, labs = sheets
+    lecture = multi_lab_lecture(problem)
+    second_lab = problem.lab_names[problem.lec_labs[lecture][1]]
+    year, semester = problem.class_keys[problem.lec_class[lecture]]
+    labs = [dict(lab, Maintenance='Monday 3', Capacity=30) if lab['Lab_Name'] == second_lab else
+            dict(lab, Capacity=30) for lab in labs]
+    courses = [dict(course, Class_Size=70 if (course['Year'], course['Semester']) == (year, semester) else 40)
+               for course in courses]
+    data = unary_constraint_data(courses, labs)
+    assert data['maintenance'] == {second_lab: [('Monday', 3)]}
+    assert data['class_size'][(year, semester)] == 70
+    domains = initial_domains(problem, CONSTRAINTS, **data)
+    # Two labs of 30 seats cannot hold a class of 70
+    assert not domains[lecture]
+    # Without the columns nothing is restricted
+    assert unary_constraint_data(*sheets[1:]) == {'maintenance': {}, 'lab_capacity': {}, 'class_size': {}}
+
+
+def test_solve_csp_finds_a_complete_clash_free_assignment(problem):
+    result = solve_csp(problem, CONSTRAINTS, timeout=10.0)
+    assert result.complete and not result.timed_out
+    assert_feasible(problem, result.assignment)
+
+
+def test_partial_result_when_a_lecture_has_no_legal_start(problem):
+    lecture = multi_lab_lecture(problem)
+    lab = problem.lab_names[problem.lec_labs[lecture][0]]
+    # Every period of the week is a maintenance window for the lab
+    windows = [(day, period) for day in DAYS for period in range(1, PERIODS + 1)]
+    result = solve_csp(problem, CONSTRAINTS, timeout=2.0, maintenance={lab: windows})
+    assert not result.complete
+    assert result.assignment[lecture] < 0
+    assert_feasible(problem, result.assignment)
@@ -0,0 +1,58 @@
+import pytest
+
+from conftest import BUCKET
+from generation_cache import GenerationCache, generation_key
+
+
+def object_key(department, faculty):
+    return f'timetable_generation/{department}/generation{"_" + faculty if faculty else ""}.json'
+
+
+ROWS = {'faculty': [{'Faculty_Name': 'A', 'Year': 'I', 'Lab': None}], 'courses': [{'Course_Code': 'M1'}]}
+RESULT = {'faculty_timetable': {'A': {'Monday': {'Period1': 'Maths (M1)'}}}, 'suggestion': 'ok'}
+
+
+def test_key_ignores_cell_formatting_but_not_content():
+    key = generation_key(ROWS, ['continuous slots'], {'seed': 1})
+    reformatted = {'faculty': [{'Faculty_Name': ' A ', 'Year': 'I', 'Lab': float('nan')}],
+                   'courses': [{'Course_Code': 'M1'}]}
+    assert generation_key(reformatted, ['continuous slots'], {'seed': 1}) == key
+    assert generation_key(ROWS, ['continuous slots'], {'seed': 2}) != key
+    assert generation_key(ROWS, [], {'seed': 1}) != key
+    changed = {**ROWS, 'courses': [{'Course_Code': 'M2'}]}
+    assert generation_key(changed, ['continuous slots'], {'seed': 1}) != key
+
+
+@pytest.mark.parametrize('codec', ['json', 'msgpack+gzip'])
+def test_results_are_shared_through_storage(store, monkeypatch, codec):
+    monkeypatch.setattr('timetable_codec.TIMETABLE_CODEC', codec)
+    writer = GenerationCache(store, BUCKET, object_key)
+    reader = GenerationCache(store, BUCKET, object_key)
+    assert reader.get('I', None, 'k1') is None
+    writer.put('I', None, 'k1', RESULT)
+    assert reader.get('I', None, 'k1') == RESULT
+    assert reader.get('I', None, 'k1') == RESULT
+    assert reader.stats()['storage_hits'] == 1 and reader.stats()['memory_hits'] == 1
+    # A newer input for the scope replaces the stored result
+    writer.put('I', None, 'k2', {'suggestion': 'newer'})
+    assert GenerationCache(store, BUCKET, object_key).get('I', None, 'k1') is None
+
+
+def test_returned_results_are_private_copies(store):
+    GenerationCache(store, BUCKET, object_key).put('I', 'A', 'k1', RESULT)
+    cache = GenerationCache(store, BUCKET, object_key)
+    for _ in range(2):
+        # The first get is a storage hit, the second a memory hit
+        result = cache.get('I', 'A', 'k1')
+        result['faculty_timetable']['A']['Monday']['Period1'] = 'changed'
+    assert GenerationCache(store, BUCKET, object_key).get('I', 'A', 'k1') == RESULT
+    assert cache.get('I', 'A', 'k1') == RESULT
+
+
+def test_least_recently_used_results_are_forgotten(store):
+    cache = GenerationCache(store, BUCKET, object_key, max_entries=1)
+    cache.put('I', None, 'k1', RESULT)
+    cache.put('II', None, 'k2', RESULT)
+    assert cache.stats()['entries'] == 1
+    assert cache.get('I', None, 'k1') == RESULT
+    assert cache.stats()['storage_hits'] == 1
@@ -0,0 +1,50 @@
+import numpy as np
+
+from aco_solver import AcoParams, solve_aco
+from conftest import assert_feasible
+from genetic_solver import GaParams, drop_clashes, solve_genetic, valid_start_table
+from soft_constraints import score_assignment
+from timetable_model import UNPLACED
+
+FAST = GaParams(population=20, generations=15, time_budget=5.0)
+
+
+def test_valid_start_table_lists_start_mask(problem):
+    table, counts = valid_start_table(problem)
+    for l in range(problem.n_lectures):
+        np.testing.assert_array_equal(table[l, :counts[l]], np.flatnonzero(problem.start_mask[l]))
+
+
+def test_drop_clashes_keeps_the_earliest_lecture(problem):
+    assignment = np.full(problem.n_lectures, UNPLACED, dtype=np.int32)
+    # Lectures of one course share faculty and class, so all of them clash at slot 0
+    assignment[:4] = 0
+    kept = drop_clashes(problem, assignment)
+    assert kept[:4].tolist() == [0, UNPLACED, UNPLACED, UNPLACED]
+    assert_feasible(problem, kept)
+
+
+def test_drop_clashes_on_random_assignments(problem):
+    rng = np.random.default_rng(0)
+    table, counts = valid_start_table(problem)
+    for _ in range(10):
+        assignment = table[np.arange(problem.n_lectures), rng.integers(0, counts)].astype(np.int32)
+        dropped = drop_clashes(problem, assignment)
+        assert_feasible(problem, dropped)
+        placed = dropped >= 0
+        np.testing.assert_array_equal(dropped[placed], assignment[placed])
+
+
+def test_solve_genetic_result_is_clash_free(problem):
+    result = solve_genetic(problem, params=FAST, seed=2)
+    assert_feasible(problem, result.assignment)
+    score, components = score_assignment(problem, result.assignment, FAST.weights)
+    assert result.components == components
+    assert result.fitness == score
+
+
+def test_seeded_search_does_not_lose_the_seed(problem):
+    seed = solve_aco(problem, AcoParams(n_ants=4, n_iterations=5), n_colonies=1, seed=1).assignment
+    result = solve_genetic(problem, seeds=[seed], params=FAST, seed=3)
+    assert_feasible(problem, result.assignment)
+    assert result.fitness <= score_assignment(problem, seed, FAST.weights)[0]
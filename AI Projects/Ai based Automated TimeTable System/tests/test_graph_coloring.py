@@ -0,0 +1,38 @@
+import numpy as np
+
+from conftest import assert_feasible
+from graph_coloring import conflict_bitsets, solve_graph_coloring
+from timetable_model import UNPLACED, build_problem
+
+
+def test_conflict_bitsets_join_lectures_sharing_a_resource(problem):
+    bitsets = conflict_bitsets(problem)
+    for a in range(problem.n_lectures):
+        for b in range(problem.n_lectures):
+            shared = a != b and bool(set(problem.lec_resources[a]) & set(problem.lec_resources[b]))
+            assert bool(bitsets[a] >> b & 1) == shared
+
+
+def test_colouring_places_every_lecture_without_clashes(problem):
+    result = solve_graph_coloring(problem)
+    assert_feasible(problem, result.assignment)
+    assert result.unplaced == []
+    np.testing.assert_array_equal(solve_graph_coloring(problem).assignment, result.assignment)
+
+
+def test_fixed_starts_are_kept(problem):
+    first = solve_graph_coloring(problem).assignment
+    fixed = np.full(problem.n_lectures, UNPLACED, dtype=np.int32)
+    fixed[::3] = first[::3]
+    result = solve_graph_coloring(problem, fixed)
+    assert_feasible(problem, result.assignment)
+    np.testing.assert_array_equal(result.assignment[::3], first[::3])
+
+
+def test_unplaceable_lectures_are_reported():
+    rows = [{'Faculty_Name': 'A', 'Subject': f'S{i}', 'Course_Code': f'C{i}', 'Year': 'I'} for i in range(15)]
+    courses = [{'Course_Code': f'C{i}', 'Year': 'I', 'Semester': 'I', 'Course_Type': 'Theory'} for i in range(15)]
+    # 60 single periods for one teacher do not fit in a 48-slot week
+    result = solve_graph_coloring(build_problem(rows, courses))
+    assert len(result.unplaced) == 60 - 48
+    assert result.unplaced == [int(l) for l in np.flatnonzero(result.assignment == UNPLACED)]
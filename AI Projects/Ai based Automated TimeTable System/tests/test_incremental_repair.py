@@ -0,0 +1,54 @@
+import json
+
+import numpy as np
+
+from conftest import assert_feasible
+from graph_coloring import solve_graph_coloring
+from incremental_repair import SNAPSHOT_VERSION, diff_snapshot, input_snapshot, repair_from_snapshot
+from timetable_model import build_problem
+
+
+def stored_snapshot(problem, rows):
+    assignment = solve_graph_coloring(problem).assignment
+    # As it comes back from storage
+    return assignment, json.loads(json.dumps(input_snapshot(problem, assignment, rows)))
+
+
+def test_unchanged_input_keeps_every_lecture(sheets, problem):
+    faculty, courses, labs = sheets
+    assignment, snapshot = stored_snapshot(problem, faculty)
+    result = repair_from_snapshot(build_problem(faculty, courses, labs), snapshot, faculty)
+    np.testing.assert_array_equal(result.assignment, assignment)
+    assert result.kept == problem.n_lectures and result.affected == []
+    assert result.rows_added == result.rows_removed == 0
+
+
+def test_changed_faculty_only_moves_that_course(sheets, problem):
+    faculty, courses, labs = sheets
+    assignment, snapshot = stored_snapshot(problem, faculty)
+    changed = [dict(row) for row in faculty]
+    changed[0]['Faculty_Name'] = changed[1]['Faculty_Name']
+    new_problem = build_problem(changed, courses, labs)
+    result = repair_from_snapshot(new_problem, snapshot, changed)
+    assert_feasible(new_problem, result.assignment)
+    assert result.unplaced == []
+    assert result.affected and all(new_problem.labels[l] == new_problem.labels[result.affected[0]]
+                                   for l in result.affected)
+    untouched = np.setdiff1d(np.arange(new_problem.n_lectures), result.affected)
+    np.testing.assert_array_equal(result.assignment[untouched], assignment[untouched])
+    assert result.rows_added == result.rows_removed == 1
+
+
+def test_lab_change_changes_the_fingerprint(sheets, problem):
+    faculty, courses, labs = sheets
+    _, snapshot = stored_snapshot(problem, faculty)
+    extra = labs + [dict(labs[1], Lab_Name='Lab Extra')]
+    _, _, affected = diff_snapshot(build_problem(faculty, courses, extra), snapshot)
+    assert affected and all(problem.course_codes[l] == labs[1]['Course_Code'] for l in affected)
+
+
+def test_unusable_snapshots_are_ignored(sheets, problem):
+    faculty = sheets[0]
+    _, snapshot = stored_snapshot(problem, faculty)
+    assert repair_from_snapshot(problem, {}, faculty) is None
+    assert repair_from_snapshot(problem, dict(snapshot, version=SNAPSHOT_VERSION + 1), faculty) is None
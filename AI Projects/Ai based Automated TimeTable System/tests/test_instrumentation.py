@@ -0,0 +1,104 @@
+import logging
+from types import SimpleNamespace
+
+import pytest
+from flask import Flask
+
+import instrumentation
+from conftest import BUCKET
+from instrumentation import Histogram, breakdown, instrument_client, record, span, stage_seconds, timed
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def perf_counter(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(instrumentation, 'time', SimpleNamespace(perf_counter=clock.perf_counter))
+    return clock
+
+
+@pytest.fixture
+def request_spans():
+    spans = []
+    token = instrumentation._request_spans.set(spans)
+    yield spans
+    instrumentation._request_spans.reset(token)
+
+
+def series(histogram, *labels):
+    return histogram._series[labels]
+
+
+def test_histogram_buckets_are_cumulative():
+    histogram = Histogram('test_seconds', 'Test.', ('stage',), buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 5.0):
+        histogram.observe(value, 'a')
+    lines = histogram.render()
+    assert 'test_seconds_bucket{stage="a",le="0.1"} 1' in lines
+    assert 'test_seconds_bucket{stage="a",le="1.0"} 2' in lines
+    assert 'test_seconds_bucket{stage="a",le="+Inf"} 3' in lines
+    assert 'test_seconds_count{stage="a"} 3' in lines
+
+
+def test_nested_spans_report_self_time(clock, request_spans):
+    with span('test.outer'):
+        clock.advance(1.0)
+        with span('test.inner'):
+            clock.advance(2.0)
+            record('test.recorded', 0.5)
+        clock.advance(0.25)
+    stages = breakdown(request_spans)
+    assert stages == {
+        'test.inner': {'seconds': 1.5, 'calls': 1},
+        'test.outer': {'seconds': 1.25, 'calls': 1},
+        'test.recorded': {'seconds': 0.5, 'calls': 1},
+    }
+    # The histograms keep each span's full duration
+    assert series(stage_seconds, 'test.outer')[-2:] == [3.25, 1]
+    assert sum(stage['seconds'] for stage in stages.values()) == 3.25
+
+
+def test_spans_outside_a_request_only_reach_the_histogram(clock):
+    timed('test.background')(lambda: clock.advance(0.5))()
+    assert series(stage_seconds, 'test.background')[-1] >= 1
+    assert instrumentation._request_spans.get() is None
+
+
+def test_instrumented_client_times_s3_calls(store, request_spans):
+    client = instrument_client(store)
+    client.put_object(Bucket=BUCKET, Key='a', Body=b'1')
+    client.get_object(Bucket=BUCKET, Key='a')
+    list(client.get_paginator('list_objects_v2').paginate(Bucket=BUCKET, Prefix=''))
+    assert [stage for stage, _ in request_spans] == ['s3.put_object', 's3.get_object', 's3.list_objects_v2']
+    assert client.exceptions is store.exceptions
+
+
+def test_metrics_endpoint_and_slow_request_log(caplog):
+    app = Flask(__name__)
+
+    @app.route('/slow/<name>')
+    def slow(name):
+        with span('test.handler'):
+            return name
+    instrumentation.init_app(app, slow_request_seconds=0.0)
+
+    def get(path):
+        with app.test_request_context(path):
+            return app.full_dispatch_request()
+    with caplog.at_level(logging.WARNING):
+        assert get('/slow/a').get_data() == b'a'
+    assert 'Slow request GET /slow/a -> 200' in caplog.text and 'test.handler=' in caplog.text
+    metrics = get('/metrics')
+    assert metrics.content_type == instrumentation.PROMETHEUS_CONTENT_TYPE
+    text = metrics.get_data(as_text=True)
+    assert 'timetable_request_seconds_count{method="GET",endpoint="/slow/<name>",status="200"}' in text
@@ -0,0 +1,110 @@
+import json
+import threading
+import time
+
+import pytest
+
+from conftest import BUCKET
+from job_queue import FAILED, QUEUED, RUNNING, SUCCEEDED, Job, JobQueue, QueueFull, marker_key, status_key
+
+
+def wait_done(queue, job_id, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    job = queue.get(job_id)
+    while not job.done and time.monotonic() < deadline:
+        job = queue.wait_for_update(job_id, job.version, deadline - time.monotonic())
+    assert job.done
+    return job
+
+
+def wait_running(queue, job_id, timeout=5.0):
+    job = queue.get(job_id)
+    while job.status == QUEUED:
+        job = queue.wait_for_update(job_id, job.version, timeout)
+    return job
+
+
+def blocked(release):
+    def work(value, progress):
+        progress('solve', 0.5, best_score=3.0, iterations=10)
+        release.wait(5)
+        return value
+    return work
+
+
+def test_job_runs_and_reports_progress():
+    queue = JobQueue(workers=1)
+    release = threading.Event()
+    job, existed = queue.submit(('dept', 'fac'), blocked(release), 'answer')
+    assert not existed
+    running = queue.wait_for_update(job.id, 0, 5)
+    while running.stage != 'solve':
+        running = queue.wait_for_update(job.id, running.version, 5)
+    assert running.status == RUNNING and running.best_score == 3.0 and running.details == {'iterations': 10}
+    release.set()
+    finished = wait_done(queue, job.id)
+    assert finished.status == SUCCEEDED and finished.result == 'answer' and finished.progress == 1.0
+
+
+def test_identical_jobs_are_shared_and_pending_jobs_are_bounded():
+    queue = JobQueue(workers=1, max_pending=1)
+    release = threading.Event()
+    first, _ = queue.submit('a', blocked(release), 1)
+    wait_running(queue, first.id)
+    again, existed = queue.submit('a', blocked(release), 1)
+    assert existed and again is first
+    queue.submit('b', blocked(release), 2)
+    with pytest.raises(QueueFull):
+        queue.submit('c', blocked(release), 3)
+    release.set()
+    wait_done(queue, first.id)
+
+
+def test_failures_are_recorded():
+    def fail(progress):
+        raise RuntimeError('no solution')
+    queue = JobQueue(workers=1)
+    job, _ = queue.submit('x', fail)
+    finished = wait_done(queue, job.id)
+    assert finished.status == FAILED and finished.error == 'no solution'
+
+
+def test_queues_sharing_storage_share_jobs_and_status(store):
+    first, second = JobQueue(store, BUCKET, workers=1), JobQueue(store, BUCKET, workers=1)
+    release = threading.Event()
+    job, _ = first.submit(('dept', None), blocked(release), {'rows': 3})
+    shared, existed = second.submit(('dept', None), blocked(release), {'rows': 3})
+    assert existed and shared.id == job.id
+    assert second.get(job.id).status in (QUEUED, RUNNING)
+    release.set()
+    wait_done(first, job.id)
+    remote = second.get(job.id)
+    assert remote.status == SUCCEEDED and remote.result == {'rows': 3}
+    # The marker goes once the job is done, so the next submission starts a new job
+    assert store.list_objects_v2(Bucket=BUCKET, Prefix='jobs/active/')['KeyCount'] == 0
+    fresh, existed = second.submit(('dept', None), blocked(release), {'rows': 4})
+    assert not existed and fresh.id != job.id
+    wait_done(second, fresh.id)
+
+
+def test_pending_limit_counts_jobs_queued_by_other_processes(store):
+    release = threading.Event()
+    busy = JobQueue(store, BUCKET, workers=1, max_pending=1)
+    other = JobQueue(store, BUCKET, workers=1, max_pending=1)
+    running, _ = busy.submit('a', blocked(release), 1)
+    wait_running(busy, running.id)
+    queued, _ = busy.submit('b', blocked(release), 2)
+    with pytest.raises(QueueFull):
+        other.submit('c', blocked(release), 3)
+    release.set()
+    wait_done(busy, queued.id)
+
+
+def test_stale_marker_is_taken_over(store):
+    dead = Job(id='dead', key='k', status=RUNNING, updated=time.time() - 3600)
+    store.put_object(Bucket=BUCKET, Key=status_key(dead.id), Body=json.dumps(dead.record()))
+    store.put_object(Bucket=BUCKET, Key=marker_key('k'), Body=json.dumps({'job_id': dead.id}))
+    queue = JobQueue(store, BUCKET, workers=1)
+    job, existed = queue.submit('k', lambda progress: 'ok')
+    assert not existed and job.id != dead.id
+    assert wait_done(queue, job.id).result == 'ok'
@@ -0,0 +1,108 @@
+import json
+
+import pytest
+from botocore.exceptions import ClientError
+
+from conftest import BUCKET
+from s3_cache import S3ObjectCache, raw_body
+
+
+class CountingClient:
+    """Passes calls through to a store and records every get_object request."""
+
+    def __init__(self, store):
+        self.store = store
+        self.gets = []
+
+    def get_object(self, **kwargs):
+        self.gets.append(kwargs)
+        return self.store.get_object(**kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self.store, name)
+
+
+@pytest.fixture
+def client(store):
+    return CountingClient(store)
+
+
+def put(store, key, value):
+    return store.put_object(Bucket=BUCKET, Key=key, Body=json.dumps(value))['ETag']
+
+
+def test_fresh_entries_are_shared_without_requests(client, store):
+    put(store, 'a.json', {'x': [1]})
+    cache = S3ObjectCache(ttl=60)
+    first = cache.get(client, BUCKET, 'a.json')
+    assert cache.get(client, BUCKET, 'a.json') is first
+    assert len(client.gets) == 1 and cache.stats()['hits'] == 1
+
+
+def test_stale_entries_are_revalidated_by_etag(client, store):
+    etag = put(store, 'a.json', {'x': 1})
+    cache = S3ObjectCache(ttl=60)
+    first = cache.get(client, BUCKET, 'a.json')
+    assert cache.get(client, BUCKET, 'a.json', max_age=0) is first
+    assert client.gets[-1]['IfNoneMatch'] == etag and cache.stats()['revalidated'] == 1
+    # A write by another process is only seen on revalidation
+    put(store, 'a.json', {'x': 2})
+    assert cache.get(client, BUCKET, 'a.json') == {'x': 1}
+    assert cache.get(client, BUCKET, 'a.json', max_age=0) == {'x': 2}
+
+
+def test_known_etag_skips_the_request(client, store):
+    etag = put(store, 'a.json', {'x': 1})
+    cache = S3ObjectCache(ttl=0)
+    cache.get(client, BUCKET, 'a.json')
+    assert cache.get(client, BUCKET, 'a.json', etag=etag) == {'x': 1}
+    assert len(client.gets) == 1
+    newer = put(store, 'a.json', {'x': 2})
+    assert cache.get(client, BUCKET, 'a.json', etag=newer) == {'x': 2}
+
+
+def test_writes_through_the_cache_invalidate(client, store):
+    put(store, 'a.json', {'x': 1})
+    cache = S3ObjectCache(ttl=60)
+    cache.get(client, BUCKET, 'a.json')
+    cache.put_object(client, Bucket=BUCKET, Key='a.json', Body=json.dumps({'x': 2}))
+    assert cache.get(client, BUCKET, 'a.json') == {'x': 2}
+    cache.delete_object(client, Bucket=BUCKET, Key='a.json')
+    with pytest.raises(store.exceptions.NoSuchKey):
+        cache.get(client, BUCKET, 'a.json')
+
+
+def test_if_match_entries_are_keyed_on_the_etag(client, store):
+    etag = store.put_object(Bucket=BUCKET, Key='b.bin', Body=b'0123456789')['ETag']
+    cache = S3ObjectCache(ttl=0)
+    data, seen = cache.get_with_etag(client, BUCKET, 'b.bin', decode=raw_body, range_='bytes=2-4', if_match=etag)
+    assert (data, seen) == (b'234', etag) and client.gets[-1]['IfMatch'] == etag
+    cache.get(client, BUCKET, 'b.bin', decode=raw_body, range_='bytes=2-4', if_match=etag)
+    assert len(client.gets) == 1
+    store.put_object(Bucket=BUCKET, Key='b.bin', Body=b'abcdefghij')
+    with pytest.raises(ClientError) as info:
+        cache.get(client, BUCKET, 'b.bin', decode=raw_body, range_='bytes=5-6', if_match=etag)
+    assert info.value.response['Error']['Code'] == 'PreconditionFailed'
+
+
+def test_ranges_of_a_changed_object_are_dropped(client, store):
+    store.put_object(Bucket=BUCKET, Key='b.bin', Body=b'0123456789')
+    cache = S3ObjectCache(ttl=60)
+    assert cache.get(client, BUCKET, 'b.bin', decode=raw_body, range_='bytes=0-1') == b'01'
+    store.put_object(Bucket=BUCKET, Key='b.bin', Body=b'abcdefghij')
+    assert cache.get(client, BUCKET, 'b.bin', decode=raw_body, range_='bytes=2-3') == b'cd'
+    assert cache.get(client, BUCKET, 'b.bin', decode=raw_body, range_='bytes=0-1') == b'ab'
+
+
+def test_least_recently_used_entries_are_evicted(client, store):
+    for name in 'abc':
+        put(store, f'{name}.json', name)
+    cache = S3ObjectCache(max_entries=2, ttl=60)
+    cache.get(client, BUCKET, 'a.json')
+    cache.get(client, BUCKET, 'b.json')
+    cache.get(client, BUCKET, 'a.json')
+    cache.get(client, BUCKET, 'c.json')
+    assert cache.stats()['evictions'] == 1
+    cache.get(client, BUCKET, 'a.json')
+    cache.get(client, BUCKET, 'b.json')
+    assert [g['Key'] for g in client.gets] == ['a.json', 'b.json', 'c.json', 'b.json']
@@ -0,0 +1,66 @@
+import json
+
+import pytest
+from botocore.exceptions import ClientError
+
+from conftest import BUCKET
+from s3_listing import fetch_objects, fetch_prefix, iter_keys, iter_objects
+
+
+class FlakyClient:
+    """Throttles the first ``failures`` reads of every key."""
+
+    def __init__(self, store, failures, code='SlowDown'):
+        self.store = store
+        self.failures = failures
+        self.code = code
+        self.attempts = {}
+
+    def get_object(self, **kwargs):
+        key = kwargs['Key']
+        self.attempts[key] = self.attempts.get(key, 0) + 1
+        if self.attempts[key] <= self.failures:
+            raise ClientError({'Error': {'Code': self.code, 'Message': 'Slow down'}}, 'GetObject')
+        return self.store.get_object(**kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self.store, name)
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr('s3_listing.RETRY_BASE_DELAY', 0.0)
+
+
+def test_listing_walks_every_page(store):
+    keys = [f'data/{i:05d}.json' for i in range(2500)]
+    for key in keys:
+        store.put_object(Bucket=BUCKET, Key=key, Body=b'{}')
+    assert list(iter_keys(store, BUCKET, 'data/')) == keys
+    assert all('ETag' in obj for obj in iter_objects(store, BUCKET, 'data/00'))
+
+
+def test_fetch_keeps_listing_order_and_reports_errors_per_object(store):
+    for i in range(20):
+        store.put_object(Bucket=BUCKET, Key=f'data/{i:02d}.json', Body=json.dumps(i))
+    store.put_object(Bucket=BUCKET, Key='data/bad.json', Body=b'not json')
+    results = list(fetch_prefix(store, BUCKET, 'data/', max_workers=4))
+    assert [value for _, value, _ in results[:20]] == list(range(20))
+    key, value, error = results[20]
+    assert key == 'data/bad.json' and value is None and isinstance(error, ValueError)
+
+
+def test_throttled_reads_are_retried(store):
+    store.put_object(Bucket=BUCKET, Key='data/a.json', Body=b'1')
+    client = FlakyClient(store, failures=2)
+    objects = list(iter_objects(store, BUCKET, 'data/'))
+    assert list(fetch_objects(client, BUCKET, objects, retries=3)) == [('data/a.json', 1, None)]
+    assert client.attempts['data/a.json'] == 3
+
+
+def test_other_errors_are_not_retried(store):
+    store.put_object(Bucket=BUCKET, Key='data/a.json', Body=b'1')
+    client = FlakyClient(store, failures=1, code='AccessDenied')
+    [(_, value, error)] = fetch_objects(client, BUCKET, list(iter_objects(store, BUCKET, 'data/')))
+    assert value is None and error.response['Error']['Code'] == 'AccessDenied'
+    assert client.attempts['data/a.json'] == 1
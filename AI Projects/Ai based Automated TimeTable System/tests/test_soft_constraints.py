@@ -0,0 +1,78 @@
+import math
+
+import numpy as np
+import pytest
+
+from soft_constraints import COMPONENTS, ScoreState, population_scores, score_assignment
+from timetable_model import N_SLOTS, UNPLACED
+
+
+def random_assignment(problem, rng, unplaced=0.1):
+    assignment = np.full(problem.n_lectures, UNPLACED, dtype=np.int32)
+    for l in range(problem.n_lectures):
+        if rng.random() >= unplaced:
+            assignment[l] = rng.choice(np.flatnonzero(problem.start_mask[l]))
+    return assignment
+
+
+def assert_matches_full_score(problem, state):
+    score, components = score_assignment(problem, state.assignment())
+    assert state.score == pytest.approx(score)
+    for name in COMPONENTS:
+        assert state.components[name] == pytest.approx(components[name]), name
+
+
+@pytest.mark.parametrize('seed', range(3))
+def test_move_and_swap_deltas_match_full_score(problem, seed):
+    rng = np.random.default_rng(seed)
+    state = ScoreState(problem, random_assignment(problem, rng))
+    assert_matches_full_score(problem, state)
+    for _ in range(100):
+        before, _ = score_assignment(problem, state.assignment())
+        a, b = (int(l) for l in rng.integers(problem.n_lectures, size=2))
+        if rng.random() < 0.5:
+            start = int(rng.integers(-1, N_SLOTS))
+            delta = state.move_delta(a, start)
+            if math.isinf(delta):
+                assert not problem.start_mask[a, start] and start != state.start[a]
+                continue
+            applied = state.apply_move(a, start)
+        else:
+            delta = state.swap_delta(a, b)
+            if math.isinf(delta):
+                continue
+            applied = state.apply_swap(a, b)
+        after, _ = score_assignment(problem, state.assignment())
+        assert delta == pytest.approx(after - before)
+        assert applied == pytest.approx(delta)
+        assert_matches_full_score(problem, state)
+
+
+def test_move_deltas_agree_with_move_delta(problem):
+    rng = np.random.default_rng(7)
+    state = ScoreState(problem, random_assignment(problem, rng))
+    for lecture in rng.choice(problem.n_lectures, size=10, replace=False):
+        deltas = state.move_deltas(int(lecture))
+        expected = [state.move_delta(int(lecture), start) for start in range(N_SLOTS)]
+        np.testing.assert_allclose(deltas, expected, atol=1e-9)
+
+
+def test_illegal_swaps_and_moves_are_infinite(problem):
+    rng = np.random.default_rng(3)
+    state = ScoreState(problem, random_assignment(problem, rng, unplaced=0.0))
+    double = int(np.flatnonzero(problem.lec_length == 2)[0])
+    single = int(np.flatnonzero(problem.lec_length == 1)[0])
+    # A single period ending the day cannot take a double block's place and vice versa
+    state.apply_move(single, 7)
+    assert state.swap_delta(double, single) == math.inf
+    assert state.move_delta(double, 7) == math.inf
+    assert state.move_delta(double, N_SLOTS) == math.inf
+    assert state.move_delta(double, UNPLACED) < math.inf
+    assert_matches_full_score(problem, state)
+
+
+def test_population_scores_match_single_scores(problem):
+    rng = np.random.default_rng(11)
+    population = np.stack([random_assignment(problem, rng) for _ in range(6)])
+    expected = [score_assignment(problem, row)[0] for row in population]
+    np.testing.assert_allclose(population_scores(problem, population), expected)
@@ -0,0 +1,72 @@
+import pytest
+from botocore.exceptions import ClientError
+
+from storage import DEFAULT_BUCKET, LocalStore, MemoryStore, bucket_name
+from conftest import BUCKET
+
+
+@pytest.fixture(params=['memory', 'local'])
+def backend(request, tmp_path):
+    return MemoryStore() if request.param == 'memory' else LocalStore(str(tmp_path))
+
+
+def error_code(info):
+    return info.value.response['Error']['Code']
+
+
+def test_put_get_range_and_head(backend):
+    etag = backend.put_object(Bucket=BUCKET, Key='a/b.json', Body='hello world')['ETag']
+    assert backend.get_object(Bucket=BUCKET, Key='a/b.json')['Body'].read() == b'hello world'
+    ranged = backend.get_object(Bucket=BUCKET, Key='a/b.json', Range='bytes=6-10')
+    assert ranged['Body'].read() == b'world' and ranged['ContentLength'] == 5
+    assert backend.head_object(Bucket=BUCKET, Key='a/b.json')['ETag'] == etag
+    with pytest.raises(backend.exceptions.NoSuchKey):
+        backend.get_object(Bucket=BUCKET, Key='missing')
+
+
+def test_conditional_reads(backend):
+    etag = backend.put_object(Bucket=BUCKET, Key='k', Body=b'1')['ETag']
+    with pytest.raises(ClientError) as info:
+        backend.get_object(Bucket=BUCKET, Key='k', IfNoneMatch=etag)
+    assert error_code(info) == '304'
+    with pytest.raises(ClientError) as info:
+        backend.get_object(Bucket=BUCKET, Key='k', IfMatch='"stale"')
+    assert error_code(info) == 'PreconditionFailed'
+    assert backend.get_object(Bucket=BUCKET, Key='k', IfMatch=etag)['Body'].read() == b'1'
+
+
+def test_conditional_writes(backend):
+    etag = backend.put_object(Bucket=BUCKET, Key='k', Body=b'1', IfNoneMatch='*')['ETag']
+    with pytest.raises(ClientError) as info:
+        backend.put_object(Bucket=BUCKET, Key='k', Body=b'2', IfNoneMatch='*')
+    assert error_code(info) == 'PreconditionFailed'
+    newer = backend.put_object(Bucket=BUCKET, Key='k', Body=b'22', IfMatch=etag)['ETag']
+    with pytest.raises(ClientError) as info:
+        backend.put_object(Bucket=BUCKET, Key='k', Body=b'3', IfMatch=etag)
+    assert error_code(info) == 'PreconditionFailed'
+    assert backend.head_object(Bucket=BUCKET, Key='k')['ETag'] == newer
+
+
+def test_listing_paginates_in_key_order(backend):
+    keys = [f'p/{i:03d}' for i in range(7)]
+    for key in reversed(keys):
+        backend.put_object(Bucket=BUCKET, Key=key, Body=key)
+    backend.put_object(Bucket=BUCKET, Key='other/x', Body=b'')
+    first = backend.list_objects_v2(Bucket=BUCKET, Prefix='p/', MaxKeys=3)
+    assert [o['Key'] for o in first['Contents']] == keys[:3] and first['IsTruncated']
+    pages = backend.get_paginator('list_objects_v2').paginate(Bucket=BUCKET, Prefix='p/')
+    assert [o['Key'] for page in pages for o in page.get('Contents', [])] == keys
+
+
+def test_delete(backend):
+    backend.put_object(Bucket=BUCKET, Key='k', Body=b'1')
+    backend.delete_object(Bucket=BUCKET, Key='k')
+    backend.delete_object(Bucket=BUCKET, Key='k')
+    assert backend.list_objects_v2(Bucket=BUCKET, Prefix='k')['KeyCount'] == 0
+
+
+def test_bucket_name_needs_no_credentials_off_s3(monkeypatch):
+    monkeypatch.delenv('TIMETABLE_BUCKET', raising=False)
+    assert bucket_name('memory') == bucket_name('local') == DEFAULT_BUCKET
+    monkeypatch.setenv('TIMETABLE_BUCKET', 'college-timetables')
+    assert bucket_name('s3') == 'college-timetables'
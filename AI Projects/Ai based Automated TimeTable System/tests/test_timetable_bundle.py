@@ -0,0 +1,103 @@
+import pytest
+from botocore.exceptions import ClientError
+
+from conftest import BUCKET
+from timetable_bundle import BundleChanged, BundleReader, faculty_section, pack_bundle, read_manifest, unpack_bundle
+from timetable_codec import resolve_codec
+from write_coalescer import precondition_failed
+
+KEY = 'timetable_generation/I/bundle.ttb'
+
+
+def sections(tag=''):
+    week = {'Monday': {'Period1': f'Maths{tag}'}}
+    result = {'class': {'I': {'I': week}}, 'lab': {'Lab 1': week}}
+    for i in range(40):
+        result[faculty_section(f'Dr. {i:02d}')] = {f'Dr. {i:02d}': {'Tuesday': {'Period2': f'Physics {i}{tag}'}}}
+    return result
+
+
+def store_reader(store, probe, on_fetch=None):
+    calls = []
+
+    def fetch(start, end, etag):
+        calls.append((start, end, etag))
+        if on_fetch is not None:
+            on_fetch(len(calls))
+        try:
+            response = store.get_object(Bucket=BUCKET, Key=KEY, Range=f'bytes={start}-{end}',
+                                        **({'IfMatch': etag} if etag else {}))
+        except ClientError as e:
+            if etag is not None and precondition_failed(e):
+                raise BundleChanged(KEY) from e
+            raise
+        return response['Body'].read(), response['ETag']
+    return BundleReader(fetch, probe=probe), calls
+
+
+@pytest.mark.parametrize('codec', ['json+gzip', 'msgpack+zstd'])
+def test_pack_and_unpack(codec):
+    if resolve_codec(codec) != codec:
+        pytest.skip(f"{codec} needs an optional package")
+    data = pack_bundle(sections(), codec=codec, generation='abc')
+    manifest, unpacked = unpack_bundle(data)
+    assert unpacked == sections()
+    assert manifest['generation'] == 'abc'
+    assert read_manifest(data[:10]) is None
+    with pytest.raises(ValueError):
+        read_manifest(b'NOPE' + data[4:])
+    for short in (b'', data[:5]):
+        with pytest.raises(ValueError):
+            read_manifest(short)
+        with pytest.raises(ValueError):
+            unpack_bundle(short)
+
+
+def test_section_inside_the_probe_costs_one_read(store):
+    store.put_object(Bucket=BUCKET, Key=KEY, Body=pack_bundle(sections()))
+    reader, calls = store_reader(store, probe=1 << 20)
+    assert reader.section('class') == sections()['class']
+    assert reader.section('missing', {}) == {}
+    assert len(calls) == 1
+
+
+def test_small_probe_reads_manifest_then_ranges(store):
+    store.put_object(Bucket=BUCKET, Key=KEY, Body=pack_bundle(sections()))
+    reader, calls = store_reader(store, probe=64)
+    names = [faculty_section('Dr. 03'), faculty_section('Dr. 07')]
+    assert reader.sections(names) == {name: sections()[name] for name in names}
+    assert reader.section('lab') == sections()['lab']
+    # Probe, rest of the manifest, one range for both faculty, one for the lab
+    assert len(calls) == 4
+    assert all(etag == calls[1][2] for _, _, etag in calls[1:]) and calls[1][2] is not None
+
+
+def test_replaced_bundle_is_read_from_its_new_manifest(store):
+    store.put_object(Bucket=BUCKET, Key=KEY, Body=pack_bundle(sections()))
+
+    def replace_after_probe(call):
+        if call == 2:
+            store.put_object(Bucket=BUCKET, Key=KEY, Body=pack_bundle(sections(' (new)')))
+    reader, calls = store_reader(store, probe=64, on_fetch=replace_after_probe)
+    assert reader.manifest is not None
+    assert reader.section('class') == sections(' (new)')['class']
+    assert calls[-1][2] == store.head_object(Bucket=BUCKET, Key=KEY)['ETag']
+
+
+def test_bundle_that_keeps_changing_raises(store):
+    store.put_object(Bucket=BUCKET, Key=KEY, Body=pack_bundle(sections()))
+    versions = iter(range(100))
+
+    def replace_every_time(call):
+        store.put_object(Bucket=BUCKET, Key=KEY, Body=pack_bundle(sections(f' v{next(versions)}')))
+    reader, _ = store_reader(store, probe=64, on_fetch=replace_every_time)
+    with pytest.raises(BundleChanged):
+        reader.section('class')
+
+
+@pytest.mark.parametrize('length', [3, 40])
+def test_reader_rejects_truncated_objects(store, length):
+    store.put_object(Bucket=BUCKET, Key=KEY, Body=pack_bundle(sections())[:length])
+    reader, _ = store_reader(store, probe=16)
+    with pytest.raises(ValueError):
+        reader.names()
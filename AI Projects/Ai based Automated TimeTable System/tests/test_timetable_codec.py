@@ -0,0 +1,58 @@
+import json
+
+import pytest
+
+import timetable_codec
+from graph_coloring import solve_graph_coloring
+from timetable_codec import decode, encode, resolve_codec
+from timetable_model import Timetable
+
+CODECS = ['json', 'json+gzip', 'msgpack', 'msgpack+gzip', 'msgpack+zstd']
+
+
+@pytest.fixture(scope='module')
+def document(problem):
+    assignment = solve_graph_coloring(problem).assignment
+    faculty = Timetable.from_assignment(problem, assignment).to_dict()
+    return {
+        'faculty_timetable': faculty,
+        'one_week': next(iter(faculty.values())),
+        'departments': ['I', 'II'],
+        'stats': {'score': 1.5, 'unplaced': 0, 'empty': {}},
+    }
+
+
+@pytest.mark.parametrize('codec', CODECS)
+def test_round_trip(document, codec):
+    if resolve_codec(codec) != codec:
+        pytest.skip(f"{codec} needs an optional package")
+    body, metadata = encode(document, codec)
+    assert decode(body) == document
+    fmt, _, compression = codec.partition('+')
+    assert metadata['ContentType'] == timetable_codec.CONTENT_TYPES[fmt]
+    assert metadata.get('ContentEncoding') == (compression or None)
+
+
+def test_plain_json_objects_still_decode(document):
+    assert decode(json.dumps(document).encode('utf-8')) == document
+
+
+def test_msgpack_packs_weeks_into_grids(document):
+    pytest.importorskip('msgpack')
+    plain, _ = encode(document, 'json')
+    packed, _ = encode(document, 'msgpack')
+    assert len(packed) < len(plain) / 4
+
+
+def test_missing_optional_packages_fall_back(monkeypatch, document):
+    monkeypatch.setattr(timetable_codec, 'msgpack', None)
+    monkeypatch.setattr(timetable_codec, 'zstandard', None)
+    assert resolve_codec('msgpack+zstd') == 'json+gzip'
+    body, metadata = encode(document, 'msgpack+zstd')
+    assert metadata == {'ContentType': 'application/json', 'ContentEncoding': 'gzip'}
+    assert decode(body) == document
+
+
+def test_unknown_codec():
+    with pytest.raises(ValueError):
+        resolve_codec('xml+gzip')
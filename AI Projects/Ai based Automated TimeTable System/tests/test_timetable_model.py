@@ -0,0 +1,124 @@
+import numpy as np
+
+from graph_coloring import solve_graph_coloring
+from timetable_model import (EMPTY_SLOT, N_SLOTS, PERIODS, UNPLACED, Timetable, assignment_records, block_free,
+                             build_class_timetable, build_lab_timetable, build_problem, count_clashes, course_labs,
+                             encode_faculty_timetable, unplaced_lectures)
+
+ROWS = [
+    {'Faculty_Name': 'A', 'Subject': 'Maths', 'Course_Code': 'M1', 'Year': 'I'},
+    {'Faculty_Name': 'B', 'Subject': 'Maths', 'Course_Code': 'M1', 'Year': 'I'},
+    {'Faculty_Name': 'A', 'Subject': 'Physics Lab', 'Course_Code': 'P1', 'Year': 'I'},
+    {'Faculty_Name': 'B', 'Subject': 'Skills', 'Course_Code': 'TS', 'Year': 'II'},
+]
+COURSES = [
+    {'Course_Code': 'M1', 'Year': 'I', 'Semester': 'I', 'Course_Type': 'Theory'},
+    {'Course_Code': 'P1', 'Year': 'I', 'Semester': 'I', 'Course_Type': 'Lab'},
+    {'Course_Code': 'TS', 'Year': 'I', 'Semester': 'I', 'Course_Type': 'Skill'},
+    {'Course_Code': 'TS', 'Year': 'II', 'Semester': 'III', 'Course_Type': 'Skill'},
+]
+LABS = [{'Lab_Name': 'Lab 1', 'Course_Code': 'P1', 'Type': 'Lab'}]
+
+
+def test_build_problem_groups_lectures_by_class_and_course():
+    problem = build_problem(ROWS, COURSES, LABS)
+    assert problem.faculty_names == ['A', 'B']
+    assert problem.class_keys == [('I', 'I'), ('II', 'III')]
+    assert problem.lab_names == ['Lab 1']
+    # Theory 4x1, Lab 2x2, Skill 2x1 (the year II row of the shared TS code)
+    assert problem.lec_length.tolist() == [1, 1, 1, 1, 2, 2, 1, 1]
+    assert problem.lec_class.tolist() == [0] * 6 + [1] * 2
+    # Both teachers and the class take every Maths lecture; the lab lectures also book the lab
+    assert problem.lec_resources[0].tolist() == [0, 1, 2]
+    assert problem.lec_resources[4].tolist() == [0, 2, 4]
+    assert problem.lec_lab.tolist() == [-1] * 4 + [0, 0] + [-1] * 2
+
+
+def test_start_mask_keeps_blocks_inside_one_day():
+    problem = build_problem(ROWS, COURSES, LABS)
+    periods = np.arange(N_SLOTS) % PERIODS
+    assert problem.start_mask[0].all()
+    np.testing.assert_array_equal(problem.start_mask[4], periods < PERIODS - 1)
+
+
+def test_count_clashes_counts_each_extra_booking():
+    problem = build_problem(ROWS, COURSES, LABS)
+    assignment = np.full(problem.n_lectures, UNPLACED, dtype=np.int32)
+    assignment[:3] = [0, 1, 2]
+    assert count_clashes(problem, assignment) == 0
+    assignment[4] = 1
+    # The double lab block overlaps Maths in periods 1 and 2 for teacher A and the class
+    assert count_clashes(problem, assignment) == 4
+    assert unplaced_lectures(problem, assignment) == [3, 5, 6, 7]
+
+
+def test_block_free():
+    free = np.array([True, True, False, True, True, True])
+    np.testing.assert_array_equal(block_free(free, 2), [True, False, False, True, True, False])
+
+
+def test_course_labs_keeps_every_lab_of_a_course():
+    labs = LABS + [
+        {'Lab_Name': 'Lab 2', 'Course_Code': 'P1', 'Type': 'Lab'},
+        {'Lab_Name': 'Lab 1', 'Course_Code': 'P1', 'Type': 'Lab'},
+        {'Lab_Name': 'Studio', 'Course_Code': 'M1', 'Type': 'Studio'},
+    ]
+    assert course_labs(labs) == {'P1': ['Lab 1', 'Lab 2']}
+    problem = build_problem(ROWS, COURSES, labs)
+    assert [lab.tolist() for lab in problem.lec_labs[4:6]] == [[0, 1], [0, 1]]
+    assert problem.lec_resources[4].tolist() == [0, 2, 4, 5]
+
+
+def test_class_and_lab_views_follow_the_assignment():
+    labs = LABS + [{'Lab_Name': 'Lab 2', 'Course_Code': 'P1', 'Type': 'Lab'}]
+    problem = build_problem(ROWS, COURSES, labs)
+    assignment = np.full(problem.n_lectures, UNPLACED, dtype=np.int32)
+    assignment[0], assignment[4], assignment[6] = 0, 9, 2
+    records = assignment_records(problem, assignment)
+    classes = build_class_timetable(records, COURSES)
+    assert classes['I']['I']['Monday']['Period1'] == 'Maths (M1)'
+    assert classes['I']['I']['Tuesday']['Period2'] == classes['I']['I']['Tuesday']['Period3'] == 'Physics Lab (P1)'
+    assert classes['II']['III']['Monday']['Period3'] == 'Skills (TS)'
+    assert classes['I']['I']['Monday']['Period3'] == EMPTY_SLOT
+    lab_view = build_lab_timetable(records, COURSES, labs)
+    for name in ('Lab 1', 'Lab 2'):
+        assert lab_view[name]['Tuesday']['Period2'] == lab_view[name]['Tuesday']['Period3'] == 'Physics Lab (P1)'
+        assert lab_view[name]['Monday']['Period1'] == EMPTY_SLOT
+    # The lab view lists the same labs the solver books
+    lab_cells = Timetable.from_assignment(problem, assignment, 'lab').to_dict()
+    assert lab_cells == lab_view
+
+
+def test_timetable_round_trips_through_dicts(problem):
+    assignment = solve_graph_coloring(problem).assignment
+    timetable = Timetable.from_assignment(problem, assignment)
+    as_dict = timetable.to_dict()
+    assert list(as_dict) == problem.faculty_names
+    parsed = Timetable.from_dict(as_dict, problem.subject_names)
+    np.testing.assert_array_equal(parsed.grid, timetable.grid)
+    assert parsed.to_dict() == as_dict
+    # Periods per faculty match the lecture lengths they teach
+    expected = np.zeros(len(problem.faculty_names), dtype=int)
+    for l in range(problem.n_lectures):
+        expected[problem.lec_faculty[l]] += problem.lec_length[l]
+    np.testing.assert_array_equal(timetable.load(), expected)
+
+
+def test_encode_recovers_the_assignment(problem):
+    assignment = solve_graph_coloring(problem).assignment
+    timetable = Timetable.from_assignment(problem, assignment)
+    assert encode_faculty_timetable(problem, timetable) is not timetable.assignment
+    recovered = encode_faculty_timetable(problem, timetable.to_dict())
+    # Lectures of one course are interchangeable, so compare the grids they produce
+    np.testing.assert_array_equal(Timetable.from_assignment(problem, recovered).grid, timetable.grid)
+    assert (recovered >= 0).all()
+
+
+def test_free_starts_respect_occupied_cells_and_day_ends():
+    problem = build_problem(ROWS, COURSES, LABS)
+    assignment = np.full(problem.n_lectures, UNPLACED, dtype=np.int32)
+    assignment[0] = 1
+    free = Timetable.from_assignment(problem, assignment).free_starts(2)
+    teacher_a = free[0]
+    assert not teacher_a[0] and not teacher_a[1] and teacher_a[2]
+    assert not teacher_a[PERIODS - 1] and teacher_a[PERIODS]
@@ -0,0 +1,74 @@
+import math
+import os
+
+import numpy as np
+import pytest
+
+from benchmark import synthetic_sheets, write_workbook
+from timetable_model import clean_value
+from timetable_snapshot import compile_snapshot, default_snapshot_dir, load_snapshot
+from workbook_cache import load_workbook, parse_workbook
+
+# Snapshots are optional; without pyarrow the workbook is always parsed
+pytest.importorskip('pyarrow')
+
+
+@pytest.fixture
+def workbook(tmp_path):
+    return write_workbook(str(tmp_path / 'timetable_data.xlsx'), synthetic_sheets(6, 12, 2, 2, seed=4))
+
+
+def normalised(records):
+    return [{column: clean_value(value) for column, value in row.items()} for row in records]
+
+
+def test_snapshot_matches_the_parsed_workbook(workbook):
+    parsed = parse_workbook(workbook)
+    loaded = load_workbook(workbook)
+    assert loaded.snapshot is not None
+    assert (loaded.departments, loaded.faculties) == (parsed.departments, parsed.faculties)
+    for name in ('faculty', 'courses', 'labs'):
+        assert normalised(getattr(loaded, name)) == normalised(getattr(parsed, name))
+
+
+def test_snapshot_records_have_the_types_pandas_parses(tmp_path):
+    faculty, courses, labs = synthetic_sheets(6, 12, 2, 2, seed=4)
+    # Empty cells in text, integer and float columns
+    faculty.loc[0, 'Subject'] = np.nan
+    courses.loc[1, 'Course_Name'] = np.nan
+    labs.loc[0, 'No_of_Courses'] = np.nan
+    labs['Hours'] = 1.5
+    path = write_workbook(str(tmp_path / 'timetable_data.xlsx'), (faculty, courses, labs))
+    parsed, loaded = parse_workbook(path), load_workbook(path)
+    assert loaded.snapshot is not None
+    for name in ('faculty', 'courses', 'labs'):
+        for expected, actual in zip(getattr(parsed, name), getattr(loaded, name)):
+            assert list(actual) == list(expected)
+            for column, value in expected.items():
+                assert type(actual[column]) is type(value), (name, column)
+                assert actual[column] == value or math.isnan(value) and math.isnan(actual[column])
+
+
+def test_touched_workbook_is_not_recompiled(workbook):
+    manifest = compile_snapshot(workbook)
+    stat = os.stat(workbook)
+    os.utime(workbook, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    snapshot = load_snapshot(workbook)
+    assert snapshot.manifest['created_at'] == manifest['created_at']
+
+
+def test_changed_workbook_is_recompiled(workbook):
+    first = compile_snapshot(workbook)
+    write_workbook(workbook, synthetic_sheets(6, 14, 2, 2, seed=5))
+    snapshot = load_snapshot(workbook)
+    assert snapshot.content_hash != first['content_hash']
+    assert len(snapshot.records('courses')) == 14
+    # Table files of the old snapshot are removed
+    assert sorted(os.listdir(default_snapshot_dir(workbook))) == sorted(
+        ['manifest.json'] + [table['file'] for table in snapshot.manifest['tables'].values()])
+
+
+def test_stale_snapshot_is_not_compiled_on_request(workbook):
+    compile_snapshot(workbook)
+    write_workbook(workbook, synthetic_sheets(6, 14, 2, 2, seed=5))
+    assert load_snapshot(workbook, compile_if_stale=False) is None
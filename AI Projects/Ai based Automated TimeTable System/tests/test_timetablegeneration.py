@@ -0,0 +1,117 @@
+import pytest
+
+import blueprints.timetablegeneration as tg
+from benchmark import synthetic_sheets, write_workbook
+from conftest import BUCKET
+from generation_cache import GenerationCache
+from timetable_bundle import faculty_section, unpack_bundle
+
+DEPARTMENT = 'I Year'
+
+
+class RacingClient:
+    """Runs ``race`` once, just before the first conditional PUT of the bundle."""
+
+    def __init__(self, store, race):
+        self.store, self.race = store, race
+
+    def put_object(self, **kwargs):
+        race, self.race = self.race, None
+        if race is not None and kwargs['Key'] == tg.bundle_key(DEPARTMENT):
+            race()
+        return self.store.put_object(**kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self.store, name)
+
+
+class ProcessLocks(dict):
+    """A fresh lock per call, as two server processes would each hold their own."""
+
+    def setdefault(self, key, default=None):
+        return default
+
+
+@pytest.fixture
+def blueprint(monkeypatch, store):
+    monkeypatch.setattr(tg, 's3', store)
+    monkeypatch.setattr(tg, 'BUCKET_NAME', BUCKET)
+    return tg
+
+
+def week(subject):
+    return {'Monday': {'Period1': subject}}
+
+
+def read_bundle(store):
+    return unpack_bundle(store.get_object(Bucket=BUCKET, Key=tg.bundle_key(DEPARTMENT))['Body'].read())[1]
+
+
+def test_racing_faculty_merges_keep_both_sections(blueprint, monkeypatch, store):
+    monkeypatch.setattr(tg, 'RETRY_BASE_DELAY', 0)
+    monkeypatch.setattr(tg, '_bundle_locks', ProcessLocks())
+
+    def other_process():
+        tg.upload_department_bundle(DEPARTMENT, 'Dr. B', {'Dr. B': week('Physics')}, {}, {})
+
+    monkeypatch.setattr(tg, 's3', RacingClient(store, other_process))
+    tg.upload_department_bundle(DEPARTMENT, 'Dr. A', {'Dr. A': week('Maths')}, {}, {})
+    sections = read_bundle(store)
+    assert sections[faculty_section('Dr. A')] == week('Maths')
+    assert sections[faculty_section('Dr. B')] == week('Physics')
+
+    # Against an existing bundle the loser re-reads the winner's write too
+    monkeypatch.setattr(tg, 's3', RacingClient(store, lambda: tg.upload_department_bundle(
+        DEPARTMENT, 'Dr. C', {'Dr. C': week('Chemistry')}, {}, {})))
+    tg.upload_department_bundle(DEPARTMENT, 'Dr. A', {'Dr. A': week('Algebra')}, {}, {})
+    sections = read_bundle(store)
+    assert sections[faculty_section('Dr. A')] == week('Algebra')
+    assert {faculty_section(f'Dr. {x}') for x in 'ABC'} <= set(sections)
+
+
+@pytest.fixture
+def college(blueprint, monkeypatch, store, tmp_path):
+    """Two departments in a fresh workbook; the generation cache writes to ``store``."""
+    path = write_workbook(str(tmp_path / 'timetable_data.xlsx'), synthetic_sheets(8, 12, 2, 2, seed=2))
+    monkeypatch.setattr(tg, 'TIMETABLE_DATA_FILE', path)
+    monkeypatch.setattr(tg, 'generation_cache', GenerationCache(store, BUCKET, tg.generation_result_key))
+    return tg.workbook_cache.get(path)
+
+
+def test_generate_college_timetables_writes_every_department(college, monkeypatch, store):
+    first = tg.generate_college_timetables(max_workers=1)
+    assert first['summary'] == {**first['summary'], 'departments': 2, 'succeeded': 2, 'cached': 0}
+    for department in college.departments:
+        report = first['departments'][department]
+        assert report['status'] == 'success' and not report['cached']
+        for key in report['uploaded_keys']:
+            store.head_object(Bucket=BUCKET, Key=key)
+        assert tg.bundle_key(department) in report['uploaded_keys']
+        assert tg.fetch_department_view(department, 'class')
+        faculty = sorted({row['Faculty_Name'] for row in tg.filter_by_department(college.faculty, department)})
+        timetables, errors = tg.fetch_faculty_timetables(department, faculty)
+        assert not errors and all(timetables.values())
+
+    # A new process only has the stored results to go on
+    monkeypatch.setattr(tg, 'generation_cache', GenerationCache(store, BUCKET, tg.generation_result_key))
+    second = tg.generate_college_timetables(max_workers=1)
+    assert second['summary']['cached'] == 2 and second['summary']['succeeded'] == 2
+    for department in college.departments:
+        assert second['departments'][department]['cached']
+        # The bundle already holds this generation, so nothing is uploaded again
+        assert 'uploaded_keys' not in second['departments'][department]
+
+
+def test_fetch_timetables_reports_missing_and_unreadable_keys(blueprint, store):
+    names = ['Dr. Zed', 'Dr. Missing', 'Dr. Amy', 'Dr. Broken']
+    for name in ('Dr. Zed', 'Dr. Amy'):
+        tg.upload_timetable_to_s3({name: week(name)}, DEPARTMENT, 'faculty', name)
+    store.put_object(Bucket=BUCKET, Body=b'\x00not a timetable',
+                     Key=f'timetable_generation/{DEPARTMENT}/faculty_timetable_{tg.sanitize_faculty_name("Dr. Broken")}.json')
+    timetables, errors = tg.fetch_timetables_from_s3(DEPARTMENT, 'faculty', names)
+    assert list(timetables) == names
+    assert timetables['Dr. Zed'] == {'Dr. Zed': week('Dr. Zed')}
+    assert timetables['Dr. Amy'] == {'Dr. Amy': week('Dr. Amy')}
+    assert timetables['Dr. Missing'] == timetables['Dr. Broken'] == {}
+    assert sorted(errors) == ['Dr. Broken', 'Dr. Missing']
+    assert tg.fetch_timetables_from_s3(DEPARTMENT, 'faculty', []) == ({}, {})
@@ -0,0 +1,52 @@
+import os
+import threading
+
+import pytest
+
+from benchmark import synthetic_sheets, write_workbook
+from workbook_cache import EMPTY_WORKBOOK, WorkbookCache, parse_workbook
+
+
+@pytest.fixture
+def workbook(tmp_path):
+    return write_workbook(str(tmp_path / 'timetable_data.xlsx'), synthetic_sheets(6, 12, 2, 2, seed=4))
+
+
+def test_parse_merges_course_names_and_derives_departments(workbook):
+    data = parse_workbook(workbook)
+    assert data.departments == ['I Year', 'II Year']
+    assert len(data.faculty) == 12 and len(data.courses) == 12
+    assert all(row['Subject'] for row in data.faculty)
+    assert data.faculties == sorted({row['Faculty_Name'] for row in data.faculty})
+
+
+def test_unchanged_file_is_parsed_once(workbook):
+    calls = []
+    cache = WorkbookCache(loader=lambda path: calls.append(path) or parse_workbook(path))
+    first = cache.get(workbook)
+    threads = [threading.Thread(target=cache.get, args=(workbook,)) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert cache.get(workbook) is first
+    assert len(calls) == 1 and cache.stats()['hits'] == 5
+
+
+def test_changed_file_is_parsed_again(workbook):
+    cache = WorkbookCache(loader=parse_workbook)
+    first = cache.get(workbook)
+    write_workbook(workbook, synthetic_sheets(6, 14, 2, 2, seed=5))
+    stat = os.stat(workbook)
+    os.utime(workbook, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    second = cache.get(workbook)
+    assert second is not first and len(second.courses) == 14
+
+
+def test_missing_or_unreadable_workbooks_are_not_cached(tmp_path):
+    cache = WorkbookCache(loader=parse_workbook)
+    assert cache.get(str(tmp_path / 'missing.xlsx')) is EMPTY_WORKBOOK
+    broken = tmp_path / 'broken.xlsx'
+    broken.write_bytes(b'not a workbook')
+    assert cache.get(str(broken)) is EMPTY_WORKBOOK
+    assert cache.stats()['entries'] == 0
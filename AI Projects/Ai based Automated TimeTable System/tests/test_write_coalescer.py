@@ -0,0 +1,94 @@
+import json
+import threading
+
+import pytest
+
+from conftest import BUCKET
+from write_coalescer import ConflictError, WriteCoalescer
+
+KEY = 'departments.json'
+
+
+class RacingClient:
+    """Writes ``value`` to the key just before each of the first ``races`` conditional PUTs."""
+
+    def __init__(self, store, races, value):
+        self.store = store
+        self.races = races
+        self.value = value
+        self.puts = 0
+
+    def put_object(self, **kwargs):
+        self.puts += 1
+        if self.puts <= self.races:
+            self.store.put_object(Bucket=BUCKET, Key=KEY, Body=json.dumps(self.value + [self.puts]))
+        return self.store.put_object(**kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self.store, name)
+
+
+def stored(store):
+    return json.loads(store.get_object(Bucket=BUCKET, Key=KEY)['Body'].read())
+
+
+def append(item):
+    return lambda departments: departments + [item]
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr('write_coalescer.RETRY_BASE_DELAY', 0.0)
+
+
+def test_concurrent_updates_share_one_write(store):
+    coalescer = WriteCoalescer(store, BUCKET, window=0.1)
+    futures = []
+    threads = [threading.Thread(target=lambda i=i: futures.append(coalescer.update(KEY, append(f'D{i}'))))
+               for i in range(10)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    for future in futures:
+        future.result(timeout=5)
+    assert sorted(stored(store)) == sorted(f'D{i}' for i in range(10))
+    assert coalescer.writes == 1 and coalescer.mutations == 10
+
+
+def test_failing_mutation_only_fails_its_own_future(store):
+    coalescer = WriteCoalescer(store, BUCKET, window=0.05)
+
+    def reject(departments):
+        raise ValueError('duplicate')
+    first = coalescer.update(KEY, append('A'))
+    bad = coalescer.update(KEY, reject)
+    last = coalescer.update(KEY, append('B'))
+    assert last.result(timeout=5) == ['A', 'B'] and first.result() == ['A']
+    with pytest.raises(ValueError):
+        bad.result()
+    assert stored(store) == ['A', 'B']
+
+
+def test_conflicting_writer_is_not_overwritten(store):
+    store.put_object(Bucket=BUCKET, Key=KEY, Body=json.dumps(['A']))
+    client = RacingClient(store, races=2, value=['A', 'Other'])
+    coalescer = WriteCoalescer(client, BUCKET, window=0.01)
+    assert coalescer.update(KEY, append('B')).result(timeout=5) == ['A', 'Other', 2, 'B']
+    assert stored(store) == ['A', 'Other', 2, 'B']
+    assert coalescer.conflicts == 2 and coalescer.writes == 1
+
+
+def test_conflict_error_after_every_retry(store):
+    client = RacingClient(store, races=100, value=[])
+    coalescer = WriteCoalescer(client, BUCKET, window=0.01, max_retries=3)
+    with pytest.raises(ConflictError):
+        coalescer.update(KEY, append('B')).result(timeout=5)
+    assert client.puts == 4
+
+
+def test_undecodable_object_is_replaced(store):
+    store.put_object(Bucket=BUCKET, Key=KEY, Body=b'\x00garbage')
+    coalescer = WriteCoalescer(store, BUCKET, window=0.01)
+    assert coalescer.update(KEY, append('A')).result(timeout=5) == ['A']
+    assert stored(store) == ['A']
@@ -0,0 +1,184 @@
+# timetable_bundle.py
+"""Single-object bundle holding every timetable view of one department.
+
+Layout::
+
+    b'TTB1' | manifest length (uint32, big-endian) | manifest JSON | section | section | ...
+
+The manifest is plain JSON and lists, per section, its absolute byte
+offset, stored length and uncompressed length. Every section is one
+compressed document in the manifest's ``encoding`` (a timetable_codec
+codec: gzip JSON, or msgpack with gzip/zstd when TIMETABLE_CODEC selects it):
+``class``, ``lab`` and one ``faculty/<name>`` per faculty. A reader fetches a small prefix of the
+object, which holds the manifest (and often the section it wants), and
+then at most one byte range for the section itself, so any view costs one
+or two GETs instead of one per faculty. Section reads are pinned to the
+ETag of the probed version, so a bundle rewritten in between is detected
+(``BundleChanged``) and read again from its new manifest rather than
+decoded at the old offsets.
+"""
+import json
+import struct
+import time
+from typing import Any, Callable, Iterable, Optional
+
+from timetable_codec import TIMETABLE_CODEC, compress, decode, resolve_codec, serialize
+
+BUNDLE_VERSION = 1
+MAGIC = b'TTB1'
+HEADER = struct.Struct('>4sI')
+CONTENT_TYPE = 'application/vnd.timetable-bundle'
+FACULTY_PREFIX = 'faculty/'
+# First read of a bundle; large enough for the manifest of a few hundred faculty
+PROBE_BYTES = 64 * 1024
+# Sections are always compressed; plain json becomes gzip JSON
+BUNDLE_CODEC = TIMETABLE_CODEC if '+' in TIMETABLE_CODEC else f'{TIMETABLE_CODEC}+gzip'
+
+
+class BundleChanged(Exception):
+    """The bundle was replaced after its manifest was read."""
+
+
+def faculty_section(faculty: str) -> str:
+    return f'{FACULTY_PREFIX}{faculty}'
+
+
+def pack_bundle(sections: dict[str, Any], codec: Optional[str] = None, **meta: Any) -> bytes:
+    """Serialises ``sections`` (name -> JSON value) into one bundle."""
+    encoding = resolve_codec(codec or BUNDLE_CODEC)
+    fmt, _, compression = encoding.partition('+')
+    raw = {name: serialize(value, fmt) for name, value in sections.items()}
+    blobs = {name: compress(data, compression) for name, data in raw.items()}
+
+    def manifest_bytes(base: int) -> bytes:
+        offset, entries = base, {}
+        for name, blob in blobs.items():
+            entries[name] = {'offset': offset, 'length': len(blob), 'raw_length': len(raw[name])}
+            offset += len(blob)
+        manifest = {'version': BUNDLE_VERSION, 'encoding': encoding, 'created': time.time(),
+                    **meta, 'sections': entries}
+        return json.dumps(manifest, separators=(',', ':')).encode('utf-8')
+
+    # Offsets depend on the manifest's own length; repeat until that length stops changing
+    manifest = manifest_bytes(HEADER.size)
+    while True:
+        candidate = manifest_bytes(HEADER.size + len(manifest))
+        if len(candidate) == len(manifest):
+            manifest = candidate
+            break
+        manifest = candidate
+    return HEADER.pack(MAGIC, len(manifest)) + manifest + b''.join(blobs.values())
+
+
+def read_manifest(prefix: bytes) -> Optional[dict[str, Any]]:
+    """
+    Manifest from the start of a bundle; None when ``prefix`` holds the header but not
+    the whole manifest. A prefix shorter than the header is not a bundle (ValueError).
+    """
+    if len(prefix) < HEADER.size:
+        raise ValueError("Truncated timetable bundle")
+    magic, length = HEADER.unpack_from(prefix)
+    if magic != MAGIC:
+        raise ValueError("Not a timetable bundle")
+    if len(prefix) < HEADER.size + length:
+        return None
+    manifest = json.loads(prefix[HEADER.size:HEADER.size + length])
+    if manifest.get('version') != BUNDLE_VERSION:
+        raise ValueError(f"Unsupported bundle version {manifest.get('version')}")
+    return manifest
+
+
+def decode_section(blob: bytes) -> Any:
+    # The codec is recognised from the blob itself, so older gzip-JSON bundles still read
+    return decode(blob)
+
+
+def unpack_bundle(data: bytes) -> tuple[dict[str, Any], dict[str, Any]]:
+    manifest = read_manifest(data)
+    if manifest is None:
+        raise ValueError("Truncated timetable bundle")
+    sections = {name: decode_section(data[entry['offset']:entry['offset'] + entry['length']])
+                for name, entry in manifest['sections'].items()}
+    return manifest, sections
+
+
+class BundleReader:
+    """
+    Reads sections through ``fetch(start, end, etag) -> (bytes, etag)``, which returns bytes
+    ``start..end`` inclusive (or fewer at the end of the object) and the ETag they were read
+    from. The first fetch is a PROBE_BYTES prefix with ``etag=None``; every later fetch
+    passes the probe's ETag and must raise BundleChanged when the object no longer has it.
+    """
+
+    def __init__(self, fetch: Callable[[int, int, Optional[str]], tuple[bytes, str]],
+                 probe: int = PROBE_BYTES, attempts: int = 2):
+        self.fetch = fetch
+        self.probe = probe
+        self.attempts = attempts
+        self.requests = 0
+        self.etag: Optional[str] = None
+        self._prefix = b''
+        self._manifest: Optional[dict[str, Any]] = None
+
+    def _read(self, start: int, end: int) -> bytes:
+        self.requests += 1
+        data, self.etag = self.fetch(start, end, self.etag)
+        return data
+
+    def _retrying(self, read: Callable[[], Any]) -> Any:
+        for attempt in range(self.attempts):
+            try:
+                return read()
+            except BundleChanged:
+                if attempt == self.attempts - 1:
+                    raise
+                # Start over from the new version's manifest
+                self.etag, self._prefix, self._manifest = None, b'', None
+
+    @property
+    def manifest(self) -> dict[str, Any]:
+        return self._retrying(self._load_manifest)
+
+    def _load_manifest(self) -> dict[str, Any]:
+        if self._manifest is None:
+            self._prefix = self._read(0, max(self.probe, HEADER.size) - 1)
+            manifest = read_manifest(self._prefix)
+            if manifest is None:
+                _, length = HEADER.unpack_from(self._prefix)
+                self._prefix += self._read(len(self._prefix), HEADER.size + length - 1)
+                manifest = read_manifest(self._prefix)
+                if manifest is None:
+                    raise ValueError("Truncated timetable bundle")
+            self._manifest = manifest
+        return self._manifest
+
+    def names(self) -> list[str]:
+        return list(self.manifest['sections'])
+
+    def section(self, name: str, default: Any = None) -> Any:
+        return self._retrying(lambda: self._section(name, default))
+
+    def _section(self, name: str, default: Any) -> Any:
+        entry = self._load_manifest()['sections'].get(name)
+        if entry is None:
+            return default
+        start, end = entry['offset'], entry['offset'] + entry['length']
+        if end <= len(self._prefix):
+            return decode_section(self._prefix[start:end])
+        return decode_section(self._read(start, end - 1))
+
+    def sections(self, names: Iterable[str]) -> dict[str, Any]:
+        """Several sections with one ranged read spanning all of them."""
+        names = list(names)
+        return self._retrying(lambda: self._sections(names))
+
+    def _sections(self, names: list[str]) -> dict[str, Any]:
+        manifest = self._load_manifest()
+        entries = [(n, manifest['sections'][n]) for n in names if n in manifest['sections']]
+        if not entries:
+            return {}
+        start = min(e['offset'] for _, e in entries)
+        end = max(e['offset'] + e['length'] for _, e in entries)
+        data = self._prefix if end <= len(self._prefix) else self._read(start, end - 1)
+        base = 0 if end <= len(self._prefix) else start
+        return {n: decode_section(data[e['offset'] - base:e['offset'] - base + e['length']]) for n, e in entries}
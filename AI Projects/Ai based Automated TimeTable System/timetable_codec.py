@@ -0,0 +1,150 @@
+# timetable_codec.py
+"""Serialization of stored objects: plain JSON or a compact binary codec.
+
+A codec name is ``<format>[+<compression>]``: ``json``, ``json+gzip``,
+``msgpack+gzip`` or ``msgpack+zstd``. Writers use ``TIMETABLE_CODEC``
+(``json`` by default, which keeps objects readable by older releases) and
+set ``ContentType``/``ContentEncoding`` to match. Readers never need the
+metadata. ``decode`` recognises zstd and gzip frames by their magic
+bytes. After decompression, a first byte below 0x80 is JSON text; anything
+higher is a msgpack map or array. Existing JSON objects therefore keep
+working unchanged.
+
+With msgpack, week timetables (``{day: {'PeriodN': subject}}``) and maps
+of them (``{faculty: week}``) are stored as an interned subject table and an
+int16 grid (see ``timetable_model.Timetable``) instead of nested maps. This
+layout is what makes large faculty timetables small and quick to parse.
+
+msgpack and zstandard are optional. Without them, ``msgpack`` falls back
+to ``json`` and ``zstd`` to ``gzip``.
+"""
+import gzip
+import json
+import logging
+import os
+from typing import Any, Optional
+
+import numpy as np
+
+from timetable_model import DAYS, PERIODS, Timetable, period_key
+
+try:
+    import msgpack
+except ImportError:  # optional; the json format is used instead
+    msgpack = None
+
+try:
+    import zstandard
+except ImportError:  # optional; gzip is used instead
+    zstandard = None
+
+TIMETABLE_CODEC = os.environ.get('TIMETABLE_CODEC', 'json')
+GZIP_LEVEL = 6
+ZSTD_LEVEL = 3
+GZIP_MAGIC = b'\x1f\x8b'
+ZSTD_MAGIC = b'\x28\xb5\x2f\xfd'
+CONTENT_TYPES = {'json': 'application/json', 'msgpack': 'application/msgpack'}
+# Marks a packed week grid inside a msgpack document
+GRID_KEY = '__timetable_grid__'
+GRID_VERSION = 1
+
+_WEEK_KEYS = set(DAYS)
+_PERIOD_KEYS = {period_key(p) for p in range(PERIODS)}
+
+
+def resolve_codec(codec: Optional[str] = None) -> str:
+    """``codec`` (default TIMETABLE_CODEC) with unavailable parts replaced by their fallbacks."""
+    fmt, _, compression = (codec or TIMETABLE_CODEC).partition('+')
+    if fmt not in CONTENT_TYPES or compression not in ('', 'gzip', 'zstd'):
+        raise ValueError(f"Unknown codec: {codec or TIMETABLE_CODEC}")
+    if fmt == 'msgpack' and msgpack is None:
+        fmt = 'json'
+    if compression == 'zstd' and zstandard is None:
+        compression = 'gzip'
+    return f'{fmt}+{compression}' if compression else fmt
+
+
+def _is_week(value: Any) -> bool:
+    return (isinstance(value, dict) and set(value) == _WEEK_KEYS and
+            all(isinstance(day, dict) and set(day) == _PERIOD_KEYS and
+                all(isinstance(subject, str) and subject for subject in day.values()) for day in value.values()))
+
+
+def _pack_grid(value: Any) -> Any:
+    """Replaces weeks and {name: week} maps in ``value`` with interned grids."""
+    if not isinstance(value, dict) or not value:
+        return value
+    if _is_week(value):
+        timetable = Timetable.from_dict({'': value})
+        return {GRID_KEY: GRID_VERSION, 'entities': None, 'subjects': timetable.subjects,
+                'grid': timetable.grid.astype('<i2').tobytes()}
+    if all(_is_week(week) for week in value.values()):
+        timetable = Timetable.from_dict(value)
+        return {GRID_KEY: GRID_VERSION, 'entities': timetable.entities, 'subjects': timetable.subjects,
+                'grid': timetable.grid.astype('<i2').tobytes()}
+    return {key: _pack_grid(item) for key, item in value.items()}
+
+
+def _unpack_grid(value: Any) -> Any:
+    if not isinstance(value, dict):
+        return value
+    if value.get(GRID_KEY) == GRID_VERSION:
+        entities = value['entities']
+        grid = np.frombuffer(value['grid'], dtype='<i2').reshape(len(entities or ['']), len(DAYS), PERIODS)
+        weeks = Timetable(list(entities or ['']), list(value['subjects']), grid).to_dict()
+        return weeks[''] if entities is None else weeks
+    return {key: _unpack_grid(item) for key, item in value.items()}
+
+
+def serialize(value: Any, fmt: str) -> bytes:
+    if fmt == 'msgpack':
+        return msgpack.packb(_pack_grid(value), use_bin_type=True)
+    return json.dumps(value).encode('utf-8')
+
+
+def compress(data: bytes, compression: str) -> bytes:
+    if compression == 'zstd':
+        return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(data)
+    if compression == 'gzip':
+        return gzip.compress(data, compresslevel=GZIP_LEVEL, mtime=0)
+    return data
+
+
+def encode(value: Any, codec: Optional[str] = None) -> tuple[bytes, dict[str, str]]:
+    """Body and the put_object metadata (ContentType, ContentEncoding) for ``value``."""
+    fmt, _, compression = resolve_codec(codec).partition('+')
+    metadata = {'ContentType': CONTENT_TYPES[fmt]}
+    if compression:
+        metadata['ContentEncoding'] = compression
+    return compress(serialize(value, fmt), compression), metadata
+
+
+def decompress(body: bytes) -> bytes:
+    if body[:4] == ZSTD_MAGIC:
+        if zstandard is None:
+            raise ValueError("zstd-compressed object, but zstandard is not installed")
+        # Frames written by ZstdCompressor.compress carry their content size
+        return zstandard.ZstdDecompressor().decompress(body)
+    if body[:2] == GZIP_MAGIC:
+        return gzip.decompress(body)
+    return body
+
+
+def decode(body: bytes) -> Any:
+    """Value of an object written by ``encode`` with any codec, or by older plain-JSON writers."""
+    data = decompress(body)
+    if data[:1] and data[0] >= 0x80:
+        if msgpack is None:
+            raise ValueError("msgpack object, but msgpack is not installed")
+        return _unpack_grid(msgpack.unpackb(data, raw=False))
+    return json.loads(data.decode('utf-8'))
+
+
+def put_encoded(cache, client, value: Any, codec: Optional[str] = None, **kwargs) -> dict:
+    """``cache.put_object`` of ``value`` encoded with ``codec``, with matching metadata."""
+    body, metadata = encode(value, codec)
+    return cache.put_object(client, Body=body, **metadata, **kwargs)
+
+
+if resolve_codec() != TIMETABLE_CODEC:
+    logging.warning(f"TIMETABLE_CODEC={TIMETABLE_CODEC} is not fully available; using {resolve_codec()}")
@@ -0,0 +1,420 @@
+# timetable_model.py
+"""Lecture-level model of a timetabling problem, shared by the solvers.
+
+Faculty rows are grouped into lectures: every (class, course) pair taught
+in a department becomes one or more weekly blocks, and all faculty rows
+for that pair co-teach those blocks. Each lecture occupies a set of
+resources (its faculty, its class and, for laboratory courses, every lab
+listed for the course); two lectures clash when they share a resource in
+the same slot.
+
+A solution is an integer array with one start slot per lecture
+(``day * PERIODS + period``) and -1 for lectures that are not placed.
+``Timetable`` is the dense per-entity view of a solution that the
+generator passes between solver stages; the nested
+``{name: {day: {'PeriodN': subject}}}`` dicts are only built (``to_dict``)
+or parsed (``from_dict``) where timetables go to S3 or the templates.
+"""
+import math
+from dataclasses import dataclass, field
+from typing import Any, Iterable, Optional, Union
+
+import numpy as np
+
+DAYS = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday']
+PERIODS = 8
+N_SLOTS = len(DAYS) * PERIODS
+EMPTY_SLOT = '-'
+UNPLACED = -1
+FREE = -1
+
+# Weekly blocks per course type; each entry is the length of one block in periods.
+WEEKLY_PLAN: dict[str, tuple[int, ...]] = {
+    'Theory': (1, 1, 1, 1),
+    'Lab': (2, 2),
+    'Project': (2,),
+    'Skill': (1, 1),
+    'Training': (2,),
+}
+DEFAULT_PLAN: tuple[int, ...] = (1,)
+
+
+def clean_value(value: Any) -> str:
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return ''
+    return str(value).strip()
+
+
+def period_key(period: int) -> str:
+    return f'Period{period + 1}'
+
+
+def slot_day_period(slot: int) -> tuple[str, str]:
+    return DAYS[slot // PERIODS], period_key(slot % PERIODS)
+
+
+def empty_week() -> dict[str, dict[str, str]]:
+    return {day: {period_key(p): EMPTY_SLOT for p in range(PERIODS)} for day in DAYS}
+
+
+@dataclass
+class Problem:
+    faculty_names: list[str]
+    class_keys: list[tuple[str, str]]
+    lab_names: list[str]
+    labels: list[str]
+    course_codes: list[str]
+    lec_group: np.ndarray
+    lec_class: np.ndarray
+    # First lab of the lecture's course, or -1; lec_labs holds all of them
+    lec_lab: np.ndarray
+    lec_labs: list[np.ndarray]
+    lec_length: np.ndarray
+    lec_faculty: list[np.ndarray]
+    start_mask: np.ndarray
+    # Derived by __post_init__
+    lec_resources: list[np.ndarray] = field(init=False)
+    cover_lecture: np.ndarray = field(init=False)
+    cover_resource: np.ndarray = field(init=False)
+    cover_offset: np.ndarray = field(init=False)
+    # Interned subject labels: lec_subject[l] indexes subject_names
+    subject_names: list[str] = field(init=False)
+    lec_subject: np.ndarray = field(init=False)
+
+    def __post_init__(self):
+        subject_ids: dict[str, int] = {}
+        self.lec_subject = np.asarray([subject_ids.setdefault(label, len(subject_ids)) for label in self.labels],
+                                      dtype=np.int16)
+        self.subject_names = list(subject_ids)
+
+        n_fac, n_cls = len(self.faculty_names), len(self.class_keys)
+        self.lec_resources = []
+        for l in range(self.n_lectures):
+            res = list(self.lec_faculty[l]) + [n_fac + int(self.lec_class[l])]
+            res += [n_fac + n_cls + int(lab) for lab in self.lec_labs[l]]
+            self.lec_resources.append(np.asarray(res, dtype=np.int32))
+
+        # Flattened (lecture, resource, offset) incidence used for vectorised occupancy counts
+        lectures, resources, offsets = [], [], []
+        for l, res in enumerate(self.lec_resources):
+            for k in range(int(self.lec_length[l])):
+                lectures.extend([l] * len(res))
+                resources.extend(res)
+                offsets.extend([k] * len(res))
+        self.cover_lecture = np.asarray(lectures, dtype=np.int32)
+        self.cover_resource = np.asarray(resources, dtype=np.int32)
+        self.cover_offset = np.asarray(offsets, dtype=np.int32)
+
+    @property
+    def n_lectures(self) -> int:
+        return len(self.labels)
+
+    @property
+    def n_groups(self) -> int:
+        return int(self.lec_group.max()) + 1 if self.n_lectures else 0
+
+    @property
+    def n_resources(self) -> int:
+        return len(self.faculty_names) + len(self.class_keys) + len(self.lab_names)
+
+
+def course_labs(labs_data: Iterable[dict[str, Any]]) -> dict[str, list[str]]:
+    """Lab names per course code, in sheet order; shared by the solver model and the lab view."""
+    labs: dict[str, list[str]] = {}
+    for lab in labs_data:
+        code, name = clean_value(lab.get('Course_Code')), clean_value(lab.get('Lab_Name'))
+        if code and name and clean_value(lab.get('Type')) == 'Lab' and name not in labs.get(code, []):
+            labs.setdefault(code, []).append(name)
+    return labs
+
+
+def build_problem(faculty_rows: Iterable[dict[str, Any]],
+                  courses_data: Iterable[dict[str, Any]] = (),
+                  labs_data: Iterable[dict[str, Any]] = (),
+                  plan: Optional[dict[str, tuple[int, ...]]] = None) -> Problem:
+    plan = plan or WEEKLY_PLAN
+    # Shared codes such as "TS" appear once per year, so prefer the row for the faculty row's year
+    course_info: dict[tuple[str, str], dict[str, Any]] = {}
+    for course in courses_data:
+        code = clean_value(course.get('Course_Code'))
+        if code:
+            course_info.setdefault((code, clean_value(course.get('Year'))), course)
+            course_info.setdefault((code, ''), course)
+    labs_of_course = course_labs(labs_data)
+
+    faculty_index: dict[str, int] = {}
+    class_index: dict[tuple[str, str], int] = {}
+    lab_index: dict[str, int] = {}
+    groups: dict[tuple[int, str], dict[str, Any]] = {}
+    for row in faculty_rows:
+        name = clean_value(row.get('Faculty_Name'))
+        if not name:
+            continue
+        fac_id = faculty_index.setdefault(name, len(faculty_index))
+        subject = clean_value(row.get('Subject'))
+        code = clean_value(row.get('Course_Code'))
+        if not subject:
+            continue
+        year = clean_value(row.get('Year'))
+        course = course_info.get((code, year)) or course_info.get((code, ''), {})
+        class_key = (clean_value(course.get('Year')) or year,
+                     clean_value(course.get('Semester')))
+        cls_id = class_index.setdefault(class_key, len(class_index))
+        group = groups.setdefault((cls_id, code or subject), {
+            'label': f"{subject} ({code})",
+            'code': code,
+            'type': 'Lab' if code in labs_of_course else
+                    clean_value(course.get('Course_Type')) or clean_value(row.get('Subject_Type')),
+            'faculty': [],
+        })
+        if fac_id not in group['faculty']:
+            group['faculty'].append(fac_id)
+
+    labels, codes, lec_group, lec_class, lec_labs, lec_length, lec_faculty = [], [], [], [], [], [], []
+    for group_id, ((cls_id, _), group) in enumerate(groups.items()):
+        lab_ids = [lab_index.setdefault(name, len(lab_index)) for name in labs_of_course.get(group['code'], [])]
+        for length in plan.get(group['type'], DEFAULT_PLAN):
+            labels.append(group['label'])
+            codes.append(group['code'])
+            lec_group.append(group_id)
+            lec_class.append(cls_id)
+            lec_labs.append(np.asarray(lab_ids, dtype=np.int32))
+            lec_length.append(min(length, PERIODS))
+            lec_faculty.append(np.asarray(group['faculty'], dtype=np.int32))
+
+    lec_length_arr = np.asarray(lec_length, dtype=np.int16)
+    # A block may only start where it still fits inside the same day
+    period_of_slot = np.arange(N_SLOTS) % PERIODS
+    start_mask = period_of_slot[None, :] + lec_length_arr[:, None] <= PERIODS
+
+    return Problem(
+        faculty_names=list(faculty_index),
+        class_keys=list(class_index),
+        lab_names=list(lab_index),
+        labels=labels,
+        course_codes=codes,
+        lec_group=np.asarray(lec_group, dtype=np.int32),
+        lec_class=np.asarray(lec_class, dtype=np.int32),
+        lec_lab=np.asarray([int(labs[0]) if len(labs) else -1 for labs in lec_labs], dtype=np.int32),
+        lec_labs=lec_labs,
+        lec_length=lec_length_arr,
+        lec_faculty=lec_faculty,
+        start_mask=start_mask.reshape(len(labels), N_SLOTS),
+    )
+
+
+def block_free(free: np.ndarray, length: int) -> np.ndarray:
+    """Given a boolean free-slot row, returns where a block of ``length`` can start."""
+    starts = free.copy()
+    for k in range(1, length):
+        starts[..., :-k] &= free[..., k:]
+        starts[..., -k:] = False
+    return starts
+
+
+def occupancy_counts(problem: Problem, assignment: np.ndarray) -> np.ndarray:
+    """Number of lectures holding each (resource, slot); shape (n_resources, N_SLOTS)."""
+    starts = assignment[problem.cover_lecture]
+    placed = starts >= 0
+    cells = problem.cover_resource[placed] * N_SLOTS + starts[placed] + problem.cover_offset[placed]
+    return np.bincount(cells, minlength=problem.n_resources * N_SLOTS).reshape(problem.n_resources, N_SLOTS)
+
+
+def count_clashes(problem: Problem, assignment: np.ndarray) -> int:
+    counts = occupancy_counts(problem, assignment)
+    return int(np.maximum(counts - 1, 0).sum())
+
+
+def unplaced_lectures(problem: Problem, assignment: np.ndarray) -> list[int]:
+    return [int(l) for l in np.flatnonzero(assignment < 0)]
+
+
+VIEWS = ('faculty', 'class', 'lab')
+
+
+@dataclass
+class Timetable:
+    """Dense timetable of one view (faculty, class or lab).
+
+    ``grid[entity, day, period]`` (int16) holds an index into ``subjects``, or
+    FREE. When the timetable was built from a solution, ``problem`` and
+    ``assignment`` are kept, so the next solver stage reuses the assignment
+    instead of recovering it from the grid.
+    """
+    entities: list[str]
+    subjects: list[str]
+    grid: np.ndarray
+    problem: Optional[Problem] = None
+    assignment: Optional[np.ndarray] = None
+
+    @classmethod
+    def from_assignment(cls, problem: Problem, assignment: np.ndarray, view: str = 'faculty') -> 'Timetable':
+        n_fac, n_cls = len(problem.faculty_names), len(problem.class_keys)
+        first, entities = {
+            'faculty': (0, problem.faculty_names),
+            'class': (n_fac, [f'{year} {semester}'.strip() for year, semester in problem.class_keys]),
+            'lab': (n_fac + n_cls, problem.lab_names),
+        }[view]
+        grid = np.full((problem.n_resources, N_SLOTS), FREE, dtype=np.int16)
+        starts = assignment[problem.cover_lecture]
+        placed = starts >= 0
+        # One scatter over the (lecture, resource, offset) incidence fills every occupied cell
+        grid[problem.cover_resource[placed], starts[placed] + problem.cover_offset[placed]] = \
+            problem.lec_subject[problem.cover_lecture[placed]]
+        grid = grid[first:first + len(entities)].reshape(len(entities), len(DAYS), PERIODS)
+        return cls(list(entities), problem.subject_names, grid, problem, np.array(assignment, dtype=np.int32))
+
+    @classmethod
+    def blank(cls, problem: Problem, view: str = 'faculty') -> 'Timetable':
+        return cls.from_assignment(problem, np.full(problem.n_lectures, UNPLACED, dtype=np.int32), view)
+
+    @classmethod
+    def from_dict(cls, timetable: dict, subjects: Optional[list[str]] = None) -> 'Timetable':
+        """Parses ``{name: {day: {'PeriodN': subject}}}``; subjects missing from ``subjects`` are appended."""
+        subjects = list(subjects or [])
+        subject_ids = {name: i for i, name in enumerate(subjects)}
+        entities = list(timetable)
+        grid = np.full((len(entities), len(DAYS), PERIODS), FREE, dtype=np.int16)
+        for e, name in enumerate(entities):
+            week = timetable[name] or {}
+            for d, day in enumerate(DAYS):
+                for p in range(PERIODS):
+                    subject = (week.get(day) or {}).get(period_key(p), EMPTY_SLOT)
+                    if subject and subject != EMPTY_SLOT:
+                        if subject not in subject_ids:
+                            subject_ids[subject] = len(subjects)
+                            subjects.append(subject)
+                        grid[e, d, p] = subject_ids[subject]
+        return cls(entities, subjects, grid)
+
+    def to_dict(self) -> dict:
+        labels = np.asarray(self.subjects + [EMPTY_SLOT], dtype=object)
+        # FREE (-1) indexes the trailing EMPTY_SLOT label
+        cells = labels[self.grid].tolist()
+        periods = [period_key(p) for p in range(PERIODS)]
+        return {name: {day: dict(zip(periods, week[d])) for d, day in enumerate(DAYS)}
+                for name, week in zip(self.entities, cells)}
+
+    @property
+    def occupied(self) -> np.ndarray:
+        return self.grid >= 0
+
+    def load(self) -> np.ndarray:
+        """Occupied periods per entity."""
+        return self.occupied.sum(axis=(1, 2))
+
+    def free_starts(self, length: int) -> np.ndarray:
+        """(entity, slot) mask of where a block of ``length`` free periods can start."""
+        free = ~self.occupied.reshape(len(self.entities), N_SLOTS)
+        return block_free(free, length) & (np.arange(N_SLOTS) % PERIODS + length <= PERIODS)
+
+
+def decode_faculty_timetable(problem: Problem, assignment: np.ndarray) -> dict:
+    return Timetable.from_assignment(problem, assignment).to_dict()
+
+
+def encode_faculty_timetable(problem: Problem, timetable: Union[dict, Timetable]) -> np.ndarray:
+    """Recovers a start-slot assignment from a faculty timetable.
+
+    A Timetable built from a solution of ``problem`` carries its assignment,
+    which is returned as is. Otherwise lectures are matched against the grid:
+    lectures whose block cannot be found in the timetable stay unplaced.
+    """
+    if isinstance(timetable, Timetable) and timetable.problem is problem and timetable.assignment is not None:
+        return timetable.assignment.copy()
+    assignment = np.full(problem.n_lectures, UNPLACED, dtype=np.int32)
+    if problem.n_lectures == 0:
+        return assignment
+    if not isinstance(timetable, Timetable):
+        timetable = Timetable.from_dict(timetable, problem.subject_names)
+    # Faculty grid aligned with problem.faculty_names, in the problem's subject ids
+    subject_ids = {name: i for i, name in enumerate(problem.subject_names)}
+    # Subjects the problem does not know map to -2, which matches no lecture
+    remap = np.asarray([subject_ids.get(name, -2) for name in timetable.subjects] + [FREE], dtype=np.int16)
+    rows = {name: e for e, name in enumerate(timetable.entities)}
+    grid = np.full((len(problem.faculty_names), N_SLOTS), FREE, dtype=np.int16)
+    for f, name in enumerate(problem.faculty_names):
+        if name in rows:
+            grid[f] = remap[timetable.grid[rows[name]].reshape(N_SLOTS)]
+
+    first_faculty = np.asarray([int(fac[0]) for fac in problem.lec_faculty], dtype=np.int32)
+    match = grid[first_faculty] == problem.lec_subject[:, None]
+    candidates = np.zeros_like(match)
+    for length in np.unique(problem.lec_length):
+        rows_of_length = problem.lec_length == length
+        candidates[rows_of_length] = block_free(match[rows_of_length], int(length))
+    candidates &= problem.start_mask
+
+    used = np.zeros((len(problem.faculty_names), N_SLOTS), dtype=bool)
+    for l in np.flatnonzero(candidates.any(axis=1)):
+        fac, length = first_faculty[l], int(problem.lec_length[l])
+        for start in np.flatnonzero(candidates[l]):
+            if not used[fac, start:start + length].any():
+                assignment[l] = start
+                used[fac, start:start + length] = True
+                break
+    return assignment
+
+
+def assignment_records(problem: Problem, assignment: np.ndarray) -> list[dict[str, str]]:
+    """One (course, faculty, day, period) record per occupied faculty cell."""
+    records = []
+    for l in np.flatnonzero(assignment >= 0):
+        year, semester = problem.class_keys[problem.lec_class[l]]
+        start = int(assignment[l])
+        for k in range(int(problem.lec_length[l])):
+            day, period = slot_day_period(start + k)
+            for f in problem.lec_faculty[l]:
+                records.append({
+                    'Course_Code': problem.course_codes[l],
+                    'Faculty_Name': problem.faculty_names[f],
+                    'Day': day,
+                    'Period': period,
+                    'Subject': problem.labels[l],
+                    'Year': year,
+                    'Semester': semester,
+                })
+    return records
+
+
+def index_rows(rows: Iterable[dict[str, Any]], *columns: str) -> dict[Any, list[dict[str, Any]]]:
+    """Hash index of rows on one column, or on a tuple of columns."""
+    index: dict[Any, list[dict[str, Any]]] = {}
+    for row in rows:
+        key = tuple(clean_value(row.get(c)) for c in columns)
+        index.setdefault(key[0] if len(columns) == 1 else key, []).append(row)
+    return index
+
+
+def build_class_timetable(records: list[dict[str, str]], courses_data: Iterable[dict[str, Any]]) -> dict:
+    """{Year: {Semester: {day: {PeriodN: subject}}}} for the given department courses."""
+    courses_data = list(courses_data)
+    timetable: dict = {}
+    for (year, semester) in index_rows(courses_data, 'Year', 'Semester'):
+        timetable.setdefault(year, {})[semester] = empty_week()
+    courses_by_code = index_rows(courses_data, 'Course_Code')
+    for record in records:
+        for course in courses_by_code.get(record['Course_Code'], []):
+            year, semester = clean_value(course.get('Year')), clean_value(course.get('Semester'))
+            if (year, semester) == (record['Year'], record['Semester']):
+                timetable[year][semester][record['Day']][record['Period']] = record['Subject']
+    return timetable
+
+
+def build_lab_timetable(records: list[dict[str, str]], courses_data: Iterable[dict[str, Any]],
+                        labs_data: Iterable[dict[str, Any]]) -> dict:
+    """{Lab_Name: {day: {PeriodN: subject}}} for lab courses taught in the department.
+
+    A session goes into every lab listed for its course, the same labs
+    build_problem books for the lecture.
+    """
+    labs_data = list(labs_data)
+    timetable = {clean_value(lab.get('Lab_Name')): empty_week() for lab in labs_data}
+    dept_codes = set(index_rows(courses_data, 'Course_Code'))
+    labs_of_course = course_labs(labs_data)
+    for record in records:
+        if record['Course_Code'] not in dept_codes:
+            continue
+        for lab_name in labs_of_course.get(record['Course_Code'], []):
+            timetable[lab_name][record['Day']][record['Period']] = record['Subject']
+    return timetable
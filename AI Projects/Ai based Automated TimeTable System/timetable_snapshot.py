@@ -0,0 +1,221 @@
+# timetable_snapshot.py
+"""Columnar snapshot of timetable_data.xlsx.
+
+The workbook is compiled once into Arrow IPC (Feather v2) files with
+dictionary-encoded string columns, plus a small manifest carrying the
+SHA-256 of the source workbook. Tables are opened through memory mapping,
+so reloading after a restart costs a stat() and a few mmap() calls instead
+of an Excel parse. The record lists the solvers take are still built in
+each process on first use (``TimetableSnapshot.records``), typed as pandas
+parses the workbook; only the mapped tables are shared between workers.
+Text columns holding mixed values (e.g. numbers and strings) are stored as
+strings.
+
+pyarrow is optional (requirements-optional.txt). Without it no snapshot is
+compiled and workbook_cache parses the workbook with pandas instead.
+
+Usage:
+    python timetable_snapshot.py [timetable_data.xlsx]
+"""
+import hashlib
+import json
+import logging
+import os
+import sys
+import time
+from typing import Any, Optional
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.feather as feather
+except ImportError:  # pyarrow is optional; callers fall back to parsing the workbook
+    pa = None
+    feather = None
+
+SNAPSHOT_VERSION = 1
+MANIFEST_NAME = "manifest.json"
+SHEETS = {"faculty": "Sheet1", "courses": "Sheet2", "labs": "Sheet3"}
+
+
+def snapshot_available() -> bool:
+    return pa is not None
+
+
+def default_snapshot_dir(xlsx_path: str) -> str:
+    root, _ = os.path.splitext(os.path.abspath(xlsx_path))
+    return f"{root}.snapshot"
+
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def merge_subjects(faculty_df: pd.DataFrame, courses_df: pd.DataFrame) -> pd.DataFrame:
+    if "Course_Code" not in faculty_df.columns or \
+       not all(col in courses_df.columns for col in ["Course_Code", "Course_Name"]):
+        logging.warning("Cannot merge courses because required columns are missing in Sheet1/Sheet2.")
+        return faculty_df
+    faculty_df = faculty_df.merge(
+        courses_df[["Course_Code", "Course_Name"]],
+        on="Course_Code",
+        how="left",
+        suffixes=("", "_course")
+    )
+    if "Subject" not in faculty_df.columns:
+        faculty_df["Subject"] = faculty_df["Course_Name"]
+        logging.info("Created 'Subject' column from Course_Name in faculty data.")
+    else:
+        # Vectorised replacement for the old row-wise apply(axis=1)
+        missing = faculty_df["Subject"].isna() | (faculty_df["Subject"].astype(str).str.strip() == "")
+        faculty_df["Subject"] = faculty_df["Subject"].where(~missing, faculty_df["Course_Name"])
+        logging.info("Filled empty 'Subject' values with Course_Name in faculty data.")
+    return faculty_df
+
+
+def _to_categorical(df: pd.DataFrame) -> pd.DataFrame:
+    df = df.copy()
+    for col in df.columns:
+        if not pd.api.types.is_numeric_dtype(df[col]):
+            df[col] = df[col].map(lambda v: v if pd.isna(v) else str(v)).astype("category")
+    return df
+
+
+def derive_departments(faculty_df: pd.DataFrame) -> list[str]:
+    if "Year" not in faculty_df.columns:
+        logging.warning("No 'Year' column found in Sheet1; using default department.")
+        return ["Default Department"]
+    valid_years = [str(y).strip() for y in faculty_df["Year"].unique() if pd.notna(y)]
+    return [f"{y} Year" for y in valid_years]
+
+
+def derive_faculties(faculty_data: list[dict[str, Any]]) -> list[str]:
+    return sorted(set(d.get("Faculty_Name", "") for d in faculty_data if pd.notna(d.get("Faculty_Name", ""))))
+
+
+def _write_json(path: str, data: dict[str, Any]) -> None:
+    with open(path, "w") as f:
+        json.dump(data, f, indent=2)
+
+
+def _write_atomic(path: str, write) -> None:
+    tmp_path = f"{path}.tmp-{os.getpid()}"
+    write(tmp_path)
+    os.replace(tmp_path, path)
+
+
+def compile_snapshot(xlsx_path: str, snapshot_dir: Optional[str] = None) -> dict[str, Any]:
+    """Compiles the workbook into a snapshot directory and returns its manifest.
+
+    Table files are named after the content hash and the manifest is
+    replaced last, so readers never observe a half-written snapshot.
+    """
+    if pa is None:
+        raise RuntimeError("pyarrow is required to compile a timetable snapshot")
+    snapshot_dir = snapshot_dir or default_snapshot_dir(xlsx_path)
+    os.makedirs(snapshot_dir, exist_ok=True)
+
+    st = os.stat(xlsx_path)
+    content_hash = file_sha256(xlsx_path)
+    sheets = pd.read_excel(xlsx_path, sheet_name=list(SHEETS.values()))
+    frames = {name: sheets[sheet] for name, sheet in SHEETS.items()}
+    frames["faculty"] = merge_subjects(frames["faculty"], frames["courses"])
+
+    tables = {}
+    for name, df in frames.items():
+        file_name = f"{name}-{content_hash[:16]}.arrow"
+        table = pa.Table.from_pandas(_to_categorical(df), preserve_index=False)
+        table = table.replace_schema_metadata({b"content_hash": content_hash.encode()})
+        # Uncompressed so the columns can be read zero-copy from the memory map
+        _write_atomic(os.path.join(snapshot_dir, file_name),
+                      lambda p, t=table: feather.write_feather(t, p, compression="uncompressed"))
+        tables[name] = {"file": file_name, "rows": table.num_rows}
+
+    manifest = {
+        "version": SNAPSHOT_VERSION,
+        "source": os.path.basename(xlsx_path),
+        "content_hash": content_hash,
+        "source_mtime_ns": st.st_mtime_ns,
+        "source_size": st.st_size,
+        "created_at": time.time(),
+        "departments": derive_departments(frames["faculty"]),
+        "faculties": derive_faculties(frames["faculty"].to_dict(orient="records")),
+        "tables": tables,
+    }
+    _write_atomic(os.path.join(snapshot_dir, MANIFEST_NAME), lambda p: _write_json(p, manifest))
+
+    # Drop table files from older snapshots; processes that still map them keep a valid view.
+    current = {t["file"] for t in tables.values()}
+    for entry in os.listdir(snapshot_dir):
+        if entry.endswith(".arrow") and entry not in current:
+            os.remove(os.path.join(snapshot_dir, entry))
+
+    logging.info(f"Compiled snapshot {content_hash[:12]} for {xlsx_path} into {snapshot_dir}")
+    return manifest
+
+
+class TimetableSnapshot:
+    """Memory-mapped view of a compiled snapshot."""
+
+    def __init__(self, snapshot_dir: str, manifest: dict[str, Any]):
+        self.snapshot_dir = snapshot_dir
+        self.manifest = manifest
+        self.content_hash: str = manifest["content_hash"]
+        self.departments: list[str] = manifest["departments"]
+        self.faculties: list[str] = manifest["faculties"]
+        self.tables = {
+            name: pa.ipc.open_file(pa.memory_map(os.path.join(snapshot_dir, info["file"]), "r")).read_all()
+            for name, info in manifest["tables"].items()
+        }
+
+    def records(self, name: str) -> list[dict[str, Any]]:
+        """Rows of one table with the types of ``DataFrame.to_dict``: str, int, float and NaN for empty cells."""
+        return self.tables[name].to_pandas().to_dict(orient="records")
+
+
+def _read_manifest(snapshot_dir: str) -> Optional[dict[str, Any]]:
+    try:
+        with open(os.path.join(snapshot_dir, MANIFEST_NAME)) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return manifest if manifest.get("version") == SNAPSHOT_VERSION else None
+
+
+def load_snapshot(xlsx_path: str, snapshot_dir: Optional[str] = None,
+                  compile_if_stale: bool = True) -> Optional[TimetableSnapshot]:
+    """Opens the snapshot for a workbook, recompiling it when the workbook has changed.
+
+    The mtime/size recorded in the manifest are checked first; only when
+    they differ is the workbook hashed, so touching the file without
+    changing its content does not trigger a recompile.
+    """
+    if pa is None:
+        return None
+    snapshot_dir = snapshot_dir or default_snapshot_dir(xlsx_path)
+    try:
+        st = os.stat(xlsx_path)
+        manifest = _read_manifest(snapshot_dir)
+        fresh = manifest is not None and (
+            (manifest["source_mtime_ns"], manifest["source_size"]) == (st.st_mtime_ns, st.st_size)
+            or manifest["content_hash"] == file_sha256(xlsx_path)
+        )
+        if not fresh:
+            if not compile_if_stale:
+                return None
+            manifest = compile_snapshot(xlsx_path, snapshot_dir)
+        return TimetableSnapshot(snapshot_dir, manifest)
+    except Exception as e:
+        logging.error(f"Could not load timetable snapshot for {xlsx_path}: {str(e)}")
+        return None
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    source = sys.argv[1] if len(sys.argv) > 1 else "timetable_data.xlsx"
+    print(json.dumps(compile_snapshot(source), indent=2))
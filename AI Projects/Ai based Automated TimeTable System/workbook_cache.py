@@ -0,0 +1,187 @@
+# workbook_cache.py
+import logging
+import os
+import threading
+from functools import cached_property
+from typing import Any, Optional
+
+import pandas as pd
+
+from instrumentation import timed
+from timetable_snapshot import (
+    TimetableSnapshot, derive_departments, derive_faculties, load_snapshot, merge_subjects, snapshot_available
+)
+
+# Default input workbook used by the timetable routes
+TIMETABLE_DATA_FILE = "timetable_data.xlsx"
+
+
+class WorkbookData:
+    """Parsed contents of the timetable workbook.
+
+    Records come either from an in-process parse of the workbook or from
+    a memory-mapped snapshot, in which case they are only materialised the
+    first time a caller asks for them. The record lists are shared between
+    every caller of the cache, so they must be treated as read-only.
+    """
+
+    def __init__(self, faculty: Optional[list[dict[str, Any]]] = None,
+                 courses: Optional[list[dict[str, Any]]] = None,
+                 labs: Optional[list[dict[str, Any]]] = None,
+                 departments: Optional[list[str]] = None,
+                 faculties: Optional[list[str]] = None,
+                 snapshot: Optional[TimetableSnapshot] = None):
+        self.snapshot = snapshot
+        if snapshot is not None:
+            departments, faculties = snapshot.departments, snapshot.faculties
+            self.content_hash = snapshot.content_hash
+        else:
+            self.content_hash = None
+            self.__dict__.update(faculty=faculty or [], courses=courses or [], labs=labs or [])
+        self.departments = departments or ["Default Department"]
+        self.faculties = faculties or []
+
+    @cached_property
+    def faculty(self) -> list[dict[str, Any]]:
+        return self.snapshot.records("faculty")
+
+    @cached_property
+    def courses(self) -> list[dict[str, Any]]:
+        return self.snapshot.records("courses")
+
+    @cached_property
+    def labs(self) -> list[dict[str, Any]]:
+        return self.snapshot.records("labs")
+
+
+EMPTY_WORKBOOK = WorkbookData()
+
+
+def parse_workbook(file_path: str) -> WorkbookData:
+    """Parses the three sheets of the workbook and merges course names into the faculty rows."""
+    try:
+        faculty_df = pd.read_excel(file_path, sheet_name="Sheet1")
+        if faculty_df.empty:
+            logging.error("No data found in Sheet1 (Faculty Details)")
+            return EMPTY_WORKBOOK
+
+        courses_df = pd.read_excel(file_path, sheet_name="Sheet2")
+        if courses_df.empty:
+            logging.error("No data found in Sheet2 (Courses)")
+            return EMPTY_WORKBOOK
+
+        labs_df = pd.read_excel(file_path, sheet_name="Sheet3")
+        if labs_df.empty:
+            logging.error("No data found in Sheet3 (Labs)")
+            return EMPTY_WORKBOOK
+
+        departments = derive_departments(faculty_df)
+
+        faculty_df = merge_subjects(faculty_df, courses_df)
+
+        no_subject_rows = faculty_df[faculty_df['Subject'].isna() | (faculty_df['Subject'] == '')]
+        if not no_subject_rows.empty:
+            logging.warning("Some faculty rows have no Subject even after merging with courses:")
+            logging.warning(no_subject_rows)
+
+        faculty_data = faculty_df.to_dict(orient='records')
+        courses_data = courses_df.to_dict(orient='records')
+        labs_data    = labs_df.to_dict(orient='records')
+
+        logging.info(
+            f"Loaded {len(faculty_data)} faculty records, "
+            f"{len(courses_data)} course records, {len(labs_data)} lab records"
+        )
+        return WorkbookData(faculty_data, courses_data, labs_data, departments, derive_faculties(faculty_data))
+
+    except Exception as e:
+        logging.error(f"Error reading Excel file: {str(e)}")
+        return EMPTY_WORKBOOK
+
+
+@timed('load_workbook')
+def load_workbook(file_path: str) -> WorkbookData:
+    """Loads the workbook through its columnar snapshot, parsing the Excel file only as a fallback."""
+    if snapshot_available():
+        snapshot = load_snapshot(file_path)
+        if snapshot is not None:
+            logging.info(f"Loaded timetable snapshot {snapshot.content_hash[:12]} for {file_path}")
+            return WorkbookData(snapshot=snapshot)
+    return parse_workbook(file_path)
+
+
+class WorkbookCache:
+    """Process-wide cache of parsed workbooks keyed on (path, mtime, size).
+
+    An entry is reused for as long as the file on disk keeps the same
+    modification time and size; any change to the file makes the next
+    lookup re-parse it. Failed parses are never cached.
+    """
+
+    def __init__(self, loader=load_workbook):
+        self._loader = loader
+        self._entries: dict[str, tuple[tuple[int, int], WorkbookData]] = {}
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _file_key(path: str) -> Optional[tuple[int, int]]:
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        return st.st_mtime_ns, st.st_size
+
+    def _lookup(self, path: str, file_key: tuple[int, int]) -> Optional[WorkbookData]:
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry and entry[0] == file_key:
+                self.hits += 1
+                return entry[1]
+        return None
+
+    def get(self, file_path: str = TIMETABLE_DATA_FILE) -> WorkbookData:
+        path = os.path.abspath(file_path)
+        file_key = self._file_key(path)
+        if file_key is None:
+            logging.error(f"Workbook not found: {file_path}")
+            return EMPTY_WORKBOOK
+
+        cached = self._lookup(path, file_key)
+        if cached is not None:
+            return cached
+
+        # Only one thread parses at a time; the others wait and then hit the fresh entry.
+        with self._load_lock:
+            cached = self._lookup(path, file_key)
+            if cached is not None:
+                return cached
+            with self._lock:
+                self.misses += 1
+            data = self._loader(path)
+            if data is not EMPTY_WORKBOOK:
+                with self._lock:
+                    self._entries[path] = (file_key, data)
+            return data
+
+    def invalidate(self, file_path: Optional[str] = None) -> None:
+        with self._lock:
+            if file_path is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(os.path.abspath(file_path), None)
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': round(self.hits / lookups, 4) if lookups else 0.0,
+                'entries': len(self._entries),
+            }
+
+
+workbook_cache = WorkbookCache()
@@ -0,0 +1,145 @@
+# write_coalescer.py
+"""Coalesced, conflict-safe read-modify-write of shared JSON objects.
+
+``update(key, mutation)`` queues ``mutation`` (a function from the current
+value to the new one) and returns a Future. Mutations to the same key that
+arrive within ``window`` seconds of the first are applied together: one GET
+of the current object, every mutation in arrival order, then one
+conditional PUT (``IfMatch`` on the ETag that was read, or
+``IfNoneMatch='*'`` when the object did not exist). If another writer got
+there first the PUT fails with 412 and the whole batch is re-applied to the
+fresh object after a short backoff, so no update is lost. A mutation that
+raises fails only its own future; the rest of the batch is still written.
+An object that cannot be decoded is logged and treated as missing, so the
+batch replaces it instead of failing every later update.
+
+The read goes straight to the client rather than through ``s3_cache``,
+whose TTL could otherwise hand back a stale ETag; a successful write
+invalidates the cached copy.
+"""
+import json
+import logging
+import random
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Optional
+
+from botocore.exceptions import ClientError
+
+from s3_cache import s3_cache
+from timetable_codec import decode
+
+COALESCE_WINDOW = 0.05
+MAX_CONFLICT_RETRIES = 8
+RETRY_BASE_DELAY = 0.02
+
+
+def precondition_failed(error: ClientError) -> bool:
+    status = error.response.get('ResponseMetadata', {}).get('HTTPStatusCode')
+    return status == 412 or error.response.get('Error', {}).get('Code') in ('PreconditionFailed', 'ConditionalRequestConflict')
+
+
+class ConflictError(Exception):
+    """The object kept changing underneath the batch for every retry."""
+
+
+class WriteCoalescer:
+    def __init__(self, client, bucket: str, window: float = COALESCE_WINDOW,
+                 max_retries: int = MAX_CONFLICT_RETRIES):
+        self.client = client
+        self.bucket = bucket
+        self.window = window
+        self.max_retries = max_retries
+        # key -> [(mutation, default factory, future)] waiting for the next flush
+        self._pending: dict[str, list[tuple[Callable[[Any], Any], Callable[[], Any], Future]]] = {}
+        self._lock = threading.Lock()
+        self.mutations = self.writes = self.conflicts = 0
+
+    def update(self, key: str, mutation: Callable[[Any], Any],
+               default: Callable[[], Any] = list) -> Future:
+        """
+        Queues ``mutation(value) -> new value`` for ``key``; ``default()`` stands in for a missing
+        object. The future resolves to the mutation's result once the batch is durably written.
+        """
+        future: Future = Future()
+        with self._lock:
+            self.mutations += 1
+            batch = self._pending.get(key)
+            if batch is None:
+                batch = self._pending[key] = []
+                timer = threading.Timer(self.window, self._flush, args=(key,))
+                timer.daemon = True
+                timer.start()
+            batch.append((mutation, default, future))
+        return future
+
+    def _read(self, key: str) -> tuple[Optional[Any], Optional[str]]:
+        try:
+            response = self.client.get_object(Bucket=self.bucket, Key=key)
+        except self.client.exceptions.NoSuchKey:
+            return None, None
+        # Any codec reads; the shared list is written back as plain JSON
+        try:
+            value = decode(response['Body'].read())
+        except Exception as e:
+            # Treated like a missing object, but overwritten under IfMatch on the bad version
+            logging.error(f"Replacing undecodable s3://{self.bucket}/{key}: {str(e)}")
+            value = None
+        return value, response.get('ETag')
+
+    def _flush(self, key: str) -> None:
+        with self._lock:
+            batch = self._pending.pop(key, [])
+        if not batch:
+            return
+        try:
+            self._write_batch(key, batch)
+        except Exception as e:
+            logging.error(f"Coalesced write of {key} failed: {str(e)}")
+            for _, _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+
+    def _write_batch(self, key: str, batch: list) -> None:
+        for attempt in range(self.max_retries + 1):
+            value, etag = self._read(key)
+            results = []
+            for mutation, default, _ in batch:
+                current = value if value is not None else default()
+                try:
+                    value = mutation(current)
+                    results.append((True, value))
+                except Exception as e:
+                    value = current
+                    results.append((False, e))
+            condition = {'IfMatch': etag} if etag is not None else {'IfNoneMatch': '*'}
+            try:
+                self.client.put_object(Bucket=self.bucket, Key=key, Body=json.dumps(value),
+                                       ContentType='application/json', **condition)
+            except ClientError as e:
+                if not precondition_failed(e):
+                    raise
+                with self._lock:
+                    self.conflicts += 1
+                delay = RETRY_BASE_DELAY * 2 ** attempt * (1 + random.random())
+                logging.warning(f"Write conflict on {key}, retrying batch of {len(batch)} in {delay:.2f}s")
+                time.sleep(delay)
+                continue
+            finally:
+                s3_cache.invalidate(self.bucket, key)
+            with self._lock:
+                self.writes += 1
+            logging.info(f"Wrote {len(batch)} coalesced updates to {key}")
+            for (_, _, future), (ok, outcome) in zip(batch, results):
+                if ok:
+                    future.set_result(outcome)
+                else:
+                    future.set_exception(outcome)
+            return
+        raise ConflictError(f"{key} changed concurrently on every one of {self.max_retries + 1} attempts")
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return {'mutations': self.mutations, 'writes': self.writes, 'conflicts': self.conflicts,
+                    'pending_keys': len(self._pending)}